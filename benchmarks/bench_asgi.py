@@ -0,0 +1,122 @@
+"""
+Сравнение пропускной способности WSGI (gunicorn, синхронные воркеры)
+и ASGI (daphne, yatube.asgi) на странице записи при большом числе
+одновременных клиентов.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_asgi.py [--clients 100] [--requests 2000]
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("сервер не запустился")
+
+
+def populate():
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from posts.models import Comment, Follow, Post, User
+
+    call_command("migrate", verbosity=0)
+    author = User.objects.create_user(username="author")
+    readers = [User.objects.create_user(username=f"reader{n}") for n in range(20)]
+    Follow.objects.bulk_create(Follow(user=user, author=author) for user in readers)
+    posts = [Post.objects.create(text=f"Запись {n}", author=author) for n in range(50)]
+    Comment.objects.bulk_create(
+        Comment(post=posts[-1], author=reader, text="Комментарий")
+        for reader in readers
+    )
+    return f"/author/{posts[-1].pk}/"
+
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        response.read()
+        return response.status
+
+
+def load(port, path, clients, total):
+    url = f"http://127.0.0.1:{port}{path}"
+    fetch(url)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        statuses = list(executor.map(lambda _: fetch(url), range(total)))
+    elapsed = time.perf_counter() - started
+    assert all(status == 200 for status in statuses)
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=2)
+    options = parser.parse_args()
+
+    database = tempfile.NamedTemporaryFile(suffix=".sqlite3", delete=False).name
+    os.environ.update(
+        BENCH_DB=database, DJANGO_SETTINGS_MODULE="benchmarks.bench_settings"
+    )
+    path = populate()
+
+    servers = {
+        "WSGI (gunicorn sync)": lambda port: [
+            sys.executable, "-c", "from gunicorn.app.wsgiapp import run; run()",
+            "-c", "gunicorn.conf.py", "yatube.wsgi:application",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(options.workers),
+            "--log-level", "error",
+        ],
+        "ASGI (daphne)": lambda port: [
+            sys.executable, "-c", "from daphne.cli import CommandLineInterface; "
+            "CommandLineInterface.entrypoint()",
+            "-b", "127.0.0.1", "-p", str(port), "-v", "0",
+            "yatube.asgi:application",
+        ],
+    }
+    try:
+        for title, command in servers.items():
+            port = free_port()
+            server = subprocess.Popen(command(port), cwd=ROOT, env=os.environ)
+            try:
+                wait_for(port)
+                rate = load(port, path, options.clients, options.requests)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{title:22} {rate:8.1f} запросов/с")
+    finally:
+        os.unlink(database)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Замер пропускной способности раздачи картинок из media/posts при
+параллельных загрузках.
+
+Для каждого варианта запускается gunicorn с gunicorn.conf.py:
+
+* django.views.static.serve - yatube.settings (DEBUG, как раньше);
+* serve_media - yatube.settings_production с DJANGO_SERVE_STATIC_FILES=1.
+
+Часть запросов идет с заголовком Range, как при докачке.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_media.py [--clients 32] [--requests 2000]
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = (
+    ("django.views.static.serve", {"DJANGO_SETTINGS_MODULE": "yatube.settings"}),
+    ("serve_media", {
+        "DJANGO_SETTINGS_MODULE": "yatube.settings_production",
+        "DJANGO_SERVE_STATIC_FILES": "1",
+        # Раздача медиа не обращается к кэшу, memcached не нужен
+        "DJANGO_LOCAL_CACHE": "1",
+    }),
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("gunicorn не запустился")
+
+
+def fetch(url, byte_range=None):
+    request = urllib.request.Request(url)
+    if byte_range:
+        request.add_header("Range", byte_range)
+    with urllib.request.urlopen(request) as response:
+        return len(response.read())
+
+
+def run(env, files, clients, total, workers):
+    port = free_port()
+    server_env = dict(
+        os.environ, GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKERS=str(workers), **env,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-c", "from gunicorn.app.wsgiapp import run; run()",
+         "-c", "gunicorn.conf.py", "yatube.wsgi:application",
+         "--worker-class", "gthread", "--threads", "8", "--log-level", "error"],
+        cwd=ROOT, env=server_env,
+    )
+    try:
+        wait_for(port)
+        jobs = []
+        for number in range(total):
+            name = files[number % len(files)]
+            byte_range = "bytes=0-65535" if number % 4 == 0 else None
+            jobs.append((f"http://127.0.0.1:{port}/media/posts/{name}", byte_range))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            received = sum(executor.map(lambda job: fetch(*job), jobs))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    return elapsed, received
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=2)
+    options = parser.parse_args()
+
+    files = sorted(os.listdir(os.path.join(ROOT, "media", "posts")))
+    for title, env in VARIANTS:
+        elapsed, received = run(
+            env, files, options.clients, options.requests, options.workers
+        )
+        print(
+            f"{title:26} {options.requests / elapsed:8.1f} запросов/с, "
+            f"{received / elapsed / 2 ** 20:8.1f} МБ/с"
+        )
+
+
+if __name__ == "__main__":
+    main()
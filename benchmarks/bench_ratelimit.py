@@ -0,0 +1,86 @@
+"""
+Сколько добавляет проверка частоты запросов (yatube.ratelimit) к одному
+запросу: вызов check с двумя ведрами (пользователь и IP) и декоратор
+вокруг пустого представления, в микросекундах.
+
+По умолчанию используется кэш из настроек (в yatube.settings - locmem);
+для замера с memcached или redis укажите DJANGO_SETTINGS_MODULE
+с нужным CACHES.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_ratelimit.py [--repeat 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+
+from yatube.ratelimit import check, ratelimit  # noqa: E402
+
+
+class BenchUser:
+    pk = 1
+    is_authenticated = True
+
+
+RESPONSE = HttpResponse()
+
+
+def view(request):
+    # Ответ создается заранее: в Django 2.2 конструктор HttpResponse
+    # обходит стек ради предупреждения о DEFAULT_CONTENT_TYPE, и его
+    # цена зависит от глубины стека, то есть и от самого декоратора
+    return RESPONSE
+
+
+def measure(func, repeat, rounds=5):
+    # Лучший из нескольких прогонов: меньше влияние сборщика мусора
+    # и соседних процессов
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20000)
+    options = parser.parse_args()
+
+    request = RequestFactory().post("/new/", REMOTE_ADDR="10.0.0.1")
+    request.user = BenchUser()
+    # Лимит заведомо не достигается: замеряется путь разрешенного запроса
+    limited = ratelimit("bench", user="1000000000/m", ip="1000000000/m")(view)
+    cache.clear()
+
+    bare = measure(lambda: view(request), options.repeat)
+    checked = measure(
+        lambda: check(request, "bench", user="1000000000/m", ip="1000000000/m"),
+        options.repeat,
+    )
+    decorated = measure(lambda: limited(request), options.repeat)
+    print(f"{'представление без лимита':28} {bare:7.2f} мкс")
+    print(f"{'check, два ведра':28} {checked:7.2f} мкс")
+    print(f"{'представление с декоратором':28} {decorated:7.2f} мкс "
+          f"(+{decorated - bare:.2f} мкс)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Полная пересборка похожих записей (posts.related) без базы:
+разбор текстов в матрицу частот, веса TF-IDF и поиск соседей
+произведениями разреженных матриц, в секундах по этапам.
+
+Тексты синтетические: слова из словаря --vocabulary слов
+с распределением Ципфа, как в живом языке, по --words слов в записи.
+Запись в RelatedPost не замеряется: она зависит от базы и идет
+пачками по WRITE_BATCH_SIZE строк.
+
+Запуск из корня проекта (миллион записей - несколько минут и
+несколько гигабайт памяти):
+
+    python benchmarks/bench_related.py [--posts 1000000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from posts import related  # noqa: E402
+
+
+def make_texts(posts, words, vocabulary, seed=1):
+    rng = np.random.default_rng(seed)
+    dictionary = np.array([f"слово{number}" for number in range(vocabulary)])
+    for _ in range(posts):
+        ranks = rng.zipf(1.2, words) % vocabulary
+        yield " ".join(dictionary[ranks])
+
+
+def stage(title, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{title:32} {elapsed:8.1f} с")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=1000000)
+    parser.add_argument("--words", type=int, default=40)
+    parser.add_argument("--vocabulary", type=int, default=200000)
+    options = parser.parse_args()
+
+    texts, _ = stage("генерация текстов", lambda: list(
+        make_texts(options.posts, options.words, options.vocabulary)
+    ))
+    ids = np.arange(1, options.posts + 1, dtype=np.int64)
+    counts, _ = stage("матрица частот", lambda: related.term_counts(texts))
+    idf, _ = stage("idf", lambda: related.inverse_frequencies(counts))
+    matrix, _ = stage("веса TF-IDF", lambda: related.weigh(counts, idf))
+
+    def search():
+        found = 0
+        for _, neighbours in related.nearest(matrix, ids, matrix, ids):
+            found += len(neighbours)
+        return found
+
+    found, elapsed = stage("поиск соседей", search)
+    print(f"записей: {options.posts}, связей: {found}, "
+          f"{elapsed / options.posts * 1e6:.0f} мкс на запись")
+
+
+if __name__ == "__main__":
+    main()
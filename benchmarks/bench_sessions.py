@@ -0,0 +1,94 @@
+"""
+Сколько запросов к базе делает лента index для вошедшего пользователя
+со стандартными сессиями и с кэшированными сессией и пользователем
+(как в yatube.settings_production).
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_sessions.py [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+
+
+CACHED_MIDDLEWARE = [
+    "users.middleware.CachedAuthenticationMiddleware"
+    if middleware == "django.contrib.auth.middleware.AuthenticationMiddleware"
+    else middleware
+    for middleware in settings.MIDDLEWARE
+]
+
+MODES = (
+    ("db-сессии", {}),
+    ("cached_db + кэш пользователя", {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+        "MIDDLEWARE": CACHED_MIDDLEWARE,
+    }),
+)
+
+
+def populate():
+    from posts.models import Post, User
+
+    user = User.objects.create_user(username="bench", password="bench-pass-1")
+    for number in range(10):
+        Post.objects.create(text=f"Запись {number}", author=user)
+
+
+def measure(overrides, repeat):
+    with override_settings(**overrides):
+        cache.clear()
+        client = Client()
+        client.login(username="bench", password="bench-pass-1")
+        client.get("/")
+        with CaptureQueriesContext(connection) as queries:
+            client.get("/")
+        total = len(queries)
+        sessions = sum(
+            "django_session" in query["sql"]
+            for query in queries.captured_queries
+        )
+        started = time.perf_counter()
+        for _ in range(repeat):
+            client.get("/")
+        elapsed = time.perf_counter() - started
+    return total, sessions, elapsed / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    options = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    populate()
+    baseline = None
+    for title, overrides in MODES:
+        total, sessions, per_request = measure(overrides, options.repeat)
+        baseline = total if baseline is None else baseline
+        print(
+            f"{title:30} запросов: {total:3} (к django_session: {sessions}, "
+            f"сэкономлено: {baseline - total}), "
+            f"{per_request * 1000:6.2f} мс на страницу"
+        )
+
+
+if __name__ == "__main__":
+    main()
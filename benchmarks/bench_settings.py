@@ -0,0 +1,18 @@
+"""
+Настройки для бенчмарков, которым нужен сервер с данными: production
+профиль с отдельной базой SQLite из переменной BENCH_DB.
+"""
+
+import os
+
+# Сервер бенчмарка - один процесс без memcached
+os.environ.setdefault('DJANGO_LOCAL_CACHE', '1')
+
+from yatube.settings_production import *  # noqa: F401,F403,E402
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BENCH_DB'],
+    }
+}
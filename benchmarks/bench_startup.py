@@ -0,0 +1,101 @@
+"""
+Замер холодного старта и памяти воркеров для профилей настроек.
+
+Для каждого профиля в отдельном процессе измеряется время импорта
+приложения (django.setup + WSGI-приложение + прогрев), после чего
+процесс порождает несколько воркеров через fork, как gunicorn с
+preload_app, и каждый воркер сообщает свой RSS и приватную (USS)
+память. Чем меньше USS, тем больше страниц разделяется с мастером.
+
+Запуск из корня проекта (только Linux):
+
+    python benchmarks/bench_startup.py [--workers 4]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = ("yatube.settings", "yatube.settings_production")
+
+CHILD = r"""
+import json, os, sys, time
+
+def memory():
+    values = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0][:-1]] = int(parts[1])
+    return values["Rss"], values["Private_Clean"] + values["Private_Dirty"]
+
+started = time.perf_counter()
+from yatube.wsgi import application
+from yatube.warmup import warm_up
+warm_up()
+import_time = time.perf_counter() - started
+master_rss, _ = memory()
+
+workers = []
+for _ in range(int(sys.argv[1])):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        # Первый запрос в воркере: страница 404 проходит весь стек
+        # middleware и шаблонов, но не требует базы данных
+        from django.test import Client
+        Client().get("/no/such/page/")
+        os.write(write_fd, json.dumps(memory()).encode())
+        os._exit(0)
+    os.close(write_fd)
+    workers.append((pid, read_fd))
+
+results = []
+for pid, read_fd in workers:
+    results.append(json.loads(os.read(read_fd, 1024)))
+    os.waitpid(pid, 0)
+
+print(json.dumps({
+    "import_time": import_time,
+    "master_rss": master_rss,
+    "workers": results,
+}))
+"""
+
+
+def measure(settings_module, workers):
+    env = dict(
+        os.environ, DJANGO_SETTINGS_MODULE=settings_module, DJANGO_LOCAL_CACHE="1"
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", CHILD, str(workers)], cwd=ROOT, env=env
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    options = parser.parse_args()
+
+    for profile in PROFILES:
+        result = measure(profile, options.workers)
+        rss = [worker[0] for worker in result["workers"]]
+        uss = [worker[1] for worker in result["workers"]]
+        print(
+            f"{profile:28} импорт {result['import_time'] * 1000:7.1f} мс, "
+            f"мастер {result['master_rss'] / 1024:6.1f} МБ, "
+            f"воркер RSS {sum(rss) / len(rss) / 1024:6.1f} МБ, "
+            f"USS {sum(uss) / len(uss) / 1024:6.1f} МБ"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Замер стоимости отрисовки ленты: одна запись через {% include %}
+в цикле (как было) против цикла внутри includes/post_list.html.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_templates.py [--posts 10] [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.template import Context, Engine  # noqa: E402
+from django.template.backends.django import get_installed_libraries  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+
+OLD_ITEM = """
+<div class="card mb-3 mt-1 shadow-sm">
+    {% load thumbnail %}
+    {% thumbnail post.image "960x339" crop="center" upscale=True as im %}
+    <img class="card-img" src="{{ im.url }}" />
+    {% endthumbnail %}
+    <div class="card-body">
+        <p class="card-text">
+            <a name="post_{{ post.id }}" href="{% url 'profile' post.author.username %}">
+                <strong class="d-block text-gray-dark">@{{ post.author }}</strong>
+            </a>
+            {{ post.text|linebreaksbr }}
+        </p>
+        {% if post.group %}
+        <a class="card-link muted" href="{% url 'group' post.group.slug %}">
+                <strong class="d-block text-gray-dark">#{{ post.group.title }}</strong>
+        </a>
+        {% endif %}
+        <div class="d-flex justify-content-between align-items-center">
+            <div class="btn-group ">
+                <a class="btn btn-sm text-muted" href="{% url 'post' post.author.username post.id %}" role="button">
+                    {% if post.comments.exists %}
+                    {{ post.comments.count }} комментариев
+                    {% else%}
+                    Добавить комментарий
+                    {% endif %}
+                </a>
+                 {% if user == post.author %}
+                 <a class="btn btn-sm text-muted" href="{% url 'post_edit' post.author.username post.id %}"
+                        role="button">
+                        Редактировать
+                </a>
+                {% endif %}
+            </div>
+            <small class="text-muted">{{ post.pub_date }}</small>
+        </div>
+    </div>
+</div>
+"""
+
+OLD_LIST = """
+{% for post in posts %}
+    {% include "old_post_item.html" with post=post %}
+{% endfor %}
+"""
+
+NEW_LIST = '{% include "includes/post_list.html" with posts=posts %}'
+
+
+def make_engine(cached):
+    loaders = [
+        "django.template.loaders.filesystem.Loader",
+        ("django.template.loaders.locmem.Loader", {
+            "old_post_item.html": OLD_ITEM,
+            "old_list.html": OLD_LIST,
+            "new_list.html": NEW_LIST,
+        }),
+    ]
+    if cached:
+        loaders = [("django.template.loaders.cached.Loader", loaders)]
+    return Engine(
+        dirs=settings.TEMPLATES[0]["DIRS"],
+        loaders=loaders,
+        libraries=get_installed_libraries(),
+    )
+
+
+def populate(count):
+    from posts.models import Group, Post, User
+
+    user = User.objects.create_user(username="bench")
+    group = Group.objects.create(title="bench", slug="bench", description="")
+    for number in range(count):
+        Post.objects.create(
+            text=f"Запись {number}\nвторая строка", author=user, group=group
+        )
+    # Комментарии подгружаются заранее, чтобы замер не включал запросы к БД
+    posts = Post.objects.select_related("author", "group").prefetch_related(
+        "comments"
+    )
+    return user, list(posts[:count])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=200)
+    options = parser.parse_args()
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    user, posts = populate(options.posts)
+
+    for cached in (False, True):
+        engine = make_engine(cached)
+        for name in ("old_list.html", "new_list.html"):
+            context = {"posts": posts, "user": user}
+
+            def render():
+                engine.get_template(name).render(Context(context))
+
+            render()
+            seconds = timeit.timeit(render, number=options.repeat)
+            per_post = seconds / options.repeat / options.posts * 1e6
+            print(
+                f"{'cached' if cached else 'plain ':6} {name:14} "
+                f"{per_post:8.1f} мкс на запись"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Сколько стоят ссылки в ленте: один адрес через reverse() и через
+yatube.urlbuilder.url_for, и отрисовка карточек записей
+(includes/post_list.html) со ссылками через {% url %} и через
+get_absolute_url моделей, в микросекундах.
+
+Записи создаются в памяти, без базы: замеряется только построение
+адресов и шаблон.
+
+Запуск из корня проекта:
+
+    python benchmarks/bench_urls.py [--posts 10] [--repeat 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.template import Context, Template  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from posts.models import Group, Post  # noqa: E402
+from yatube import urlbuilder  # noqa: E402
+
+
+# Та же разметка ссылок, что в includes/post_list.html
+CARD = """{% for post in posts %}
+<a href="LINK_PROFILE">@{{ post.author }}</a>
+<a href="LINK_GROUP">#{{ post.group.title }}</a>
+<a href="LINK_POST">{{ post.comments_count }}</a>
+<a href="LINK_EDIT">Редактировать</a>
+{% endfor %}"""
+
+WITH_REVERSE = {
+    "LINK_PROFILE": "{% url 'profile' post.author.username %}",
+    "LINK_GROUP": "{% url 'group' post.group.slug %}",
+    "LINK_POST": "{% url 'post' post.author.username post.id %}",
+    "LINK_EDIT": "{% url 'post_edit' post.author.username post.id %}",
+}
+WITH_BUILDER = {
+    "LINK_PROFILE": "{{ post.author.get_absolute_url }}",
+    "LINK_GROUP": "{{ post.group.get_absolute_url }}",
+    "LINK_POST": "{{ post.get_absolute_url }}",
+    "LINK_EDIT": "{{ post.get_edit_url }}",
+}
+
+
+def make_template(links):
+    source = CARD
+    for placeholder, link in links.items():
+        source = source.replace(placeholder, link)
+    return Template(source)
+
+
+def make_posts(count):
+    User = get_user_model()
+    posts = []
+    for number in range(count):
+        author = User(pk=number + 1, username=f"author{number}")
+        group = Group(pk=number + 1, title=f"Группа {number}", slug=f"group-{number}")
+        posts.append(Post(
+            pk=number + 1, text="текст", author=author, group=group,
+            comments_count=number,
+        ))
+    return posts
+
+
+def measure(func, repeat, rounds=5):
+    # Лучший из нескольких прогонов: меньше влияние сборщика мусора
+    # и соседних процессов
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=2000)
+    options = parser.parse_args()
+
+    urlbuilder.warm_up()
+    kwargs = {"username": "leo", "post_id": 1}
+    single_reverse = measure(
+        lambda: reverse("post", kwargs=kwargs), options.repeat * 10
+    )
+    single_builder = measure(
+        lambda: urlbuilder.url_for("post", **kwargs), options.repeat * 10
+    )
+    print(f"{'reverse, один адрес':30} {single_reverse:8.2f} мкс")
+    print(f"{'url_for, один адрес':30} {single_builder:8.2f} мкс")
+
+    context = Context({"posts": make_posts(options.posts)})
+    old, new = make_template(WITH_REVERSE), make_template(WITH_BUILDER)
+    assert old.render(context) == new.render(context)
+    rendered_old = measure(lambda: old.render(context), options.repeat)
+    rendered_new = measure(lambda: new.render(context), options.repeat)
+    print(f"{'лента, {% url %}':30} {rendered_old:8.2f} мкс")
+    print(f"{'лента, get_absolute_url':30} {rendered_new:8.2f} мкс "
+          f"(-{rendered_old - rendered_new:.2f} мкс на {options.posts} записей)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+# С кэшем в памяти процесса (DJANGO_LOCAL_CACHE=1) процессы не видят
+# изменений друг друга, поэтому по умолчанию воркер один
+if os.environ.get("DJANGO_LOCAL_CACHE") == "1":
+    default_workers = 1
+else:
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get("GUNICORN_WORKERS", default_workers))
+raw_env = [
+    "DJANGO_SETTINGS_MODULE="
+    + os.environ.get("DJANGO_SETTINGS_MODULE", "yatube.settings_production"),
+]
+
+# Приложение загружается в мастере до fork, воркеры получают
+# уже импортированный код и разобранные шаблоны через copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    from yatube.warmup import warm_up
+
+    warm_up()
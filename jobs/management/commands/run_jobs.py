@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = "Запускает обработчик фоновых задач"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Количество потоков",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=10,
+            help="Сколько задач забирать за один раз",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0,
+            help="Пауза в секундах, если очередь пуста",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Выполнить накопившиеся задачи и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        work(
+            workers=options["workers"],
+            batch=options["batch"],
+            poll_interval=options["poll_interval"],
+            once=options["once"],
+        )
@@ -0,0 +1,84 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job
+
+
+_registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, key=None, countdown=0, **kwargs):
+        return enqueue(
+            self.name, args, kwargs,
+            key=key, countdown=countdown, max_attempts=self.max_attempts,
+        )
+
+
+def task(name=None, max_attempts=5):
+    """
+    Регистрирует функцию как фоновую задачу:
+
+        @task()
+        def resize(post_id): ...
+
+        resize.delay(post.pk, key=f"resize-{post.pk}")
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        _registry[task_name] = Task(func, task_name, max_attempts)
+        return _registry[task_name]
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def is_eager():
+    return getattr(settings, "JOBS_EAGER", False)
+
+
+def enqueue(name, args=(), kwargs=None, key=None, countdown=0,
+            max_attempts=5):
+    """
+    Ставит задачу в очередь. Пока задача с ключом key ждет в очереди
+    или выполняется, повторно она не создается, возвращается
+    существующая запись. Завершенная задача ключ освобождает.
+    В режиме JOBS_EAGER задача выполняется сразу, а запись не создается.
+    """
+    kwargs = kwargs or {}
+    if is_eager():
+        get_task(name)(*args, **kwargs)
+        return None
+    payload = json.dumps({"args": list(args), "kwargs": kwargs})
+    run_at = timezone.now() + timedelta(seconds=countdown)
+    if key is None:
+        return Job.objects.create(
+            name=name, payload=payload, run_at=run_at,
+            max_attempts=max_attempts,
+        )
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                name=name, payload=payload, run_at=run_at, key=key,
+                max_attempts=max_attempts,
+            )
+    except IntegrityError:
+        job = Job.objects.filter(key=key).first()
+        if job is None:
+            # Задача завершилась между попыткой вставки и чтением
+            return enqueue(name, args, kwargs, key, countdown, max_attempts)
+        return job
@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.registry import task
+from jobs.worker import prune_jobs, run_batch
+
+
+calls = []
+
+
+@task(name="jobs.tests.record", max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task(name="jobs.tests.explode", max_attempts=2)
+def explode():
+    raise ValueError("boom")
+
+
+class TestJobs(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        record.delay(1)
+        self.assertEqual(calls, [])
+        self.assertEqual(run_batch(), 1)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        self.assertEqual(run_batch(), 0)
+
+    def test_idempotency_key(self):
+        first = record.delay(1, key="once")
+        second = record.delay(2, key="once")
+        self.assertEqual(first.pk, second.pk)
+        run_batch()
+        self.assertEqual(calls, [1])
+
+    def test_key_released_when_finished(self):
+        """
+        Тест проверяет, что после выполнения или ошибки задачу
+        с тем же ключом можно поставить снова.
+        """
+        first = record.delay(1, key="again")
+        run_batch()
+        second = record.delay(2, key="again")
+        self.assertNotEqual(first.pk, second.pk)
+        run_batch()
+        self.assertEqual(calls, [1, 2])
+
+        failed = explode.delay(key="boom")
+        Job.objects.filter(pk=failed.pk).update(max_attempts=1)
+        run_batch()
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, Job.FAILED)
+        self.assertNotEqual(explode.delay(key="boom").pk, failed.pk)
+
+    @override_settings(JOBS_KEEP_DONE=60, JOBS_KEEP_FAILED=600)
+    def test_prune_finished_jobs(self):
+        old = timezone.now() - timedelta(seconds=120)
+        done = Job.objects.create(name="jobs.tests.record", status=Job.DONE)
+        failed = Job.objects.create(name="jobs.tests.record", status=Job.FAILED)
+        pending = Job.objects.create(name="jobs.tests.record")
+        Job.objects.update(updated=old)
+        fresh = Job.objects.create(name="jobs.tests.record", status=Job.DONE)
+        self.assertEqual(prune_jobs(batch_size=1), 1)
+        self.assertEqual(
+            set(Job.objects.values_list("pk", flat=True)),
+            {failed.pk, pending.pk, fresh.pk},
+        )
+        self.assertFalse(Job.objects.filter(pk=done.pk).exists())
+
+    def test_retry_with_backoff(self):
+        job = explode.delay()
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("boom", job.last_error)
+        self.assertEqual(run_batch(), 0, "Повтор не должен начаться до паузы")
+
+        Job.objects.filter(pk=job.pk).update(run_at=job.created)
+        run_batch()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    @override_settings(JOBS_RUNNING_TIMEOUT=60)
+    def test_stale_running_job_reclaimed(self):
+        """
+        Тест проверяет, что задачу, брошенную умершим воркером,
+        после таймаута выполняет следующий воркер.
+        """
+        job = record.delay(4, key="stuck")
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, updated=timezone.now() - timedelta(seconds=30)
+        )
+        self.assertEqual(run_batch(), 0, "Задача еще может выполняться")
+        Job.objects.filter(pk=job.pk).update(
+            updated=timezone.now() - timedelta(seconds=120)
+        )
+        self.assertEqual(run_batch(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, [4])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        self.assertIsNone(record.delay(3))
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
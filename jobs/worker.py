@@ -0,0 +1,173 @@
+import json
+import logging
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task
+
+
+logger = logging.getLogger(__name__)
+
+
+def backoff_delay(attempts):
+    """
+    Задержка перед повторной попыткой растет экспоненциально.
+    """
+    base = getattr(settings, "JOBS_BACKOFF_BASE", 2)
+    limit = getattr(settings, "JOBS_BACKOFF_MAX", 3600)
+    return min(base ** attempts, limit)
+
+
+def _finished(status):
+    """
+    Завершенная задача освобождает ключ идемпотентности, чтобы
+    следующий .delay() с тем же ключом поставил задачу заново.
+    """
+    if status in (Job.DONE, Job.FAILED):
+        return {"status": status, "key": None}
+    return {"status": status}
+
+
+def reclaim_stale_jobs(limit=100):
+    """
+    Возвращает в очередь задачи, которые дольше JOBS_RUNNING_TIMEOUT
+    секунд остаются в RUNNING: воркер, забравший их, скорее всего
+    завершился посреди выполнения. Это считается неудачной попыткой.
+    Без этого задача с ключом идемпотентности зависла бы навсегда,
+    а новые .delay() с тем же ключом возвращали бы ее же.
+    """
+    timeout = getattr(settings, "JOBS_RUNNING_TIMEOUT", 3600)
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING, updated__lt=now - timedelta(seconds=timeout)
+    ).values_list("pk", "attempts", "max_attempts", "updated")[:limit]
+    reclaimed = 0
+    for pk, attempts, max_attempts, updated in list(stale):
+        attempts += 1
+        status = Job.FAILED if attempts >= max_attempts else Job.PENDING
+        # Другой воркер мог вернуть задачу раньше
+        reclaimed += Job.objects.filter(
+            pk=pk, status=Job.RUNNING, updated=updated
+        ).update(
+            **_finished(status), attempts=attempts, run_at=now,
+            last_error=f"Задача не завершилась за {timeout} с",
+            updated=now,
+        )
+    if reclaimed:
+        logger.warning("Reclaimed %s stale running jobs", reclaimed)
+    return reclaimed
+
+
+def claim_jobs(limit):
+    """
+    Забирает до limit готовых к запуску задач. Задача считается
+    захваченной, только если именно этот процесс перевел ее в RUNNING,
+    поэтому несколько воркеров могут работать с одной таблицей.
+    """
+    reclaim_stale_jobs()
+    candidates = Job.objects.filter(
+        status=Job.PENDING, run_at__lte=timezone.now()
+    ).values_list("pk", flat=True)[:limit]
+    claimed = []
+    for pk in list(candidates):
+        updated = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING, updated=timezone.now()
+        )
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def run_job(pk):
+    job = Job.objects.get(pk=pk)
+    payload = json.loads(job.payload)
+    try:
+        get_task(job.name)(*payload["args"], **payload["kwargs"])
+    except Exception:
+        attempts = job.attempts + 1
+        error = traceback.format_exc()
+        logger.exception("Job %s (%s) failed", job.pk, job.name)
+        if attempts >= job.max_attempts:
+            status, run_at = Job.FAILED, job.run_at
+        else:
+            status = Job.PENDING
+            run_at = timezone.now() + timedelta(seconds=backoff_delay(attempts))
+        Job.objects.filter(pk=pk).update(
+            **_finished(status), attempts=attempts, run_at=run_at,
+            last_error=error, updated=timezone.now(),
+        )
+        return False
+    Job.objects.filter(pk=pk).update(
+        **_finished(Job.DONE), attempts=job.attempts + 1,
+        updated=timezone.now(),
+    )
+    return True
+
+
+def prune_jobs(batch_size=1000):
+    """
+    Удаляет выполненные задачи старше JOBS_KEEP_DONE секунд и
+    задачи с ошибкой старше JOBS_KEEP_FAILED секунд пачками
+    по batch_size строк. Возвращает количество удаленных.
+    """
+    now = timezone.now()
+    keep = {
+        Job.DONE: getattr(settings, "JOBS_KEEP_DONE", 24 * 60 * 60),
+        Job.FAILED: getattr(settings, "JOBS_KEEP_FAILED", 7 * 24 * 60 * 60),
+    }
+    deleted = 0
+    for status, seconds in keep.items():
+        old = Job.objects.filter(
+            status=status, updated__lt=now - timedelta(seconds=seconds)
+        )
+        while True:
+            pks = list(old.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted += Job.objects.filter(pk__in=pks).delete()[0]
+    return deleted
+
+
+def _run_in_thread(pk):
+    close_old_connections()
+    try:
+        return run_job(pk)
+    finally:
+        connection.close()
+
+
+def run_batch(executor=None, limit=10):
+    """
+    Выполняет одну пачку задач. Без executor задачи выполняются
+    последовательно в текущем потоке. Возвращает количество задач.
+    """
+    claimed = claim_jobs(limit)
+    if executor is None:
+        for pk in claimed:
+            run_job(pk)
+    else:
+        list(executor.map(_run_in_thread, claimed))
+    return len(claimed)
+
+
+def work(workers=4, batch=10, poll_interval=1.0, once=False):
+    prune_interval = getattr(settings, "JOBS_PRUNE_INTERVAL", 60 * 60)
+    pruned_at = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            if time.monotonic() - pruned_at >= prune_interval:
+                prune_jobs()
+                pruned_at = time.monotonic()
+            done = run_batch(executor, limit=batch)
+            if once and not done:
+                return
+            if not done:
+                close_old_connections()
+                time.sleep(poll_interval)
@@ -1,28 +1,75 @@
 from django.contrib import admin
-from .models import Post, Group, Comment
+from .deletion import (
+    delete_comments, delete_group, delete_posts, schedule_purge,
+)
+from .models import Post, Group, Comment, Fingerprint
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author')
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """
+    Удаление из админки только помечает строки; стирает их фоновая
+    задача (posts.deletion). Помеченные строки видны в списке.
+    Подклассы переопределяют soft_delete, если при удалении нужно
+    пересчитать счетчики.
+    """
+    def soft_delete(self, queryset):
+        if queryset.update(is_deleted=True):
+            schedule_purge()
+
+    def get_queryset(self, request):
+        return self.model.all_objects.all()
+
+    def delete_model(self, request, obj):
+        self.soft_delete(self.model.all_objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        self.soft_delete(queryset)
+
+
+class PostAdmin(SoftDeleteAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'is_deleted')
     search_fields = ('text', 'author',)
     list_filter = ('pub_date', 'text',)
     empty_value_display = ('-пусто-')
 
+    def soft_delete(self, queryset):
+        delete_posts(queryset)
+
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'title', 'description')
+    list_display = ('pk', 'title', 'description', 'posts_count',
+                    'last_post_date')
     search_fields = ('title', 'description',)
     list_filter = ('title', 'description',)
     empty_value_display = ('-пусто-')
 
+    def delete_model(self, request, obj):
+        delete_group(obj)
 
-class CommentAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'author', 'text', 'post', 'created')
+    def delete_queryset(self, request, queryset):
+        for group in queryset:
+            delete_group(group)
+
+
+class CommentAdmin(SoftDeleteAdmin):
+    list_display = ('pk', 'author', 'text', 'post', 'created', 'is_deleted')
     search_fields = ('author', 'text', 'post')
     list_filter = ('author', 'text', 'post')
     empty_value_display = ('-пусто-')
 
+    def soft_delete(self, queryset):
+        delete_comments(queryset)
+
+
+class FingerprintAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'object_id', 'duplicate_of')
+    list_filter = ('kind',)
+    search_fields = ('object_id', 'duplicate_of')
+    exclude = ('signature',)
+    empty_value_display = ('-пусто-')
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(Fingerprint, FingerprintAdmin)
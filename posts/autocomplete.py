@@ -0,0 +1,57 @@
+"""
+Поиск сообществ по началу названия или slug для выбора сообщества
+в форме записи.
+
+Поиск идет по диапазону [префикс, префикс + U+FFFF) в индексах
+search_title и slug, без просмотра таблицы. Ответы кэшируются по
+префиксу; изменение любого сообщества увеличивает номер поколения,
+и старые ответы перестают использоваться.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Group
+
+
+RESULTS_LIMIT = 10
+MAX_QUERY_LENGTH = 50
+CACHE_TIMEOUT = 300
+GENERATION_KEY = "group-autocomplete:generation"
+
+
+def invalidate():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _prefix_range(field, prefix):
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix + "\uffff"})
+
+
+def search_groups(query):
+    """
+    Возвращает до RESULTS_LIMIT сообществ как список словарей
+    id/title/slug.
+    """
+    prefix = query.strip().lower()[:MAX_QUERY_LENGTH]
+    if not prefix:
+        return []
+    generation = cache.get_or_set(GENERATION_KEY, 1, None)
+    # Префикс может содержать пробелы и не-ASCII, недопустимые
+    # в ключах memcached
+    digest = hashlib.md5(prefix.encode()).hexdigest()
+    key = f"group-autocomplete:{generation}:{digest}"
+    results = cache.get(key)
+    if results is None:
+        results = list(
+            Group.objects.filter(
+                _prefix_range("search_title", prefix) | _prefix_range("slug", prefix)
+            ).values("id", "title", "slug")[:RESULTS_LIMIT]
+        )
+        cache.set(key, results, CACHE_TIMEOUT)
+    return results
@@ -0,0 +1,124 @@
+"""
+Групповая запись комментариев.
+
+При всплеске комментариев каждый запрос брал блокировку записи SQLite
+ради одной строки. Здесь запросы процесса складывают комментарии
+в общий буфер; первый из них становится ведущим и записывает все
+накопившееся одним bulk_create в одной транзакции, остальные ждут,
+пока их комментарий будет записан. Пока ведущий пишет, буфер
+наполняется следующей пачкой, так что одиночный комментарий
+не ждет, а под нагрузкой число транзакций падает в разы.
+
+add() возвращается только после фиксации транзакции: автор сразу
+после перенаправления видит свой комментарий.
+"""
+
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import fingerprints, rendering, threads
+from .models import Comment, Fingerprint, Post
+from .signals import publish_on_commit
+
+
+class _Pending:
+    def __init__(self, comment):
+        self.comment = comment
+        self.done = False
+        self.error = None
+
+
+class CommentBatcher:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = []
+        self._flushing = False
+
+    def add(self, comment):
+        """
+        Записывает комментарий вместе с комментариями других запросов
+        и возвращает его с заполненным pk.
+        """
+        entry = _Pending(comment)
+        with self._condition:
+            self._pending.append(entry)
+            while self._flushing and not entry.done:
+                self._condition.wait()
+            lead = not entry.done
+            if lead:
+                self._flushing = True
+        if lead:
+            self._lead(entry)
+        if entry.error is not None:
+            raise entry.error
+        return comment
+
+    def _lead(self, entry):
+        try:
+            while not entry.done:
+                window = getattr(settings, "COMMENT_BATCH_WINDOW", 0)
+                if window:
+                    # Даем соседним запросам присоединиться к пачке
+                    time.sleep(window)
+                size = getattr(settings, "COMMENT_BATCH_SIZE", 100)
+                with self._condition:
+                    batch = self._pending[:size]
+                    del self._pending[:size]
+                self._flush(batch)
+        finally:
+            with self._condition:
+                self._flushing = False
+                self._condition.notify_all()
+
+    def _flush(self, batch):
+        comments = [entry.comment for entry in batch]
+        try:
+            write_comments(comments)
+        except Exception as error:
+            for entry in batch:
+                entry.error = error
+        with self._condition:
+            for entry in batch:
+                entry.done = True
+            self._condition.notify_all()
+
+
+def write_comments(comments):
+    """
+    Вставляет комментарии одним запросом и обновляет счетчики записей.
+    """
+    # bulk_create не вызывает save(): HTML текста считается здесь
+    rendering.render_many(comments)
+    with transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        if comments[0].pk is None:
+            # SQLite не возвращает pk из bulk_create. Внутри транзакции
+            # блокировка записи уже у нас, поэтому последние строки
+            # таблицы - только что вставленные, в порядке вставки
+            ids = list(
+                Comment.objects.order_by("-pk").values_list("pk", flat=True)
+                [:len(comments)]
+            )
+            for comment, pk in zip(comments, reversed(ids)):
+                comment.pk = pk
+        threads.attach(comments)
+        for post_id, added in Counter(c.post_id for c in comments).items():
+            Post.objects.filter(pk=post_id).update(
+                comments_count=F("comments_count") + added
+            )
+        # bulk_create не вызывает post_save: отпечатки и события здесь
+        fingerprints.index(Fingerprint.COMMENT, comments)
+        for comment in comments:
+            publish_on_commit(f"post:{comment.post_id}", comment.pk)
+
+
+_batcher = CommentBatcher()
+
+
+def add_comment(comment):
+    return _batcher.add(comment)
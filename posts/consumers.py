@@ -0,0 +1,163 @@
+import asyncio
+
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import render
+from django.template.loader import render_to_string
+
+from yatube.async_views import AsyncPageConsumer, EventStreamConsumer, run_sync
+
+from . import likes, threads
+from .forms import CommentForm
+from .models import Comment, Follow, Post, RelatedPost
+
+
+PAGE_SIZE = 10
+# Сколько пропущенных элементов отдается после переподключения
+BACKLOG_SIZE = 50
+
+
+def _get_post(username, post_id):
+    post = Post.objects.select_related("author", "group").filter(
+        author__username=username, id=post_id
+    ).first()
+    if post is None:
+        raise Http404("No Post matches the given query.")
+    return post
+
+
+def _get_post_with_comments(username, post_id, after):
+    post = _get_post(username, post_id)
+    return post, threads.page(post, after=after)
+
+
+def _is_following(user, username):
+    if not user.is_authenticated:
+        return False
+    return Follow.objects.filter(user=user, author__username=username).exists()
+
+
+class IndexConsumer(AsyncPageConsumer):
+    """
+    Асинхронный вариант posts.views.index: количество записей и сама
+    страница ленты запрашиваются одновременно.
+    """
+
+    async def get_response(self, request):
+        post_list = Post.objects.select_related("author", "group")
+        try:
+            number = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            number = 1
+        offset = (number - 1) * PAGE_SIZE
+        count, posts = await asyncio.gather(
+            run_sync(post_list.count),
+            run_sync(list, post_list[offset:offset + PAGE_SIZE]),
+        )
+        paginator = Paginator(post_list, PAGE_SIZE)
+        paginator.count = count
+        if number > paginator.num_pages:
+            # Как get_page: номер за пределами ленты ведет на последнюю
+            page = paginator.get_page(number)
+        else:
+            page = paginator.page(number)
+            page.object_list = posts
+        liked = await run_sync(likes.liked_ids, request.user, page.object_list)
+        return await run_sync(render, request, "index.html", {
+            "page": page, "paginator": paginator, "liked": liked,
+        })
+
+
+class PostConsumer(AsyncPageConsumer):
+    """
+    Асинхронный вариант posts.views.post_view: запись с комментариями,
+    три счетчика, подписка и похожие записи запрашиваются одновременно.
+    """
+
+    async def get_response(self, request, username, post_id):
+        thread, post_sum, followers_sum, following_sum, following, related = (
+            await asyncio.gather(
+                run_sync(
+                    _get_post_with_comments, username, post_id,
+                    request.GET.get("after", ""),
+                ),
+                run_sync(Post.objects.filter(author__username=username).count),
+                run_sync(Follow.objects.filter(author__username=username).count),
+                run_sync(Follow.objects.filter(user__username=username).count),
+                run_sync(_is_following, request.user, username),
+                run_sync(list, RelatedPost.objects.filter(
+                    post_id=post_id, related__is_deleted=False
+                ).select_related("related__author")),
+            )
+        )
+        post, (comments, next_after) = thread
+        params = {
+            "post": post,
+            "related": related,
+            "posts": [post],
+            "liked": await run_sync(likes.liked_ids, request.user, [post]),
+            "author": post.author,
+            "items": comments,
+            "next_after": next_after,
+            "form": CommentForm(),
+            "followers_sum": followers_sum,
+            "following_sum": following_sum,
+            "post_sum": post_sum,
+        }
+        if request.user.is_authenticated:
+            params["following"] = following
+        return await run_sync(render, request, "post.html", params)
+
+
+def _select_new(queryset, ids, after):
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    return list(queryset.order_by("pk")[:BACKLOG_SIZE])
+
+
+class FeedStreamConsumer(EventStreamConsumer):
+    """
+    Новые записи для ленты; каждая приходит готовым фрагментом
+    includes/post_list.html.
+    """
+
+    event = "post"
+
+    def get_channels(self, request):
+        return ["feed"]
+
+    def get_items(self, request, ids=None, after=None):
+        posts = Post.objects.select_related("author", "group")
+        return _select_new(posts, ids, after)
+
+    def render_item(self, request, item):
+        return render_to_string(
+            "includes/post_list.html", {"posts": [item]}, request
+        )
+
+
+class CommentStreamConsumer(EventStreamConsumer):
+    """
+    Новые комментарии к записи; каждый приходит готовым фрагментом
+    includes/comments.html.
+    """
+
+    event = "comment"
+
+    def get_channels(self, request, username, post_id):
+        if not Post.objects.filter(author__username=username, id=post_id).exists():
+            raise Http404("No Post matches the given query.")
+        return [f"post:{post_id}"]
+
+    def get_items(self, request, username, post_id, ids=None, after=None):
+        comments = Comment.objects.select_related("author", "post__author").filter(
+            post_id=post_id
+        )
+        return _select_new(comments, ids, after)
+
+    def render_item(self, request, item):
+        return render_to_string(
+            "includes/comments.html", {"items": [item]}, request
+        )
@@ -0,0 +1,212 @@
+"""
+Мягкое удаление записей, комментариев, сообществ и пользователей.
+
+Удаление через Model.delete() собирает в память все связанные
+объекты и удаляет их по одному запросу на модель в одной длинной
+транзакции; для активного автора или большого сообщества это
+блокирует базу надолго. Здесь строки сначала только помечаются
+is_deleted одним UPDATE: менеджеры по умолчанию сразу перестают их
+показывать, счетчики пересчитываются. Затем фоновая задача
+purge_deleted стирает помеченное пачками по PURGE_BATCH_SIZE строк
+прямыми DELETE ... WHERE id IN (...), каждая пачка в своей короткой
+транзакции.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .likes import remove_user_likes
+from .models import (
+    Comment, DigestOptOut, Fingerprint, FingerprintBucket, Follow, Group, Like,
+    LikeCounter, Mention, Notification, Post, PostEvent, PostTag, RelatedPost,
+)
+from .signals import invalidate_group_index, refresh_last_post_date
+from .storage import release
+from .threads import refresh_replies_count, subtree
+from .tasks import purge_deleted, purge_group, purge_user
+
+
+def batch_size():
+    return getattr(settings, "PURGE_BATCH_SIZE", 500)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    size = batch_size()
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _raw_delete(queryset):
+    # Один DELETE без сборщика связанных объектов и без сигналов:
+    # зависимые строки удаляются раньше явно
+    return queryset._raw_delete(queryset.db)
+
+
+def schedule_purge():
+    """
+    Ставит задачу очистки. Удаления в пределах минуты обслуживает
+    одна задача.
+    """
+    minute = int(time.time()) // 60
+    purge_deleted.delay(key=f"purge-deleted-{minute}", countdown=60)
+
+
+def refresh_group_counters(group_ids):
+    for group_id in group_ids:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=Post.objects.filter(group_id=group_id).count()
+        )
+        refresh_last_post_date(group_id)
+    if group_ids:
+        invalidate_group_index()
+
+
+def refresh_comments_count(post_ids):
+    visible = Comment.objects.filter(post=OuterRef("pk")).order_by().values(
+        "post"
+    ).annotate(total=Count("pk")).values("total")
+    for chunk in _chunks(post_ids):
+        Post.all_objects.filter(pk__in=chunk).update(
+            comments_count=Coalesce(Subquery(visible), 0)
+        )
+
+
+def delete_posts(queryset):
+    """
+    Скрывает записи и планирует их удаление. Возвращает число записей.
+    """
+    group_ids = set(
+        queryset.exclude(group=None).values_list("group_id", flat=True)
+    )
+    # Уведомления о скрытых записях больше не считаются непрочитанными
+    # и не попадают в дайджест, не требуя соединения с записями
+    Notification.objects.filter(post__in=queryset).update(
+        is_read=True, is_emailed=True
+    )
+    deleted = queryset.update(is_deleted=True)
+    refresh_group_counters(group_ids)
+    if deleted:
+        schedule_purge()
+    return deleted
+
+
+def delete_comments(queryset):
+    """
+    Скрывает комментарии вместе с ответами на них и планирует
+    их удаление.
+    """
+    post_ids = set(queryset.values_list("post_id", flat=True))
+    parent_ids = set(queryset.exclude(parent=None).values_list("parent_id", flat=True))
+    threads = list(queryset.exclude(replies_count=0).values_list("post_id", "path"))
+    deleted = queryset.update(is_deleted=True)
+    for post_id, path in threads:
+        Comment.objects.filter(post_id=post_id, **subtree(path)).update(is_deleted=True)
+    refresh_comments_count(post_ids)
+    refresh_replies_count(parent_ids)
+    if deleted:
+        schedule_purge()
+    return deleted
+
+
+def delete_group(group):
+    """
+    Скрывает записи сообщества; само сообщество удаляется после них.
+    """
+    delete_posts(Post.objects.filter(group=group))
+    purge_group.delay(group.pk, key=f"purge-group-{group.pk}")
+
+
+def delete_user(user):
+    """
+    Блокирует пользователя и скрывает его записи и комментарии;
+    подписки и сама учетная запись удаляются фоновой задачей.
+    """
+    user.is_active = False
+    user.save(update_fields=["is_active"])
+    delete_posts(Post.objects.filter(author=user))
+    delete_comments(Comment.objects.filter(author=user))
+    purge_user.delay(user.pk, key=f"purge-user-{user.pk}")
+
+
+def _purge_comments(ids):
+    with transaction.atomic():
+        _raw_delete(FingerprintBucket.objects.filter(
+            kind=Fingerprint.COMMENT, object_id__in=ids
+        ))
+        _raw_delete(Fingerprint.objects.filter(
+            kind=Fingerprint.COMMENT, object_id__in=ids
+        ))
+        _raw_delete(Comment.all_objects.filter(pk__in=ids))
+
+
+def _purge_posts(ids):
+    with transaction.atomic():
+        _raw_delete(Notification.objects.filter(post_id__in=ids))
+        _raw_delete(PostEvent.objects.filter(post_id__in=ids))
+        _raw_delete(PostTag.objects.filter(post_id__in=ids))
+        _raw_delete(Mention.objects.filter(post_id__in=ids))
+        _raw_delete(Like.objects.filter(post_id__in=ids))
+        _raw_delete(LikeCounter.objects.filter(post_id__in=ids))
+        _raw_delete(RelatedPost.objects.filter(
+            Q(post_id__in=ids) | Q(related_id__in=ids)
+        ))
+        _raw_delete(FingerprintBucket.objects.filter(
+            kind=Fingerprint.POST, object_id__in=ids
+        ))
+        _raw_delete(Fingerprint.objects.filter(
+            kind=Fingerprint.POST, object_id__in=ids
+        ))
+        # Комментарии удаленных записей стираются отдельными пачками
+        # раньше; здесь - лишь появившиеся за это время
+        _raw_delete(Comment.all_objects.filter(post_id__in=ids))
+        release(Post.all_objects.filter(pk__in=ids).exclude(
+            image=""
+        ).exclude(image=None).values_list("image", flat=True))
+        _raw_delete(Post.all_objects.filter(pk__in=ids))
+
+
+def purge_batch():
+    """
+    Стирает одну пачку помеченных строк. Возвращает число строк,
+    0 - если стирать больше нечего.
+    """
+    ids = list(Comment.all_objects.filter(
+        Q(is_deleted=True) | Q(post__is_deleted=True)
+    ).values_list("pk", flat=True)[:batch_size()])
+    if ids:
+        _purge_comments(ids)
+        return len(ids)
+    ids = list(Post.all_objects.filter(
+        is_deleted=True
+    ).values_list("pk", flat=True)[:batch_size()])
+    if ids:
+        _purge_posts(ids)
+    return len(ids)
+
+
+def _purge_in_batches(queryset):
+    model = queryset.model
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size()])
+        if not ids:
+            return
+        _raw_delete(model._base_manager.filter(pk__in=ids))
+
+
+def purge_user_relations(user_id):
+    """
+    Стирает пачками подписки пользователя и на него, его уведомления,
+    отказ от дайджестов, упоминания и отметки «нравится».
+    """
+    _purge_in_batches(
+        Follow.objects.filter(Q(user_id=user_id) | Q(author_id=user_id))
+    )
+    _purge_in_batches(Notification.objects.filter(user_id=user_id))
+    _purge_in_batches(DigestOptOut.objects.filter(user_id=user_id))
+    _purge_in_batches(Mention.objects.filter(user_id=user_id))
+    remove_user_likes(user_id, batch_size())
@@ -0,0 +1,192 @@
+"""
+Поиск почти-дубликатов среди записей и комментариев.
+
+Текст приводится к нижнему регистру и разбивается на шинглы из
+SHINGLE_SIZE слов подряд. MinHash-подпись из NUM_PERM чисел сохраняет
+сходство по Жаккару: доля совпадающих чисел двух подписей оценивает
+долю общих шинглов. Подпись делится на BANDS полос по ROWS чисел,
+хэш каждой полосы - корзина LSH в таблице FingerprintBucket. Тексты
+со сходством выше ~0.5 почти наверняка делят хотя бы одну корзину,
+поэтому проверка нового текста - один запрос по индексу из BANDS
+ключей и сравнение подписей немногих кандидатов, независимо от числа
+текстов в базе.
+
+Комментарии сравниваются только с комментариями той же записи: номер
+записи входит в ключи их корзин. Одна и та же короткая фраза под
+разными записями дубликатом не считается.
+
+Индекс пополняется при сохранении записи или комментария (сигналы
+и групповая запись комментариев), для уже существующих строк его
+строит команда build_fingerprints.
+"""
+
+import hashlib
+import random
+import re
+import struct
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Fingerprint, FingerprintBucket
+
+
+SHINGLE_SIZE = 3
+BANDS = 16
+ROWS = 4
+NUM_PERM = BANDS * ROWS
+MAX_CANDIDATES = 20
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r"\w+")
+
+# Параметры перестановок фиксированы: подписи, посчитанные в разных
+# процессах и в разное время, должны совпадать
+_rng = random.Random(20200801)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def _hash(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=4).digest(), "big")
+
+
+def shingles(text):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < getattr(settings, "SPAM_MIN_WORDS", 5):
+        # Короткие тексты ("Спасибо!") повторяются законно
+        return set()
+    return {
+        _hash(" ".join(words[i:i + SHINGLE_SIZE]).encode())
+        for i in range(max(1, len(words) - SHINGLE_SIZE + 1))
+    }
+
+
+def signature(text):
+    """
+    MinHash-подпись текста или None, если текст слишком короткий.
+    """
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    return [
+        min((a * x + b) % _PRIME for x in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def pack(values):
+    return struct.pack(f">{NUM_PERM}I", *values)
+
+
+def unpack(data):
+    return struct.unpack(f">{NUM_PERM}I", bytes(data))
+
+
+def similarity(first, second):
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def scope_of(kind, instance):
+    """
+    Область сравнения текста: для комментария - его запись.
+    """
+    if kind == Fingerprint.COMMENT:
+        return instance.post_id
+    return None
+
+
+def bucket_keys(kind, values, scope=None):
+    prefix = kind if scope is None else f"{kind}:{scope}"
+    keys = []
+    for band in range(BANDS):
+        data = struct.pack(
+            f">{ROWS}I", *values[band * ROWS:(band + 1) * ROWS]
+        )
+        digest = hashlib.blake2b(
+            prefix.encode() + bytes([band]) + data, digest_size=8
+        ).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def find_duplicate(kind, values, exclude=None, scope=None):
+    """
+    Возвращает id самого похожего текста того же вида и области scope,
+    если сходство не ниже SPAM_DUPLICATE_THRESHOLD.
+    """
+    candidates = FingerprintBucket.objects.filter(
+        key__in=bucket_keys(kind, values, scope), kind=kind
+    )
+    if exclude is not None:
+        candidates = candidates.exclude(object_id=exclude)
+    # Чем больше общих корзин, тем выше сходство: подписи сравниваются
+    # только у MAX_CANDIDATES лучших кандидатов
+    shared = Counter(
+        candidates.values_list("object_id", flat=True)[:MAX_CANDIDATES * BANDS]
+    )
+    if not shared:
+        return None
+    threshold = getattr(settings, "SPAM_DUPLICATE_THRESHOLD", 0.8)
+    best_id, best = None, threshold
+    stored = Fingerprint.objects.filter(
+        kind=kind,
+        object_id__in=[pk for pk, _ in shared.most_common(MAX_CANDIDATES)],
+    ).values_list("object_id", "signature")
+    for object_id, data in stored:
+        score = similarity(values, unpack(data))
+        if score >= best:
+            best_id, best = object_id, score
+    return best_id
+
+
+def check(instance, kind, text):
+    """
+    Считает подпись текста и ищет похожий. Результат запоминается
+    в instance, чтобы при сохранении не считать подпись повторно.
+    """
+    values = signature(text)
+    duplicate_of = None
+    if values is not None:
+        duplicate_of = find_duplicate(
+            kind, values, exclude=instance.pk, scope=scope_of(kind, instance)
+        )
+    instance._fingerprint = (text, values, duplicate_of)
+    return duplicate_of
+
+
+def index(kind, instances):
+    """
+    Добавляет или обновляет отпечатки записей или комментариев.
+    """
+    fingerprints, buckets, object_ids = [], [], []
+    for instance in instances:
+        text, values, duplicate_of = getattr(
+            instance, "_fingerprint", (None, None, None)
+        )
+        if text != instance.text:
+            values, duplicate_of = signature(instance.text), None
+        object_ids.append(instance.pk)
+        if values is None:
+            continue
+        fingerprints.append(Fingerprint(
+            kind=kind, object_id=instance.pk, signature=pack(values),
+            duplicate_of=duplicate_of,
+        ))
+        buckets.extend(
+            FingerprintBucket(kind=kind, object_id=instance.pk, key=key)
+            for key in bucket_keys(kind, values, scope_of(kind, instance))
+        )
+    with transaction.atomic():
+        remove(kind, object_ids)
+        Fingerprint.objects.bulk_create(fingerprints)
+        FingerprintBucket.objects.bulk_create(buckets)
+
+
+def remove(kind, object_ids):
+    Fingerprint.objects.filter(kind=kind, object_id__in=object_ids).delete()
+    FingerprintBucket.objects.filter(kind=kind, object_id__in=object_ids).delete()
@@ -1,9 +1,88 @@
+from django.conf import settings
 from django.forms import ModelForm
 from django import forms
-from .models import Post, Comment
+from django.urls import reverse_lazy
+from django.utils.html import format_html
+from . import fingerprints
+from .models import Post, Comment, Fingerprint, Group
 
 
-class PostForm(ModelForm):
+class GroupAutocomplete(forms.Widget):
+    """
+    Поле ввода с подсказками вместо <select> со всеми сообществами.
+    Выбранный id хранится в скрытом поле; варианты подгружаются
+    из group_autocomplete по мере ввода.
+    """
+    url = reverse_lazy("group_autocomplete")
+
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        field_id = attrs.pop("id", f"id_{name}")
+        title = ""
+        if value:
+            title = Group.objects.filter(pk=value).values_list(
+                "title", flat=True
+            ).first() or ""
+        return format_html(
+            '<input type="hidden" name="{name}" id="{id}_value" value="{value}">'
+            '<input type="text" id="{id}" value="{title}" list="{id}_options"'
+            ' autocomplete="off" class="{css}">'
+            '<datalist id="{id}_options"></datalist>'
+            '<script>'
+            '(function () {{'
+            ' var input = $("#{id}"), hidden = $("#{id}_value"),'
+            ' options = $("#{id}_options"), found = {{}}, timer;'
+            ' input.on("input", function () {{'
+            '  var title = input.val();'
+            '  hidden.val(found[title] || "");'
+            '  clearTimeout(timer);'
+            '  if (!title) {{ return; }}'
+            '  timer = setTimeout(function () {{'
+            '   $.getJSON("{url}", {{q: title}}, function (data) {{'
+            '    options.empty();'
+            '    $.each(data.results, function (i, group) {{'
+            '     found[group.title] = group.id;'
+            '     options.append($("<option>").attr("value", group.title));'
+            '    }});'
+            '    hidden.val(found[input.val()] || "");'
+            '   }});'
+            '  }}, 200);'
+            ' }});'
+            '}})();'
+            '</script>',
+            name=name, id=field_id, value=value or "", title=title,
+            css=attrs.get("class", ""), url=self.url,
+        )
+
+    def value_from_datadict(self, data, files, name):
+        return data.get(name)
+
+
+class DuplicateTextMixin:
+    """
+    Проверяет поле text на почти-дубликат уже опубликованного текста.
+    При SPAM_DUPLICATE_ACTION = "reject" форма отклоняется, при "flag"
+    текст сохраняется, а его отпечаток помечается для модерации.
+    """
+    fingerprint_kind = None
+
+    def clean_text(self):
+        text = self.cleaned_data["text"]
+        action = getattr(settings, "SPAM_DUPLICATE_ACTION", "reject")
+        if action:
+            duplicate_of = fingerprints.check(
+                self.instance, self.fingerprint_kind, text
+            )
+            if duplicate_of is not None and action == "reject":
+                raise forms.ValidationError(
+                    "Похожий текст уже был опубликован"
+                )
+        return text
+
+
+class PostForm(DuplicateTextMixin, ModelForm):
+    fingerprint_kind = Fingerprint.POST
+
     class Meta:
         model = Post
         fields = ("group", "text", "image")
@@ -17,9 +96,13 @@ class PostForm(ModelForm):
             "group": "Сообщества",
             "image": "Изображение"
         }
+        widgets = {
+            "group": GroupAutocomplete,
+        }
 
 
-class CommentForm(ModelForm):
+class CommentForm(DuplicateTextMixin, ModelForm):
+    fingerprint_kind = Fingerprint.COMMENT
     text = forms.CharField(widget=forms.Textarea)
 
     class Meta:
@@ -0,0 +1,147 @@
+"""
+Отметки «нравится».
+
+Сама отметка - строка Like с уникальной парой (user, post). Число
+отметок хранится в Post.likes_count, но поставить или снять отметку
+не значит обновить строку записи: у популярной записи она стала бы
+местом, за которое спорят все запросы. Изменение прибавляется
+к одной из LIKE_COUNTER_SHARDS строк LikeCounter записи, выбранной
+случайно, а задача flush_like_counts раз в минуту переносит
+накопленное в Post.likes_count и вычитает перенесенное из строк.
+Вычитание, а не обнуление, не теряет отметок, пришедших между
+чтением и записью. Поэтому счетчик отстает от отметок не больше чем
+на минуту.
+
+liked_ids() отвечает, какие записи страницы отмечены пользователем,
+одним запросом по уникальному индексу (user, post).
+"""
+
+import random
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Like, LikeCounter, Post
+from .tasks import flush_like_counts
+
+
+def shards():
+    return getattr(settings, "LIKE_COUNTER_SHARDS", 8)
+
+
+def schedule_flush():
+    # Отметки в пределах минуты переносит одна задача
+    minute = int(time.time()) // 60
+    flush_like_counts.delay(key=f"flush-likes-{minute}", countdown=60)
+
+
+def _add(post_id, delta):
+    shard = random.randrange(shards())
+    counter = LikeCounter.objects.filter(post_id=post_id, shard=shard)
+    if not counter.update(delta=F("delta") + delta):
+        LikeCounter.objects.bulk_create(
+            [LikeCounter(post_id=post_id, shard=shard)], ignore_conflicts=True
+        )
+        counter.update(delta=F("delta") + delta)
+
+
+def like(user, post):
+    """
+    Ставит отметку. Возвращает False, если она уже стояла.
+    """
+    try:
+        with transaction.atomic():
+            Like.objects.create(user=user, post=post)
+            _add(post.pk, 1)
+    except IntegrityError:
+        return False
+    schedule_flush()
+    return True
+
+
+def unlike(user, post):
+    """
+    Снимает отметку. Возвращает False, если ее не было.
+    """
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            _add(post.pk, -1)
+    if deleted:
+        schedule_flush()
+    return bool(deleted)
+
+
+def remove_user_likes(user_id, batch_size=500):
+    """
+    Снимает все отметки пользователя пачками.
+    """
+    while True:
+        with transaction.atomic():
+            rows = list(Like.objects.filter(user_id=user_id).values_list(
+                "pk", "post_id"
+            )[:batch_size])
+            if not rows:
+                break
+            Like.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+            for _, post_id in rows:
+                _add(post_id, -1)
+    schedule_flush()
+
+
+def flush(batch_size=500):
+    """
+    Переносит накопленные изменения в Post.likes_count пачками
+    по batch_size записей. Возвращает число обновленных записей.
+    """
+    flushed = 0
+    last_post_id = 0
+    while True:
+        with transaction.atomic():
+            post_ids = list(LikeCounter.objects.filter(
+                post_id__gt=last_post_id
+            ).exclude(delta=0).order_by("post_id").values_list(
+                "post_id", flat=True
+            ).distinct()[:batch_size])
+            if not post_ids:
+                return flushed
+            last_post_id = post_ids[-1]
+            # Все строки записи в одной пачке: снятая отметка не
+            # перенесется без поставленной раньше
+            rows = LikeCounter.objects.filter(post_id__in=post_ids).exclude(
+                delta=0
+            ).values_list("pk", "post_id", "delta")
+            by_delta = defaultdict(list)
+            totals = defaultdict(int)
+            for pk, post_id, delta in rows:
+                by_delta[delta].append(pk)
+                totals[post_id] += delta
+            # Строки с одинаковым изменением - одним UPDATE
+            for delta, pks in by_delta.items():
+                LikeCounter.objects.filter(pk__in=pks).update(delta=F("delta") - delta)
+            by_total = defaultdict(list)
+            for post_id, total in totals.items():
+                if total:
+                    by_total[total].append(post_id)
+            for total, ids in by_total.items():
+                Post.all_objects.filter(pk__in=ids).update(
+                    likes_count=F("likes_count") + total
+                )
+            flushed += len(by_total)
+
+
+def liked_ids(user, posts):
+    """
+    pk записей из posts, отмеченных пользователем.
+    """
+    if not user.is_authenticated:
+        return set()
+    post_ids = [post.pk for post in posts]
+    if not post_ids:
+        return set()
+    return set(Like.objects.filter(
+        user=user, post_id__in=post_ids
+    ).values_list("post_id", flat=True))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts import fingerprints
+from posts.models import Comment, Fingerprint, Post
+
+
+class Command(BaseCommand):
+    help = "Строит индекс отпечатков текстов для поиска почти-дубликатов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Сколько строк читать и записывать за раз",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        sources = (
+            (Fingerprint.POST, Post, ("pk", "text")),
+            (Fingerprint.COMMENT, Comment, ("pk", "text", "post_id")),
+        )
+        for kind, model, fields in sources:
+            total = 0
+            batch = []
+            rows = model.objects.order_by("pk").only(*fields)
+            for instance in rows.iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) == batch_size:
+                    fingerprints.index(kind, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                fingerprints.index(kind, batch)
+                total += len(batch)
+            self.stdout.write(f"Проиндексировано ({kind}): {total}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.related import rebuild
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает похожие записи для всех записей"
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(f"Обработано записей: {total}")
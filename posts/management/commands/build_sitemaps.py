@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import sitemaps
+
+
+class Command(BaseCommand):
+    help = "Обновляет файлы карты сайта"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Пересоздать все файлы, а не только новые диапазоны",
+        )
+
+    def handle(self, *args, **options):
+        written = sitemaps.build(full=options["full"])
+        self.stdout.write(f"Записано файлов: {written}")
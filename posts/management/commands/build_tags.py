@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.models import Max, Min
+
+from posts import tags
+from posts.models import Post
+
+
+def index_range(start, stop):
+    posts = list(Post.objects.filter(
+        pk__gte=start, pk__lt=stop
+    ).only("pk", "text", "pub_date", "author_id"))
+    # Упоминания в старых записях не должны рассылать уведомления
+    tags.index_posts(posts, notify=False)
+    return len(posts)
+
+
+def _index_range_in_thread(start, stop):
+    close_old_connections()
+    try:
+        return index_range(start, stop)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Строит таблицы хэштегов и упоминаний по существующим записям"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Сколько id записей обрабатывать за раз",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Сколько пачек обрабатывать параллельно (1 - в текущем потоке)",
+        )
+
+    def handle(self, *args, **options):
+        bounds = Post.objects.aggregate(first=Min("pk"), last=Max("pk"))
+        if bounds["first"] is None:
+            self.stdout.write("Записей нет")
+            return
+        size = options["chunk_size"]
+        starts = range(bounds["first"], bounds["last"] + 1, size)
+        stops = [start + size for start in starts]
+        # SQLite допускает одного пишущего: параллельные пачки только
+        # ждали бы блокировку
+        if options["workers"] <= 1 or connection.vendor == "sqlite":
+            total = sum(map(index_range, starts, stops))
+        else:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                total = sum(executor.map(_index_range_in_thread, starts, stops))
+        self.stdout.write(f"Обработано записей: {total}")
@@ -0,0 +1,127 @@
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import MediaAlias, MediaFile, Post
+from posts.storage import media_storage
+
+
+def scan(root, directory):
+    """
+    Обходит каталог через os.scandir, не собирая список файлов:
+    (имя относительно root, время изменения, размер) для каждого файла.
+    """
+    with os.scandir(os.path.join(root, directory)) as entries:
+        for entry in entries:
+            name = f"{directory}/{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                yield name, stat.st_mtime, stat.st_size
+
+
+def referenced(names, cutoff):
+    """
+    Имена из пачки, которые нельзя удалять. Для файлов со строкой
+    MediaFile решает счетчик: на файл ссылаются записи (refcount > 0)
+    или его загрузили недавно. Для остальных (плоские имена до
+    migrate_media) ссылки ищутся в записях и в MediaAlias.
+    """
+    keep, tracked = set(), set()
+    for name, refcount, updated in MediaFile.objects.filter(
+        name__in=names
+    ).values_list("name", "refcount", "updated"):
+        tracked.add(name)
+        if refcount > 0 or updated >= cutoff:
+            keep.add(name)
+    untracked = [name for name in names if name not in tracked]
+    if untracked:
+        keep.update(Post.all_objects.filter(
+            image__in=untracked
+        ).values_list("image", flat=True))
+        keep.update(MediaAlias.objects.filter(
+            old_name__in=untracked
+        ).values_list("old_name", flat=True))
+    return keep
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы картинок, на которые не ссылается ни одна запись, "
+        "вместе с их миниатюрами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать, что было бы удалено",
+        )
+        parser.add_argument(
+            "--grace-period", type=int, default=24 * 60 * 60,
+            help="Не трогать файлы моложе стольких секунд",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Сколько файлов проверять в базе и удалять за раз",
+        )
+        parser.add_argument(
+            "--directory", default="posts",
+            help="Каталог внутри MEDIA_ROOT",
+        )
+        parser.add_argument(
+            "--cleanup-kvstore", action="store_true",
+            help="После удаления очистить хранилище миниатюр sorl от "
+                 "записей о несуществующих картинках",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options["dry_run"]
+        # Файл, загруженный только что, может еще ждать сохранения записи
+        cutoff = time.time() - options["grace_period"]
+        self.cutoff = timezone.now() - timedelta(seconds=options["grace_period"])
+        self.deleted = self.freed = 0
+        root = settings.MEDIA_ROOT
+        batch = []
+        if os.path.isdir(os.path.join(root, options["directory"])):
+            for name, mtime, size in scan(root, options["directory"]):
+                if mtime >= cutoff:
+                    continue
+                batch.append((name, size))
+                if len(batch) == options["batch_size"]:
+                    self.collect(batch)
+                    batch = []
+        if batch:
+            self.collect(batch)
+        verb = "Будет удалено" if self.dry_run else "Удалено"
+        self.stdout.write(
+            f"{verb} файлов: {self.deleted}, {self.freed / 1024 / 1024:.1f} МБ"
+        )
+        if options["cleanup_kvstore"] and not self.dry_run:
+            default.kvstore.cleanup()
+
+    def collect(self, batch):
+        keep = referenced([name for name, _ in batch], self.cutoff)
+        orphans = [(name, size) for name, size in batch if name not in keep]
+        for name, size in orphans:
+            if self.dry_run:
+                self.stdout.write(name)
+            else:
+                # Миниатюры и их записи в хранилище sorl
+                default.kvstore.delete(ImageFile(name, storage=media_storage))
+                try:
+                    os.remove(os.path.join(settings.MEDIA_ROOT, name))
+                except FileNotFoundError:
+                    continue
+            self.deleted += 1
+            self.freed += size
+        if orphans and not self.dry_run:
+            MediaFile.objects.filter(
+                name__in=[name for name, _ in orphans], refcount__lte=0
+            ).delete()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import delete_user
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Блокирует пользователя и скрывает его записи и комментарии; "
+        "данные удаляются фоновой задачей"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+        delete_user(user)
+        self.stdout.write(f"Пользователь скрыт: {user.username}")
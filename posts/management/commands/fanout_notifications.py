@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.notifications import fan_out_pending_events
+
+
+class Command(BaseCommand):
+    help = "Рассылает подписчикам уведомления о новых записях"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=None,
+            help="Максимальное количество событий за один запуск",
+        )
+
+    def handle(self, *args, **options):
+        processed = fan_out_pending_events(limit=options["limit"])
+        self.stdout.write(f"Обработано событий: {processed}")
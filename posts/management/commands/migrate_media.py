@@ -0,0 +1,90 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import storage
+from posts.models import MediaAlias, Post
+
+
+def copy_file(old_name):
+    """
+    Копирует файл в хранилище по содержимому. Возвращает новое имя
+    или None, если файла нет в MEDIA_ROOT. Выполняется в потоках,
+    базу не трогает.
+    """
+    try:
+        with storage.media_storage.open(old_name) as file:
+            return storage.media_storage.store(old_name, file)
+    except (FileNotFoundError, SuspiciousFileOperation):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит картинки записей из плоского каталога в хранилище "
+        "по содержимому, сохраняя старые адреса"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Сколько записей читать за раз",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=8,
+            help="Сколько файлов копировать параллельно",
+        )
+        parser.add_argument(
+            "--keep-old", action="store_true",
+            help="Не удалять старые файлы после переноса",
+        )
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        rows = Post.all_objects.exclude(image="").exclude(image=None).order_by(
+            "pk"
+        ).values_list("pk", "image")
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(rows.filter(pk__gt=last_pk)[:options["batch_size"]])
+                if not batch:
+                    break
+                last_pk = batch[-1][0]
+                old_names = sorted({
+                    name for _, name in batch if not storage.is_hashed(name)
+                })
+                new_names = dict(zip(old_names, executor.map(copy_file, old_names)))
+                moved_now = self.relink(new_names)
+                moved += len(moved_now)
+                missing += len(old_names) - len(moved_now)
+                if not options["keep_old"]:
+                    for name in moved_now:
+                        storage.media_storage.delete(name)
+        self.stdout.write(f"Перенесено файлов: {moved}, не найдено: {missing}")
+
+    def relink(self, new_names):
+        """
+        Переключает записи на новые имена и запоминает старые.
+        Возвращает перенесенные старые имена.
+        """
+        new_names = {old: new for old, new in new_names.items() if new}
+        posts = defaultdict(list)
+        for pk, name in Post.all_objects.filter(
+            image__in=list(new_names)
+        ).values_list("pk", "image"):
+            posts[name].append(pk)
+        with transaction.atomic():
+            MediaAlias.objects.bulk_create(
+                [MediaAlias(old_name=old, new_name=new) for old, new in new_names.items()],
+                ignore_conflicts=True,
+            )
+            storage.touch(new_names.values())
+            for old, new in new_names.items():
+                # update() не вызывает сигналы: счетчики ссылок здесь
+                Post.all_objects.filter(image=old).update(image=new)
+                storage.acquire([new] * len(posts[old]))
+        return list(new_names)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts import rendering
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Заполняет готовый HTML текста записей и комментариев"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Сколько строк читать и записывать за раз",
+        )
+        parser.add_argument(
+            "--all", action="store_true",
+            help="Пересчитать все строки, а не только незаполненные",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model in (Post, Comment):
+            rows = model.all_objects.order_by("pk").only("pk", "text")
+            if not options["all"]:
+                rows = rows.filter(text_html="").exclude(text="")
+            total = 0
+            batch = []
+            for instance in rows.iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) == batch_size:
+                    total += self.write(model, batch)
+                    batch = []
+            if batch:
+                total += self.write(model, batch)
+            self.stdout.write(
+                f"Обновлено ({model._meta.verbose_name_plural}): {total}"
+            )
+
+    def write(self, model, batch):
+        rendering.render_many(batch)
+        model.all_objects.bulk_update(batch, ["text_html"])
+        return len(batch)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = "Отправляет письма-дайджесты о новых записях"
+
+    def handle(self, *args, **options):
+        sent = send_digests()
+        self.stdout.write(f"Отправлено писем: {sent}")
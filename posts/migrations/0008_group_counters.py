@@ -0,0 +1,41 @@
+# Generated by Django 2.2.6 on 2026-10-19 08:45
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def fill_group_counters(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    stats = Post.objects.filter(group__isnull=False).order_by().values('group').annotate(
+        total=Count('id'), last=Max('pub_date')
+    )
+    for row in stats:
+        Group.objects.filter(pk=row['group']).update(
+            posts_count=row['total'], last_post_date=row['last']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_follow'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='group',
+            options={'ordering': ['title'], 'verbose_name': 'Сообщество', 'verbose_name_plural': 'Сообщества'},
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='last_post_date',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последняя запись'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество записей'),
+        ),
+        migrations.RunPython(fill_group_counters, migrations.RunPython.noop),
+    ]
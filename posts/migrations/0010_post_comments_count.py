@@ -0,0 +1,28 @@
+# Generated by Django 2.2.6 on 2026-10-19 09:03
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_comments_count(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    stats = Comment.objects.order_by().values('post').annotate(total=Count('id'))
+    for row in stats:
+        Post.objects.filter(pk=row['post']).update(comments_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_comments_count, migrations.RunPython.noop),
+    ]
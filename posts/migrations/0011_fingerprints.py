@@ -0,0 +1,44 @@
+# Generated by Django 2.2.6 on 2026-10-19 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fingerprint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Запись'), ('comment', 'Комментарий')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('signature', models.BinaryField()),
+                ('duplicate_of', models.PositiveIntegerField(blank=True, null=True, verbose_name='Похож на')),
+            ],
+            options={
+                'verbose_name': 'Отпечаток текста',
+                'verbose_name_plural': 'Отпечатки текстов',
+            },
+        ),
+        migrations.CreateModel(
+            name='FingerprintBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Запись'), ('comment', 'Комментарий')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('key', models.BigIntegerField(db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='fingerprintbucket',
+            index=models.Index(fields=['kind', 'object_id'], name='posts_bucket_object'),
+        ),
+        migrations.AddConstraint(
+            model_name='fingerprint',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique posts_fingerprint'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.6 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='is_deleted',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Удален'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_deleted',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='Удалена'),
+        ),
+    ]
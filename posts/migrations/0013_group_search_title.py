@@ -0,0 +1,25 @@
+# Generated by Django 2.2.6 on 2026-10-19 09:15
+
+from django.db import migrations, models
+
+
+def fill_search_title(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    for group in Group.objects.only('title').iterator():
+        Group.objects.filter(pk=group.pk).update(search_title=group.title.lower())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='search_title',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_search_title, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.6 on 2026-10-19 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_root_paths(apps, schema_editor):
+    # Все существующие комментарии - корни обсуждений (см. posts.threads)
+    Comment = apps.get_model('posts', 'Comment')
+    batch = []
+    for comment in Comment.objects.only('pk').iterator(chunk_size=1000):
+        comment.path = f'{10 ** 10 - 1 - comment.pk:010d}'
+        batch.append(comment)
+        if len(batch) == 1000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=80),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество ответов'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='posts_comment_thread'),
+        ),
+        migrations.RunPython(fill_root_paths, migrations.RunPython.noop),
+    ]
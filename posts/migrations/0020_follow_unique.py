@@ -0,0 +1,28 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = Follow.objects.order_by().values('user', 'author').annotate(
+        total=Count('id'), first=Min('id')
+    ).filter(total__gt=1)
+    for row in duplicates:
+        Follow.objects.filter(user=row['user'], author=row['author']).exclude(
+            pk=row['first']
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_likes'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique posts_follow'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.6 on 2026-10-19 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0020_follow_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestOptOut',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='digest_opt_out', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -1,10 +1,41 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from yatube.urlbuilder import url_for
+
+from . import rendering
+from .storage import media_storage
+
 
 User = get_user_model()
 
 
+class VisibleManager(models.Manager):
+    """
+    Менеджер по умолчанию: скрывает удаленные строки. Удаленные
+    доступны через all_objects, пока их не сотрет posts.deletion.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class RenderedTextMixin:
+    """
+    Обновляет text_html при сохранении текста (см. posts.rendering).
+    """
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if "text" not in self.get_deferred_fields() and (
+            update_fields is None or "text" in update_fields
+        ):
+            self.text_html = rendering.render(self.text)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "text_html"}
+        super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -12,13 +43,44 @@ class Group(models.Model):
     )
     slug = models.SlugField(unique=True)
     description = models.TextField(verbose_name="Описание")
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество записей"
+    )
+    last_post_date = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Последняя запись"
+    )
+    # Название в нижнем регистре для поиска по префиксу по индексу
+    search_title = models.CharField(
+        max_length=200,
+        db_index=True,
+        default="",
+        editable=False
+    )
+
+    class Meta:
+        ordering = ["title"]
+        verbose_name = "Сообщество"
+        verbose_name_plural = "Сообщества"
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.search_title = self.title.lower()
+        super().save(*args, **kwargs)
 
-class Post(models.Model):
+    def get_absolute_url(self):
+        return url_for("group", slug=self.slug)
+
+
+class Post(RenderedTextMixin, models.Model):
     text = models.TextField()
+    text_html = models.TextField(default="", editable=False)
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
@@ -36,9 +98,30 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=media_storage,
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество комментариев"
+    )
+    # Переносится из LikeCounter периодической задачей (см. posts.likes)
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество отметок «нравится»"
+    )
+    is_deleted = models.BooleanField(
+        default=False,
+        db_index=True,
+        editable=False,
+        verbose_name="Удалена"
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-pub_date"]
@@ -48,8 +131,20 @@ class Post(models.Model):
     def __str__(self):
         return self.text
 
+    def get_absolute_url(self):
+        return url_for("post", username=self.author.username, post_id=self.pk)
+
+    def get_edit_url(self):
+        return url_for("post_edit", username=self.author.username, post_id=self.pk)
+
+    def get_like_url(self):
+        return url_for("post_like", username=self.author.username, post_id=self.pk)
+
+    def get_unlike_url(self):
+        return url_for("post_unlike", username=self.author.username, post_id=self.pk)
+
 
-class Comment(models.Model):
+class Comment(RenderedTextMixin, models.Model):
     post = models.ForeignKey(
         Post,
         related_name="comments",
@@ -60,19 +155,58 @@ class Comment(models.Model):
         on_delete=models.CASCADE
     )
     text = models.TextField()
+    text_html = models.TextField(default="", editable=False)
     created = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True
     )
+    is_deleted = models.BooleanField(
+        default=False,
+        db_index=True,
+        editable=False,
+        verbose_name="Удален"
+    )
+    # Дерево ответов хранится материализованным путем (см. posts.threads);
+    # без ограничения в базе: строки стираются пачками в любом порядке
+    parent = models.ForeignKey(
+        "self",
+        related_name="replies",
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        blank=True, null=True,
+        editable=False
+    )
+    path = models.CharField(max_length=80, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество ответов"
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["post", "path"], name="posts_comment_thread"),
+        ]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
     def __str__(self):
         return self.text
 
+    def get_absolute_url(self):
+        return f"{self.post.get_absolute_url()}#comment_{self.pk}"
+
+    def get_thread_url(self):
+        return url_for(
+            "comment_thread", username=self.post.author.username,
+            post_id=self.post_id, comment_id=self.pk,
+        )
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -91,3 +225,285 @@ class Follow(models.Model):
                 name='unique posts_follow')
         ]
 
+
+
+class PostEvent(models.Model):
+    """
+    Событие "новая запись автора", ожидающее рассылки подписчикам.
+    """
+    post = models.ForeignKey(
+        Post,
+        related_name="events",
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    processed = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        ordering = ["pk"]
+
+
+class Notification(models.Model):
+    user = models.ForeignKey(
+        User, related_name="notifications",
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name="notifications",
+        on_delete=models.CASCADE
+    )
+    FOLLOW = "follow"
+    MENTION = "mention"
+    REASON_CHOICES = (
+        (FOLLOW, "Запись автора из подписок"),
+        (MENTION, "Упоминание"),
+    )
+
+    created = models.DateTimeField(auto_now_add=True)
+    is_read = models.BooleanField(default=False)
+    is_emailed = models.BooleanField(default=False)
+    reason = models.CharField(
+        max_length=10,
+        choices=REASON_CHOICES,
+        default=FOLLOW
+    )
+
+    class Meta:
+        ordering = ["-created"]
+        verbose_name = "Уведомление"
+        verbose_name_plural = "Уведомления"
+        indexes = [
+            models.Index(
+                fields=["user", "is_read"],
+                name="posts_notif_user_unread"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"],
+                name="unique posts_notification")
+        ]
+
+
+class DigestOptOut(models.Model):
+    """
+    Пользователь отказался от писем-дайджестов; уведомления на сайте
+    он по-прежнему получает.
+    """
+    user = models.OneToOneField(
+        User, related_name="digest_opt_out",
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = "Хэштег"
+        verbose_name_plural = "Хэштеги"
+
+    def __str__(self):
+        return f"#{self.name}"
+
+    def get_absolute_url(self):
+        return url_for("tag", name=self.name)
+
+
+class PostTag(models.Model):
+    """
+    Хэштег в тексте записи (posts.tags). Дата записи повторена здесь,
+    чтобы лента хэштега читалась по одному индексу (tag, -pub_date).
+    """
+    tag = models.ForeignKey(
+        Tag,
+        related_name="post_tags",
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name="post_tags",
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["tag", "-pub_date", "-post"],
+                name="posts_posttag_feed"
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "tag"],
+                name="unique posts_posttag")
+        ]
+
+
+class Mention(models.Model):
+    """
+    Упоминание @пользователя в тексте записи. notified - уведомление
+    об упоминании уже создано.
+    """
+    post = models.ForeignKey(
+        Post,
+        related_name="mentions",
+        on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        User, related_name="mentions",
+        on_delete=models.CASCADE
+    )
+    notified = models.BooleanField(default=False, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "user"],
+                name="unique posts_mention")
+        ]
+
+
+class RelatedPost(models.Model):
+    """
+    Одна из RELATED_POSTS_COUNT самых похожих на запись других записей
+    (posts.related), rank 0 - самая похожая.
+    """
+    post = models.ForeignKey(
+        Post,
+        related_name="related_posts",
+        on_delete=models.CASCADE
+    )
+    related = models.ForeignKey(
+        Post,
+        related_name="+",
+        on_delete=models.CASCADE
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ["post", "rank"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "rank"],
+                name="unique posts_relatedpost")
+        ]
+
+
+class MediaFile(models.Model):
+    """
+    Файл в хранилище по содержимому (posts.storage) и число записей,
+    которые на него ссылаются.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+
+
+class MediaAlias(models.Model):
+    """
+    Старое имя файла до переноса в хранилище по содержимому:
+    по нему старые адреса перенаправляются на новые.
+    """
+    old_name = models.CharField(max_length=255, unique=True)
+    new_name = models.CharField(max_length=255)
+
+
+class Fingerprint(models.Model):
+    """
+    MinHash-подпись текста записи или комментария (posts.fingerprints).
+    """
+    POST = "post"
+    COMMENT = "comment"
+    KIND_CHOICES = (
+        (POST, "Запись"),
+        (COMMENT, "Комментарий"),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    signature = models.BinaryField()
+    duplicate_of = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name="Похож на"
+    )
+
+    class Meta:
+        verbose_name = "Отпечаток текста"
+        verbose_name_plural = "Отпечатки текстов"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id"],
+                name="unique posts_fingerprint")
+        ]
+
+
+class FingerprintBucket(models.Model):
+    """
+    Корзина LSH: хэш одной полосы подписи. Тексты с общей корзиной -
+    кандидаты в почти-дубликаты.
+    """
+    kind = models.CharField(max_length=10, choices=Fingerprint.KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    key = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["kind", "object_id"],
+                name="posts_bucket_object"
+            ),
+        ]
+
+
+class Like(models.Model):
+    """
+    Отметка «нравится»: не больше одной от пользователя на запись.
+    """
+    user = models.ForeignKey(
+        User, related_name="likes",
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name="likes",
+        on_delete=models.CASCADE
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"],
+                name="unique posts_like")
+        ]
+
+
+class LikeCounter(models.Model):
+    """
+    Еще не перенесенное в Post.likes_count изменение числа отметок,
+    разнесенное по нескольким строкам на запись (см. posts.likes).
+    """
+    post = models.ForeignKey(
+        Post,
+        related_name="+",
+        on_delete=models.CASCADE
+    )
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["post", "shard"],
+                name="unique posts_likecounter")
+        ]
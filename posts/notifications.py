@@ -0,0 +1,163 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.mail import send_mass_mail
+from django.db import transaction
+from django.urls import reverse
+
+from .models import Follow, Mention, Notification, PostEvent, User
+
+
+def batch_size():
+    return getattr(settings, "NOTIFICATIONS_BATCH_SIZE", 500)
+
+
+def fan_out_event(event, size=None):
+    """
+    Создает уведомления о записи для всех подписчиков автора,
+    вставляя их пачками по size строк.
+    """
+    size = size or batch_size()
+    followers = Follow.objects.filter(
+        author_id=event.post.author_id
+    ).order_by("pk").values_list("pk", "user_id")
+    last_pk = 0
+    while True:
+        chunk = list(followers.filter(pk__gt=last_pk)[:size])
+        if not chunk:
+            break
+        last_pk = chunk[-1][0]
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, post_id=event.post_id)
+             for _, user_id in chunk],
+            ignore_conflicts=True,
+        )
+
+
+def fan_out_pending_events(limit=None):
+    """
+    Обрабатывает накопившиеся события, возвращает их количество.
+    """
+    events = PostEvent.objects.filter(
+        processed=False, post__is_deleted=False
+    ).select_related("post")
+    if limit:
+        events = events[:limit]
+    processed = 0
+    for event in events:
+        with transaction.atomic():
+            fan_out_event(event)
+            PostEvent.objects.filter(pk=event.pk).update(processed=True)
+        processed += 1
+    return processed
+
+
+def notify_pending_mentions(size=None):
+    """
+    Создает уведомления об упоминаниях пачками по size строк,
+    возвращает число обработанных упоминаний.
+    """
+    size = size or batch_size()
+    pending = Mention.objects.filter(
+        notified=False, post__is_deleted=False
+    ).order_by("pk").values_list("pk", "user_id", "post_id")
+    total = 0
+    while True:
+        chunk = list(pending[:size])
+        if not chunk:
+            return total
+        with transaction.atomic():
+            # Подписчик автора уже уведомлен о записи: ignore_conflicts
+            Notification.objects.bulk_create(
+                [Notification(user_id=user_id, post_id=post_id,
+                              reason=Notification.MENTION)
+                 for _, user_id, post_id in chunk],
+                ignore_conflicts=True,
+            )
+            Mention.objects.filter(
+                pk__in=[pk for pk, _, _ in chunk]
+            ).update(notified=True)
+        total += len(chunk)
+
+
+DIGEST_SUBJECTS = {
+    Notification.FOLLOW: "Новые записи авторов, на которых вы подписаны",
+    Notification.MENTION: "Вас упомянули в новых записях",
+}
+
+
+def digest_subject(items):
+    reasons = {item.reason for item in items}
+    if len(reasons) == 1:
+        return DIGEST_SUBJECTS[reasons.pop()]
+    return "Новые записи из подписок и упоминания"
+
+
+def digest_body(items):
+    lines = [
+        f"@{item.post.author.username}"
+        f"{' упомянул вас' if item.reason == Notification.MENTION else ''}"
+        f": {item.post.text[:100]}"
+        for item in items
+    ]
+    domain = Site.objects.get_current().domain
+    lines.append(
+        f"\nОтказаться от писем: https://{domain}{reverse('digest_off')}"
+    )
+    return "\n".join(lines)
+
+
+def send_digests(size=None):
+    """
+    Отправляет каждому пользователю одно письмо со списком новых записей,
+    о которых он еще не был уведомлен. Пользователи обрабатываются
+    пачками по size человек. Уведомления тех, у кого нет адреса или
+    кто отказался от писем, только помечаются отправленными.
+    Возвращает количество писем.
+    """
+    size = size or batch_size()
+    pending = Notification.objects.filter(is_read=False, is_emailed=False)
+    last_user_id = 0
+    sent = 0
+    while True:
+        user_ids = list(pending.filter(
+            user_id__gt=last_user_id
+        ).order_by("user_id").values_list("user_id", flat=True).distinct()[:size])
+        if not user_ids:
+            return sent
+        last_user_id = user_ids[-1]
+        recipients = dict(User.objects.filter(
+            pk__in=user_ids, digest_opt_out=None
+        ).exclude(email="").values_list("pk", "email"))
+        by_user = defaultdict(list)
+        for notification in pending.filter(
+            user_id__in=recipients
+        ).select_related("post__author"):
+            by_user[notification.user_id].append(notification)
+        messages = [
+            (digest_subject(items), digest_body(items),
+             settings.DEFAULT_FROM_EMAIL, [recipients[user_id]])
+            for user_id, items in by_user.items()
+        ]
+        if messages:
+            send_mass_mail(messages)
+            sent += len(messages)
+        emailed = [item.pk for items in by_user.values() for item in items]
+        for start in range(0, len(emailed), size):
+            Notification.objects.filter(
+                pk__in=emailed[start:start + size]
+            ).update(is_emailed=True)
+        pending.filter(user_id__in=set(user_ids) - set(recipients)).update(
+            is_emailed=True
+        )
+
+
+def unread_count(user):
+    # Уведомления удаленных записей помечаются прочитанными
+    # при удалении (posts.deletion.delete_posts)
+    return Notification.objects.filter(user=user, is_read=False).count()
+
+
+def mark_all_read(user):
+    Notification.objects.filter(user=user, is_read=False).update(is_read=True)
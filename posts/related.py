@@ -0,0 +1,285 @@
+"""
+Похожие записи по TF-IDF.
+
+Текст записи - вектор весов слов: частота слова в записи (1 + log tf),
+умноженная на редкость слова среди всех записей (idf), с единичной
+длиной строки. Слова хэшируются в N_FEATURES столбцов, поэтому словарь
+хранить не нужно. Сходство двух записей - скалярное произведение их
+векторов; для пачки из BLOCK_SIZE записей оно считается одним
+произведением разреженных матриц SciPy со всей матрицей записей,
+и из каждой строки берутся RELATED_POSTS_COUNT лучших.
+
+Результат хранится в RelatedPost, и страница записи читает его одним
+запросом по индексу. rebuild() (команда build_related) пересчитывает
+все и сохраняет матрицу и idf в RELATED_INDEX_PATH; refresh() (задача
+refresh_related после новых записей) по сохраненной матрице считает
+соседей только для записей, появившихся после нее, и вставляет их
+в списки уже известных записей. Веса idf и правки текстов
+учитываются при следующей пересборке.
+"""
+
+import fcntl
+import os
+import re
+import zlib
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import Post, RelatedPost
+
+
+N_FEATURES = 2 ** 20
+BLOCK_SIZE = 256
+WRITE_BATCH_SIZE = 100
+# Слова из большей доли записей (но не более чем из MAX_DF_DOCS)
+# почти не отличают записи друг от друга, зато делают произведение
+# матриц почти плотным, а время поиска - квадратичным от числа записей
+MAX_DF = 0.05
+MAX_DF_DOCS = 2000
+MAX_DF_FLOOR = 100
+
+_WORD_RE = re.compile(r"\w\w+")
+
+
+def top_k():
+    return getattr(settings, "RELATED_POSTS_COUNT", 5)
+
+
+def min_score():
+    return getattr(settings, "RELATED_MIN_SCORE", 0.1)
+
+
+def index_path():
+    return settings.RELATED_INDEX_PATH
+
+
+def term_counts(texts):
+    """
+    Разреженная матрица частот слов: строка - текст, столбец - хэш слова.
+    """
+    mask = N_FEATURES - 1
+    indices = array("i")
+    indptr = array("q", [0])
+    for text in texts:
+        indices.extend(
+            zlib.crc32(word.encode()) & mask
+            for word in _WORD_RE.findall(text.lower())
+        )
+        indptr.append(len(indices))
+    counts = sparse.csr_matrix(
+        (
+            np.ones(len(indices), dtype=np.float32),
+            np.array(indices, dtype=np.int32),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(indptr) - 1, N_FEATURES),
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+def inverse_frequencies(counts):
+    total = counts.shape[0]
+    df = np.bincount(counts.indices, minlength=N_FEATURES)
+    idf = (np.log((1 + total) / (1 + df)) + 1).astype(np.float32)
+    idf[df > max(min(MAX_DF * total, MAX_DF_DOCS), MAX_DF_FLOOR)] = 0
+    return idf
+
+
+def weigh(counts, idf):
+    """
+    TF-IDF с единичной длиной строк.
+    """
+    weights = counts.copy()
+    weights.data = (1 + np.log(weights.data)) * idf[weights.indices]
+    weights.eliminate_zeros()
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    weights.data /= np.repeat(norms, np.diff(weights.indptr)).astype(np.float32)
+    return weights
+
+
+def similarity_blocks(queries, matrix):
+    """
+    Сходство строк queries со всеми строками matrix пачками по
+    BLOCK_SIZE строк: (номер первой строки, разреженная матрица).
+    """
+    transposed = matrix.T.tocsr()
+    for start in range(0, queries.shape[0], BLOCK_SIZE):
+        yield start, (queries[start:start + BLOCK_SIZE] @ transposed).tocsr()
+
+
+def _best(cols, scores, k):
+    if len(scores) > k:
+        top = np.argpartition(-scores, k)[:k]
+        cols, scores = cols[top], scores[top]
+    order = np.argsort(-scores, kind="stable")
+    return cols[order], scores[order]
+
+
+def _row(block, row, own, ids, threshold):
+    start, stop = block.indptr[row], block.indptr[row + 1]
+    cols, scores = block.indices[start:stop], block.data[start:stop]
+    keep = (scores >= threshold) & (ids[cols] != own)
+    return cols[keep], scores[keep]
+
+
+def nearest(queries, query_ids, matrix, ids):
+    """
+    Для каждой строки queries - (id, [(id соседа, сходство), ...]),
+    до RELATED_POSTS_COUNT соседей среди строк matrix, лучшие первыми.
+    """
+    k, threshold = top_k(), min_score()
+    for start, block in similarity_blocks(queries, matrix):
+        for row in range(block.shape[0]):
+            own = query_ids[start + row]
+            cols, scores = _best(*_row(block, row, own, ids, threshold), k)
+            yield int(own), list(zip(ids[cols].tolist(), scores.tolist()))
+
+
+def store(neighbours):
+    """
+    Заменяет списки похожих записей. neighbours - пары (id записи,
+    список (id, сходство)), например из nearest().
+    """
+    chunk = []
+    for item in neighbours:
+        chunk.append(item)
+        if len(chunk) == WRITE_BATCH_SIZE:
+            _store_chunk(chunk)
+            chunk = []
+    if chunk:
+        _store_chunk(chunk)
+
+
+def _store_chunk(chunk):
+    post_ids = [post_id for post_id, _ in chunk]
+    # Матрица могла пережить удаление записей
+    existing = set(Post.all_objects.filter(pk__in={
+        related_id for _, related in chunk for related_id, _ in related
+    } | set(post_ids)).values_list("pk", flat=True))
+    rows = []
+    for post_id, related in chunk:
+        if post_id not in existing:
+            continue
+        related = [item for item in related if item[0] in existing]
+        rows.extend(
+            RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+            for rank, (related_id, score) in enumerate(related)
+        )
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=post_ids).delete()
+        RelatedPost.objects.bulk_create(rows)
+
+
+@contextmanager
+def _locked():
+    # Пересборка и дополнение не должны перезаписать матрицу друг друга
+    with open(index_path() + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def save_index(matrix, ids, idf):
+    path = index_path()
+    with open(path + ".tmp", "wb") as file:
+        np.savez(
+            file, data=matrix.data, indices=matrix.indices,
+            indptr=matrix.indptr, ids=ids, idf=idf,
+        )
+    os.replace(path + ".tmp", path)
+
+
+def load_index():
+    """
+    Матрица, id ее строк и idf или None, если индекс еще не построен.
+    """
+    try:
+        with np.load(index_path()) as saved:
+            matrix = sparse.csr_matrix(
+                (saved["data"], saved["indices"], saved["indptr"]),
+                shape=(len(saved["ids"]), N_FEATURES),
+            )
+            return matrix, saved["ids"], saved["idf"]
+    except FileNotFoundError:
+        return None
+
+
+def rebuild():
+    """
+    Пересчитывает похожие записи для всех записей. Возвращает их число.
+    """
+    with _locked():
+        ids = []
+
+        def texts():
+            rows = Post.objects.order_by("pk").values_list("pk", "text")
+            for pk, text in rows.iterator(chunk_size=2000):
+                ids.append(pk)
+                yield text
+
+        counts = term_counts(texts())
+        ids = np.array(ids, dtype=np.int64)
+        idf = inverse_frequencies(counts)
+        matrix = weigh(counts, idf)
+        store(nearest(matrix, ids, matrix, ids))
+        save_index(matrix, ids, idf)
+        return len(ids)
+
+
+def refresh():
+    """
+    Добавляет в индекс записи, появившиеся после его построения.
+    Возвращает их число; без построенного индекса ничего не делает.
+    """
+    if not os.path.exists(index_path()):
+        return 0
+    with _locked():
+        matrix, ids, idf = load_index()
+        last_id = int(ids.max()) if len(ids) else 0
+        new = list(Post.objects.filter(pk__gt=last_id).order_by("pk").values_list(
+            "pk", "text"
+        ))
+        if not new:
+            return 0
+        new_ids = np.array([pk for pk, _ in new], dtype=np.int64)
+        new_matrix = weigh(term_counts(text for _, text in new), idf)
+        matrix = sparse.vstack([matrix, new_matrix], format="csr")
+        ids = np.concatenate([ids, new_ids])
+
+        k, threshold = top_k(), min_score()
+        neighbours = {}
+        candidates = defaultdict(list)
+        for start, block in similarity_blocks(new_matrix, matrix):
+            for row in range(block.shape[0]):
+                own = int(new_ids[start + row])
+                cols, scores = _row(block, row, own, ids, threshold)
+                for post_id, score in zip(ids[cols].tolist(), scores.tolist()):
+                    if post_id <= last_id:
+                        # Новая запись может войти в список старой
+                        candidates[post_id].append((own, score))
+                cols, scores = _best(cols, scores, k)
+                neighbours[own] = list(zip(ids[cols].tolist(), scores.tolist()))
+
+        current = defaultdict(list)
+        post_ids = list(candidates)
+        for start in range(0, len(post_ids), WRITE_BATCH_SIZE):
+            rows = RelatedPost.objects.filter(
+                post_id__in=post_ids[start:start + WRITE_BATCH_SIZE]
+            ).values_list("post_id", "related_id", "score")
+            for post_id, related_id, score in rows:
+                current[post_id].append((related_id, score))
+        for post_id, added in candidates.items():
+            merged = sorted(current[post_id] + added, key=lambda item: -item[1])[:k]
+            if merged != current[post_id]:
+                neighbours[post_id] = merged
+
+        store(neighbours.items())
+        save_index(matrix, ids, idf)
+        return len(new)
@@ -0,0 +1,110 @@
+"""
+HTML текста записей и комментариев.
+
+Раньше текст экранировался и разбивался на строки фильтром
+linebreaksbr при каждой отрисовке каждой записи в каждой ленте.
+Теперь готовый HTML считается один раз при сохранении и хранится
+в поле text_html рядом с исходным текстом; здесь же ссылки,
+упоминания @пользователей и #хэштеги превращаются в <a>. Строки,
+сохраненные до появления поля, заполняет команда render_texts.
+
+Для текста без ссылок, упоминаний и хэштегов результат совпадает
+с {{ text|linebreaksbr }}.
+"""
+
+import re
+
+from django.contrib.auth import get_user_model
+from django.utils.html import escape
+
+from yatube.urlbuilder import url_for
+
+
+# Ссылка не заканчивается знаком препинания, за которым она стоит
+URL_RE = r"https?://[^\s<>\"']*[^\s<>\"'.,!?:;)\]]"
+# Имя пользователя - как в UnicodeUsernameValidator, но без "@"
+# (чтобы не задеть адреса почты) и без точки в конце
+MENTION_RE = r"(?<![\w@])@(?P<mention>[\w.+-]*[\w+-])"
+HASHTAG_RE = r"(?<![\w#&])#(?P<hashtag>\w+)"
+TAG_MAX_LENGTH = 100
+_TOKEN_RE = re.compile(f"(?P<url>{URL_RE})|{MENTION_RE}|{HASHTAG_RE}")
+
+
+def mentions(text):
+    return {
+        match.group("mention") for match in _TOKEN_RE.finditer(text)
+        if match.group("mention")
+    }
+
+
+def hashtags(text):
+    """
+    Имена хэштегов текста в нижнем регистре.
+    """
+    return {
+        match.group("hashtag").lower() for match in _TOKEN_RE.finditer(text)
+        if match.group("hashtag") and len(match.group("hashtag")) <= TAG_MAX_LENGTH
+    }
+
+
+def existing_usernames(names):
+    """
+    Из имен оставляет те, у которых есть пользователь: упоминание
+    несуществующего имени остается текстом.
+    """
+    if not names:
+        return set()
+    return set(get_user_model().objects.filter(
+        username__in=names
+    ).values_list("username", flat=True))
+
+
+def _render_token(match, usernames):
+    if match.group("url"):
+        url = escape(match.group("url"))
+        return f'<a href="{url}" rel="nofollow noopener" target="_blank">{url}</a>'
+    hashtag = match.group("hashtag")
+    if hashtag is not None:
+        if len(hashtag) > TAG_MAX_LENGTH:
+            return escape(match.group(0))
+        url = escape(url_for("tag", name=hashtag.lower()))
+        return f'<a class="hashtag" href="{url}">#{escape(hashtag)}</a>'
+    username = match.group("mention")
+    if username not in usernames:
+        return escape(match.group(0))
+    return (
+        f'<a class="mention" href="{escape(url_for("profile", username=username))}">'
+        f"@{escape(username)}</a>"
+    )
+
+
+def render(text, usernames=None):
+    """
+    HTML текста. usernames - уже проверенные имена из текста; если
+    не переданы, они проверяются одним запросом.
+    """
+    if usernames is None:
+        usernames = existing_usernames(mentions(text))
+    parts = []
+    position = 0
+    for match in _TOKEN_RE.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        parts.append(_render_token(match, usernames))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    html = "".join(parts)
+    # Как linebreaksbr
+    return html.replace("\r\n", "\n").replace("\r", "\n").replace("\n", "<br>")
+
+
+def render_many(instances):
+    """
+    Заполняет text_html у пачки записей или комментариев с одним
+    запросом на все упоминания.
+    """
+    names = set()
+    for instance in instances:
+        names |= mentions(instance.text)
+    usernames = existing_usernames(names)
+    for instance in instances:
+        instance.text_html = render(instance.text, usernames)
@@ -0,0 +1,226 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save,
+)
+from django.dispatch import receiver
+
+from yatube.broadcast import publish
+
+from . import autocomplete, fingerprints, storage, tags, threads
+from .models import Comment, Fingerprint, Group, Post, PostEvent
+from .tasks import fan_out_post_event, refresh_related
+
+
+GROUP_INDEX_CACHE_KEY = make_template_fragment_key("group_index")
+
+
+def invalidate_group_index():
+    """
+    Сбрасывает закэшированный список сообществ.
+    """
+    cache.delete(GROUP_INDEX_CACHE_KEY)
+
+
+def refresh_last_post_date(group_id):
+    last_post_date = Post.objects.filter(
+        group_id=group_id
+    ).aggregate(last=Max("pub_date"))["last"]
+    Group.objects.filter(pk=group_id).update(last_post_date=last_post_date)
+
+
+# Поле не загружено (only/defer): исходное значение неизвестно
+_DEFERRED = object()
+
+
+def _file_name(value):
+    # В __dict__ лежит строка из базы или FieldFile после обращения
+    return getattr(value, "name", value) or None
+
+
+@receiver(post_init, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    # Чтение через __dict__ не подгружает отложенные поля
+    instance._original_group_id = instance.__dict__.get("group_id", _DEFERRED)
+    instance._original_text = instance.__dict__.get("text", _DEFERRED)
+    image = instance.__dict__.get("image", _DEFERRED)
+    instance._original_image = image if image is _DEFERRED else _file_name(image)
+
+
+@receiver(pre_save, sender=Post)
+def load_deferred_group(sender, instance, **kwargs):
+    if (instance.pk and instance._original_group_id is _DEFERRED
+            and "group_id" in instance.__dict__):
+        # Сообщество назначено экземпляру, загруженному без него
+        instance._original_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list("group_id", flat=True).first()
+    if (instance.pk and instance._original_image is _DEFERRED
+            and "image" in instance.__dict__):
+        instance._original_image = _file_name(Post.all_objects.filter(
+            pk=instance.pk
+        ).values_list("image", flat=True).first())
+
+
+@receiver(post_save, sender=Post)
+def update_group_counters_on_save(sender, instance, created, **kwargs):
+    old_group_id = None if created else instance._original_group_id
+    if old_group_id is _DEFERRED:
+        # Сообщество не загружалось и не сохранялось
+        return
+    new_group_id = instance.group_id
+    instance._original_group_id = new_group_id
+    if old_group_id == new_group_id:
+        return
+    if old_group_id is not None:
+        Group.objects.filter(pk=old_group_id).update(
+            posts_count=F("posts_count") - 1
+        )
+        refresh_last_post_date(old_group_id)
+    if new_group_id is not None:
+        if created:
+            Group.objects.filter(pk=new_group_id).update(
+                posts_count=F("posts_count") + 1,
+                last_post_date=instance.pub_date,
+            )
+        else:
+            Group.objects.filter(pk=new_group_id).update(
+                posts_count=F("posts_count") + 1
+            )
+            refresh_last_post_date(new_group_id)
+    invalidate_group_index()
+
+
+@receiver(post_save, sender=Post)
+def update_media_refcounts(sender, instance, created, **kwargs):
+    if "image" not in instance.__dict__:
+        return
+    new = _file_name(instance.__dict__["image"])
+    old = None if created else instance._original_image
+    instance._original_image = new
+    if old is _DEFERRED or old == new:
+        return
+    if new:
+        storage.acquire([new])
+    if old:
+        storage.release([old])
+
+
+@receiver(post_delete, sender=Post)
+def release_media_on_delete(sender, instance, **kwargs):
+    name = _file_name(instance.__dict__.get("image"))
+    if name:
+        storage.release([name])
+
+
+@receiver(post_save, sender=Post)
+def record_new_post_event(sender, instance, created, **kwargs):
+    if created:
+        event = PostEvent.objects.create(post=instance)
+        fan_out_post_event.delay(event.pk, key=f"post-event-{event.pk}")
+
+
+@receiver(post_save, sender=Post)
+def schedule_related_refresh(sender, instance, created, **kwargs):
+    if created:
+        # Новые записи в пределах минуты обслуживает одна задача
+        minute = int(time.time()) // 60
+        refresh_related.delay(key=f"refresh-related-{minute}", countdown=60)
+
+
+def publish_on_commit(channel, pk):
+    # Без живых обновлений (админка, WSGI) рассыльщик не создается
+    if not getattr(settings, "LIVE_UPDATES", False):
+        return
+    # Подписчики читают элемент из базы, поэтому событие уходит только
+    # после фиксации транзакции
+    transaction.on_commit(lambda: publish(channel, {"id": pk}))
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit("feed", instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(f"post:{instance.post_id}", instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def update_comments_count_on_save(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F("comments_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def update_comments_count_on_delete(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=F("comments_count") - 1
+    )
+
+
+@receiver(post_save, sender=Comment)
+def attach_reply(sender, instance, created, **kwargs):
+    if created:
+        threads.attach([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def update_replies_count_on_delete(sender, instance, **kwargs):
+    if instance.parent_id is not None:
+        Comment.all_objects.filter(pk=instance.parent_id).update(
+            replies_count=F("replies_count") - 1
+        )
+
+
+@receiver(post_delete, sender=Post)
+def update_group_counters_on_delete(sender, instance, **kwargs):
+    if instance.group_id is None:
+        return
+    Group.objects.filter(pk=instance.group_id).update(
+        posts_count=F("posts_count") - 1
+    )
+    refresh_last_post_date(instance.group_id)
+    invalidate_group_index()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_index_on_group_change(sender, **kwargs):
+    invalidate_group_index()
+    autocomplete.invalidate()
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, created, **kwargs):
+    if "text" not in instance.__dict__:
+        return
+    if created or instance.text != instance._original_text:
+        fingerprints.index(Fingerprint.POST, [instance])
+        tags.index_posts([instance])
+    instance._original_text = instance.text
+
+
+@receiver(post_save, sender=Comment)
+def index_comment_fingerprint(sender, instance, **kwargs):
+    fingerprints.index(Fingerprint.COMMENT, [instance])
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_fingerprint(sender, instance, **kwargs):
+    fingerprints.remove(Fingerprint.POST, [instance.pk])
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_fingerprint(sender, instance, **kwargs):
+    fingerprints.remove(Fingerprint.COMMENT, [instance.pk])
@@ -0,0 +1,232 @@
+"""
+Карта сайта для поисковых роботов: записи, профили и сообщества.
+
+Без нее роботы находят записи, листая ?page=N главной и сообществ -
+самые дорогие страницы сайта. Каждый раздел делится на файлы по
+диапазонам первичного ключа ([n * SITEMAP_CHUNK_SIZE, (n + 1) *
+SITEMAP_CHUNK_SIZE)), так что в файле не больше 50 000 адресов, как
+требует протокол. Файлы пишутся потоком: строки читаются через
+.iterator() и сразу уходят в gzip, поэтому память не зависит от числа
+строк. Индекс sitemap.xml ссылается на все файлы.
+
+В state.json для раздела хранится наибольший pk, уже попавший в карту.
+Обычный запуск (команда build_sitemaps, например раз в час по cron)
+переписывает только последний неполный диапазон и новые после него;
+удаления и правки в старых диапазонах учитывает запуск с --full.
+"""
+
+import gzip
+import json
+import os
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db.models import Max
+from django.http import Http404
+
+from yatube.staticfiles import serve_file
+from yatube.urlbuilder import url_for
+
+from .models import Group, Post, User
+
+
+INDEX_NAME = "sitemap.xml"
+STATE_NAME = "state.json"
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+class Section:
+    name = None
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def fields(self):
+        """
+        Поля для values_list, первое - pk.
+        """
+        raise NotImplementedError
+
+    def entry(self, row):
+        """
+        Путь страницы и дата изменения (или None) для строки.
+        """
+        raise NotImplementedError
+
+
+class PostSection(Section):
+    name = "posts"
+
+    def queryset(self):
+        return Post.objects.all()
+
+    def fields(self):
+        return ("pk", "author__username", "pub_date")
+
+    def entry(self, row):
+        pk, username, pub_date = row
+        return url_for("post", username=username, post_id=pk), pub_date
+
+
+class ProfileSection(Section):
+    name = "profiles"
+
+    def queryset(self):
+        return User.objects.filter(is_active=True)
+
+    def fields(self):
+        return ("pk", "username")
+
+    def entry(self, row):
+        return url_for("profile", username=row[1]), None
+
+
+class GroupSection(Section):
+    name = "groups"
+
+    def queryset(self):
+        return Group.objects.all()
+
+    def fields(self):
+        return ("pk", "slug", "last_post_date")
+
+    def entry(self, row):
+        _, slug, last_post_date = row
+        return url_for("group", slug=slug), last_post_date
+
+
+SECTIONS = (PostSection(), ProfileSection(), GroupSection())
+
+
+def root():
+    return settings.SITEMAP_ROOT
+
+
+def chunk_size():
+    return getattr(settings, "SITEMAP_CHUNK_SIZE", 50000)
+
+
+def base_url():
+    protocol = getattr(settings, "SITEMAP_PROTOCOL", "https")
+    return f"{protocol}://{Site.objects.get_current().domain}"
+
+
+def chunk_name(section, number):
+    return f"{section.name}-{number:05d}.xml.gz"
+
+
+def _replace(path, write):
+    # Робот не должен увидеть наполовину записанный файл
+    with open(path + ".tmp", "wb") as file:
+        write(file)
+    os.replace(path + ".tmp", path)
+
+
+def write_chunk(section, number, base):
+    """
+    Записывает файл диапазона. Возвращает число адресов и самую
+    позднюю дату изменения; пустой диапазон удаляет файл.
+    """
+    size = chunk_size()
+    rows = section.queryset().filter(
+        pk__gte=number * size, pk__lt=(number + 1) * size
+    ).order_by("pk").values_list(*section.fields())
+    path = os.path.join(root(), chunk_name(section, number))
+    stats = {"count": 0, "lastmod": None}
+
+    def write(file):
+        with gzip.GzipFile(fileobj=file, mode="wb", mtime=0) as archive:
+            archive.write(
+                f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n'
+                .encode()
+            )
+            for row in rows.iterator(chunk_size=2000):
+                location, lastmod = section.entry(row)
+                line = f"<url><loc>{escape(base + location)}</loc>"
+                if lastmod is not None:
+                    line += f"<lastmod>{lastmod.date().isoformat()}</lastmod>"
+                    if stats["lastmod"] is None or lastmod > stats["lastmod"]:
+                        stats["lastmod"] = lastmod
+                archive.write((line + "</url>\n").encode())
+                stats["count"] += 1
+            archive.write(b"</urlset>\n")
+
+    _replace(path, write)
+    if not stats["count"]:
+        os.remove(path)
+    return stats["count"], stats["lastmod"]
+
+
+def load_state():
+    try:
+        with open(os.path.join(root(), STATE_NAME)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_index(state, base):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<sitemapindex xmlns="{XMLNS}">',
+    ]
+    for section in SECTIONS:
+        chunks = state.get(section.name, {}).get("chunks", {})
+        for number, lastmod in sorted(chunks.items(), key=lambda item: int(item[0])):
+            line = f"<sitemap><loc>{escape(base)}/sitemaps/{chunk_name(section, int(number))}</loc>"
+            if lastmod:
+                line += f"<lastmod>{lastmod}</lastmod>"
+            lines.append(line + "</sitemap>")
+    lines.append("</sitemapindex>\n")
+    _replace(
+        os.path.join(root(), INDEX_NAME),
+        lambda file: file.write("\n".join(lines).encode()),
+    )
+
+
+def build(full=False):
+    """
+    Обновляет файлы карты сайта. Возвращает число записанных файлов.
+    """
+    os.makedirs(root(), exist_ok=True)
+    state = {} if full else load_state()
+    if full:
+        for name in os.listdir(root()):
+            if name.endswith(".xml.gz"):
+                os.remove(os.path.join(root(), name))
+    base = base_url()
+    size = chunk_size()
+    written = 0
+    for section in SECTIONS:
+        info = state.setdefault(section.name, {"covered": 0, "chunks": {}})
+        last = section.queryset().aggregate(last=Max("pk"))["last"]
+        if last is None or (info["chunks"] and last <= info["covered"]):
+            continue
+        # Диапазон, в котором закончился прошлый проход, дописывается
+        for number in range(info["covered"] // size, last // size + 1):
+            count, lastmod = write_chunk(section, number, base)
+            if count:
+                info["chunks"][str(number)] = lastmod and lastmod.date().isoformat()
+                written += 1
+            else:
+                info["chunks"].pop(str(number), None)
+        info["covered"] = last
+    write_index(state, base)
+    _replace(
+        os.path.join(root(), STATE_NAME),
+        lambda file: file.write(json.dumps(state).encode()),
+    )
+    return written
+
+
+def serve(request, name=INDEX_NAME):
+    if name != INDEX_NAME and not name.endswith(".xml.gz"):
+        raise Http404(name)
+    response = serve_file(request, name, root(), "public, max-age=3600")
+    if response is None:
+        raise Http404(name)
+    if name.endswith(".gz") and response.status_code == 200:
+        # Файл отдается как есть, без Content-Encoding
+        response["Content-Type"] = "application/gzip"
+    return response
@@ -0,0 +1,129 @@
+"""
+Хранилище картинок записей по содержимому.
+
+Файл называется SHA-256 своего содержимого и лежит в двух уровнях
+каталогов по первым символам хэша:
+
+    posts/3f/a9/3fa9...e1.jpg
+
+В одном каталоге остается не больше нескольких сотен файлов при любом
+их числе, а повторная загрузка той же картинки не занимает места:
+имя совпадает, и файл не записывается. Сколько записей ссылается на
+файл, хранит MediaFile.refcount (acquire и release вызываются
+из сигналов записи и при стирании записей); файлы с нулевым счетчиком
+удаляет команда collect_media_garbage, записи она не проверяет. Поэтому
+картинку записи меняют через save(), а не queryset.update().
+Старые плоские имена переносит команда migrate_media,
+а их адреса перенаправляются на новые по таблице MediaAlias.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+
+HASHED_NAME_RE = re.compile(r"^[\w-]+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[a-z0-9]+)?$")
+_EXTENSION_RE = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+def is_hashed(name):
+    return bool(name) and HASHED_NAME_RE.match(name) is not None
+
+
+def hashed_name(directory, digest, extension):
+    return f"{directory}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def content_digest(content):
+    sha = hashlib.sha256()
+    for chunk in content.chunks():
+        sha.update(chunk)
+    return sha.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя означает одинаковое содержимое
+        return name
+
+    def store(self, name, content):
+        """
+        Записывает файл под именем по содержимому, если такого еще нет,
+        и возвращает это имя. Базу не трогает.
+        """
+        directory = os.path.dirname(name) or "files"
+        extension = os.path.splitext(name)[1].lower()
+        if not _EXTENSION_RE.match(extension):
+            extension = ""
+        name = hashed_name(directory, content_digest(content), extension)
+        path = self.path(name)
+        if os.path.exists(path):
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Во временный файл рядом и переименование: одновременная
+        # загрузка того же файла просто заменит его таким же
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+    def _save(self, name, content):
+        name = self.store(name, content)
+        touch([name])
+        return name
+
+
+def touch(names):
+    """
+    Отмечает время загрузки файлов: сборщик мусора не удаляет файл
+    без ссылок, пока запись с ним, возможно, еще сохраняется.
+    """
+    from .models import MediaFile
+
+    names = [name for name in names if is_hashed(name)]
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name) for name in names], ignore_conflicts=True
+    )
+    MediaFile.objects.filter(name__in=names).update(updated=timezone.now())
+
+
+def _adjust(names, sign):
+    from .models import MediaFile
+
+    counts = Counter(name for name in names if is_hashed(name))
+    if not counts:
+        return
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name) for name in counts], ignore_conflicts=True
+    )
+    for name, count in counts.items():
+        MediaFile.objects.filter(name=name).update(
+            refcount=F("refcount") + sign * count
+        )
+
+
+def acquire(names):
+    _adjust(names, 1)
+
+
+def release(names):
+    _adjust(names, -1)
+
+
+media_storage = ContentAddressedStorage()
@@ -0,0 +1,131 @@
+"""
+Хэштеги и упоминания в текстах записей.
+
+При сохранении записи #хэштеги и @имена из текста раскладываются
+по таблицам PostTag и Mention. Лента хэштега читается по индексу
+(tag, -pub_date, -post) постранично по ключу: курсор - дата и id
+последней показанной записи, поэтому любая страница стоит одинаково,
+без OFFSET. Уведомления об упоминаниях создает пачками отдельная
+задача notify_mentions.
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import rendering
+from .models import Mention, Post, PostTag, Tag, User
+from .tasks import notify_mentions
+
+
+PAGE_SIZE = 10
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def schedule_mention_notifications():
+    # Упоминания в пределах минуты обслуживает одна задача
+    minute = int(time.time()) // 60
+    notify_mentions.delay(key=f"notify-mentions-{minute}", countdown=60)
+
+
+def _tag_ids(names):
+    if not names:
+        return {}
+    Tag.objects.bulk_create(
+        [Tag(name=name) for name in names], ignore_conflicts=True
+    )
+    return dict(Tag.objects.filter(name__in=names).values_list("name", "pk"))
+
+
+def _user_ids(names):
+    if not names:
+        return {}
+    return dict(User.objects.filter(
+        username__in=names
+    ).values_list("username", "pk"))
+
+
+def index_posts(posts, notify=True):
+    """
+    Обновляет хэштеги и упоминания записей. Возвращает число новых
+    упоминаний; при notify=False уведомления о них не создаются.
+    """
+    tags_by_post = {post.pk: rendering.hashtags(post.text) for post in posts}
+    names_by_post = {post.pk: rendering.mentions(post.text) for post in posts}
+    tag_ids = _tag_ids(set().union(*tags_by_post.values()))
+    user_ids = _user_ids(set().union(*names_by_post.values()))
+
+    post_ids = list(tags_by_post)
+    mentioned = {
+        (post.pk, user_ids[name])
+        for post in posts for name in names_by_post[post.pk]
+        if name in user_ids and user_ids[name] != post.author_id
+    }
+    with transaction.atomic():
+        PostTag.objects.filter(post_id__in=post_ids).delete()
+        PostTag.objects.bulk_create([
+            PostTag(tag_id=tag_ids[name], post_id=post.pk, pub_date=post.pub_date)
+            for post in posts for name in tags_by_post[post.pk]
+        ])
+        # Уже записанные упоминания остаются: правка записи не должна
+        # уведомлять повторно
+        existing = set(Mention.objects.filter(
+            post_id__in=post_ids
+        ).values_list("post_id", "user_id"))
+        removed = defaultdict(list)
+        for post_id, user_id in existing - mentioned:
+            removed[post_id].append(user_id)
+        for post_id, removed_ids in removed.items():
+            Mention.objects.filter(post_id=post_id, user_id__in=removed_ids).delete()
+        added = mentioned - existing
+        Mention.objects.bulk_create(
+            [Mention(post_id=post_id, user_id=user_id, notified=not notify)
+             for post_id, user_id in added],
+            ignore_conflicts=True,
+        )
+    if added and notify:
+        schedule_mention_notifications()
+    return len(added)
+
+
+def encode_cursor(pub_date, post_id):
+    micros = (pub_date - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}_{post_id}"
+
+
+def decode_cursor(cursor):
+    """
+    (дата, id записи) из курсора или None для неверного курсора.
+    """
+    try:
+        micros, post_id = (int(part) for part in cursor.split("_"))
+        return _EPOCH + timedelta(microseconds=micros), post_id
+    except (OverflowError, ValueError):
+        return None
+
+
+def tag_feed(tag, cursor=None, size=PAGE_SIZE):
+    """
+    Записи с хэштегом, новые сначала, начиная после курсора.
+    Возвращает список записей и курсор следующей страницы (или None).
+    """
+    links = PostTag.objects.filter(tag=tag, post__is_deleted=False)
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        pub_date, post_id = position
+        links = links.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, post_id__lt=post_id)
+        )
+    rows = list(links.order_by("-pub_date", "-post_id").values_list(
+        "pub_date", "post_id"
+    )[:size + 1])
+    next_cursor = encode_cursor(*rows[size - 1]) if len(rows) > size else None
+    rows = rows[:size]
+    posts = Post.objects.select_related("author", "group").in_bulk(
+        [post_id for _, post_id in rows]
+    )
+    return [posts[post_id] for _, post_id in rows if post_id in posts], next_cursor
@@ -0,0 +1,68 @@
+from django.conf import settings
+
+from jobs.registry import task
+
+from .models import Group, PostEvent, User
+from .notifications import fan_out_event, notify_pending_mentions
+
+
+@task()
+def fan_out_post_event(event_id):
+    event = PostEvent.objects.select_related("post").filter(
+        pk=event_id, processed=False
+    ).first()
+    if event is None:
+        return
+    fan_out_event(event)
+    PostEvent.objects.filter(pk=event_id).update(processed=True)
+
+
+@task()
+def notify_mentions():
+    notify_pending_mentions()
+
+
+@task()
+def refresh_related():
+    # numpy и scipy нужны только здесь
+    from .related import refresh
+
+    refresh()
+
+
+@task()
+def flush_like_counts():
+    from .likes import flush
+
+    flush()
+
+
+@task()
+def purge_deleted():
+    from .deletion import purge_batch, schedule_purge
+
+    for _ in range(getattr(settings, "PURGE_MAX_BATCHES", 100)):
+        if not purge_batch():
+            return
+    # Остальное - следующей задачей, чтобы не занимать воркер надолго
+    schedule_purge()
+
+
+@task()
+def purge_group(group_id):
+    from .deletion import purge_batch
+
+    while purge_batch():
+        pass
+    Group.objects.filter(pk=group_id).delete()
+
+
+@task()
+def purge_user(user_id):
+    from .deletion import purge_batch, purge_user_relations
+
+    while purge_batch():
+        pass
+    purge_user_relations(user_id)
+    # Связанных строк не осталось, обычное удаление ничего не собирает
+    User.objects.filter(pk=user_id).delete()
@@ -1,8 +1,37 @@
-from django.test import TestCase, Client
-from posts.models import Post, User, Group, Follow, Comment
+import asyncio
+
+from asgiref.sync import async_to_sync
+from channels.testing import ApplicationCommunicator, HttpCommunicator
+from django.test import RequestFactory, TestCase, TransactionTestCase, Client
+from jobs.models import Job
+from posts import deletion, likes, sitemaps, threads
+from posts.management.commands import collect_media_garbage
+from posts.autocomplete import search_groups
+from posts.forms import PostForm
+from posts.models import (
+    Post, User, Group, Follow, Comment, Notification, Fingerprint, Mention, PostTag,
+    RelatedPost, MediaFile, Like, LikeCounter, DigestOptOut,
+)
+from yatube.staticfiles import serve_media
+from posts.notifications import fan_out_pending_events, send_digests, unread_count
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.core.files.uploadedfile import SimpleUploadedFile
+import gzip
+import os
+import shutil
 import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 from PIL import Image
 
 
@@ -318,3 +347,1072 @@ class TestComment(TestCase, CommonFunc):
             ),
         )
         self.assertNotEqual(response, "You can't!")
+
+
+class TestGroupIndex(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="groupie")
+        self.group = Group.objects.create(
+            title="counted group", slug="counted", description="description",
+        )
+        self.other_group = Group.objects.create(
+            title="other group", slug="other", description="description",
+        )
+
+    def test_group_counters(self):
+        """
+        Тест проверяет, что счетчики сообщества обновляются при
+        создании, переносе и удалении записей.
+        """
+        post = Post.objects.create(text="first", author=self.user, group=self.group)
+        Post.objects.create(text="second", author=self.user, group=self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertIsNotNone(self.group.last_post_date)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertIsNone(self.other_group.last_post_date)
+
+    def test_group_index_invalidated(self):
+        """
+        Тест проверяет, что закэшированный список сообществ
+        сбрасывается после публикации записи.
+        """
+        response = self.client.get(reverse("group_index"))
+        self.assertContains(response, self.group.title)
+        self.assertContains(response, "Записей: 0")
+        Post.objects.create(text="post", author=self.user, group=self.group)
+        response = self.client.get(reverse("group_index"))
+        self.assertContains(response, "Записей: 1")
+
+
+class TestGroupCountersMigration(TransactionTestCase):
+    before = [("posts", "0007_follow")]
+    after = [("posts", "0008_group_counters")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfill(self):
+        """
+        Тест проверяет, что миграция заполняет счетчики сообществ
+        с несколькими записями.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        group = apps.get_model("posts", "Group").objects.create(
+            title="old group", slug="old", description="description",
+        )
+        author = apps.get_model("auth", "User").objects.create(username="veteran")
+        Post = apps.get_model("posts", "Post")
+        for text in ("first", "second", "third"):
+            last = Post.objects.create(text=text, author=author, group=group)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        group = apps.get_model("posts", "Group").objects.get(pk=group.pk)
+        self.assertEqual(group.posts_count, 3)
+        self.assertEqual(group.last_post_date, last.pub_date)
+
+
+class TestFollowUniqueMigration(TransactionTestCase):
+    before = [("posts", "0019_likes")]
+    after = [("posts", "0020_follow_unique")]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_removed(self):
+        """
+        Тест проверяет, что миграция удаляет повторные подписки
+        и добавляет ограничение уникальности.
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        User = apps.get_model("auth", "User")
+        reader = User.objects.create(username="reader")
+        writer = User.objects.create(username="writer")
+        Follow = apps.get_model("posts", "Follow")
+        first = Follow.objects.create(user=reader, author=writer)
+        Follow.objects.create(user=reader, author=writer)
+        Follow.objects.create(user=writer, author=reader)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        Follow = apps.get_model("posts", "Follow")
+        self.assertEqual(Follow.objects.count(), 2)
+        self.assertTrue(Follow.objects.filter(pk=first.pk).exists())
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user_id=reader.pk, author_id=writer.pk)
+
+
+class TestNotifications(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="writer")
+        self.reader = User.objects.create_user(
+            username="reader", email="reader@example.com"
+        )
+        self.auth_reader = Client()
+        self.auth_reader.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_fan_out_and_badge(self):
+        """
+        Тест проверяет, что подписчик получает уведомление о новой записи,
+        видит счетчик в меню, а лента подписок сбрасывает его.
+        """
+        Post.objects.create(text="news", author=self.author)
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertEqual(fan_out_pending_events(), 1)
+        self.assertEqual(fan_out_pending_events(), 0)
+        self.assertEqual(
+            Notification.objects.filter(user=self.reader, is_read=False).count(), 1
+        )
+        response = self.auth_reader.get(reverse("index"))
+        self.assertContains(response, 'class="badge badge-danger">1<')
+        self.auth_reader.get(reverse("follow_index"))
+        response = self.auth_reader.get(reverse("index"))
+        self.assertNotContains(response, "badge-danger")
+
+    def test_digest(self):
+        """
+        Тест проверяет, что дайджест отправляется одним письмом
+        на пользователя и только один раз.
+        """
+        Post.objects.create(text="first news", author=self.author)
+        Post.objects.create(text="second news", author=self.author)
+        fan_out_pending_events()
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("second news", mail.outbox[0].body)
+        self.assertIn(reverse("digest_off"), mail.outbox[0].body)
+        self.assertEqual(
+            mail.outbox[0].subject, "Новые записи авторов, на которых вы подписаны"
+        )
+        self.assertEqual(send_digests(), 0)
+
+    def test_digest_batches_and_subjects(self):
+        """
+        Тест проверяет, что пользователи обрабатываются пачками, а тема
+        письма об упоминании не говорит о подписках.
+        """
+        other = User.objects.create_user(username="other", email="other@example.com")
+        post = Post.objects.create(text="news", author=self.author)
+        fan_out_pending_events()
+        Notification.objects.create(
+            user=other, post=post, reason=Notification.MENTION
+        )
+        self.assertEqual(send_digests(size=1), 2)
+        subjects = {message.to[0]: message.subject for message in mail.outbox}
+        self.assertEqual(subjects["other@example.com"], "Вас упомянули в новых записях")
+
+    def test_digest_opt_out(self):
+        self.auth_reader.get(reverse("digest_off"))
+        Post.objects.create(text="news", author=self.author)
+        fan_out_pending_events()
+        self.assertEqual(send_digests(), 0)
+        self.assertFalse(Notification.objects.filter(is_emailed=False).exists())
+        self.assertEqual(unread_count(self.reader), 1)
+        self.auth_reader.get(reverse("digest_on"))
+        self.assertFalse(DigestOptOut.objects.exists())
+
+    def test_deleted_post_notifications_cleared(self):
+        post = Post.objects.create(text="news", author=self.author)
+        fan_out_pending_events()
+        deletion.delete_posts(Post.objects.filter(pk=post.pk))
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_count(self.reader), 0)
+        self.assertEqual(send_digests(), 0)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_fan_out_eager(self):
+        """
+        Тест проверяет, что при немедленном выполнении задач уведомления
+        создаются сразу после публикации записи.
+        """
+        Post.objects.create(text="news", author=self.author)
+        self.assertEqual(Notification.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(fan_out_pending_events(), 0)
+
+
+class TestAsyncPages(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="async_author")
+        self.post = Post.objects.create(text="async post text", author=self.author)
+        Comment.objects.create(post=self.post, author=self.author, text="async comment")
+        other = User.objects.create_user(username="async_other")
+        similar = Post.objects.create(text="similar post text", author=other)
+        RelatedPost.objects.create(
+            post=self.post, related=similar, rank=0, score=0.5
+        )
+
+    def fetch(self, path):
+        from yatube.asgi import application
+
+        async def request():
+            communicator = HttpCommunicator(
+                application, "GET", path, headers=[(b"host", b"testserver")]
+            )
+            return await communicator.get_response(timeout=5)
+
+        return async_to_sync(request)()
+
+    def test_post_page(self):
+        """
+        Тест проверяет, что асинхронная страница записи выводит
+        запись, комментарии, счетчики и похожие записи.
+        """
+        response = self.fetch(f"/{self.author.username}/{self.post.id}/")
+        self.assertEqual(response["status"], 200)
+        body = response["body"].decode()
+        self.assertIn("async post text", body)
+        self.assertIn("async comment", body)
+        self.assertIn("Записей: 1", body)
+        self.assertIn("similar post text", body)
+
+    def test_missing_post(self):
+        response = self.fetch(f"/{self.author.username}/{self.post.id + 1}/")
+        self.assertEqual(response["status"], 404)
+
+    def test_index(self):
+        response = self.fetch("/?page=5")
+        self.assertEqual(response["status"], 200)
+        self.assertIn("async post text", response["body"].decode())
+
+    def test_numeric_group_slug(self):
+        """
+        Тест проверяет, что /group/<цифры>/ под ASGI ведет на страницу
+        сообщества, а не на запись пользователя group.
+        """
+        group = Group.objects.create(title="Год", slug="2020")
+        Post.objects.create(text="group post text", author=self.author, group=group)
+        response = self.fetch("/group/2020/")
+        self.assertEqual(response["status"], 200)
+        self.assertIn("group post text", response["body"].decode())
+
+
+@override_settings(LIVE_UPDATES=True)
+class TestLiveUpdates(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="live_author")
+        self.post = Post.objects.create(text="live post text", author=self.author)
+        self.old_comment = Comment.objects.create(
+            post=self.post, author=self.author, text="old comment"
+        )
+
+    def open_stream(self, path, headers=()):
+        from yatube.asgi import application
+
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "path": path,
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")] + list(headers),
+        }
+        return ApplicationCommunicator(application, scope)
+
+    @override_settings(LIVE_UPDATES=False)
+    def test_disabled_does_not_publish(self):
+        with mock.patch("posts.signals.publish") as publish:
+            Comment.objects.create(post=self.post, author=self.author, text="quiet")
+            Post.objects.create(text="quiet post", author=self.author)
+        publish.assert_not_called()
+
+    def test_new_comment_is_streamed(self):
+        """
+        Тест проверяет, что подписчик потока комментариев получает
+        только новый комментарий готовым фрагментом страницы.
+        """
+        from yatube.async_views import run_sync
+
+        async def scenario():
+            stream = self.open_stream(
+                f"/live/{self.author.username}/{self.post.id}/"
+            )
+            await stream.send_input({"type": "http.request", "body": b""})
+            start = await stream.receive_output(timeout=5)
+            comment = await run_sync(
+                Comment.objects.create,
+                post=self.post, author=self.author, text="fresh comment",
+            )
+            event = await stream.receive_output(timeout=5)
+            await stream.send_input({"type": "http.disconnect"})
+            await stream.wait(timeout=5)
+            return start, comment, event["body"].decode()
+
+        start, comment, body = async_to_sync(scenario)()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream; charset=utf-8"),
+                      start["headers"])
+        self.assertIn(f"id: {comment.id}", body)
+        self.assertIn("event: comment", body)
+        self.assertIn("fresh comment", body)
+        self.assertNotIn("old comment", body)
+
+    def test_reconnect_receives_missed_posts(self):
+        """
+        Тест проверяет, что после переподключения с Last-Event-ID
+        приходят записи, созданные за время разрыва.
+        """
+        missed = Post.objects.create(text="missed post", author=self.author)
+
+        async def scenario():
+            stream = self.open_stream(
+                "/live/feed/", [(b"last-event-id", str(self.post.id).encode())]
+            )
+            await stream.send_input({"type": "http.request", "body": b""})
+            await stream.receive_output(timeout=5)
+            event = await stream.receive_output(timeout=5)
+            await stream.send_input({"type": "http.disconnect"})
+            await stream.wait(timeout=5)
+            return event["body"].decode()
+
+        body = async_to_sync(scenario)()
+        self.assertIn(f"id: {missed.id}", body)
+        self.assertIn("missed post", body)
+        self.assertNotIn("live post text", body)
+
+    def test_missing_post(self):
+        async def scenario():
+            stream = self.open_stream(f"/live/{self.author.username}/0/")
+            await stream.send_input({"type": "http.request", "body": b""})
+            return await stream.receive_output(timeout=5)
+
+        self.assertEqual(async_to_sync(scenario)()["status"], 404)
+
+    def test_slow_subscriber_is_disconnected(self):
+        """
+        Тест проверяет, что переполненная очередь медленного клиента
+        не растет, а помечается для закрытия потока.
+        """
+        from yatube.broadcast import OVERFLOW, InProcessBroadcaster
+
+        async def scenario():
+            broadcaster = InProcessBroadcaster()
+            subscription = broadcaster.subscribe(["feed"], maxsize=2)
+            for number in range(5):
+                broadcaster.publish("feed", {"id": number})
+            await asyncio.sleep(0)
+            messages = []
+            while not subscription.queue.empty():
+                messages.append(subscription.queue.get_nowait())
+            subscription.close()
+            return messages
+
+        self.assertEqual(async_to_sync(scenario)(), [OVERFLOW])
+
+
+class TestCommentBatching(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="batch_author")
+        self.post = Post.objects.create(text="viral post", author=self.author)
+
+    @override_settings(COMMENT_BATCH_WINDOW=0.05)
+    def test_concurrent_comments_share_transaction(self):
+        """
+        Тест проверяет, что одновременные комментарии записываются
+        общими пачками, каждый запрос получает свой pk, а счетчик
+        комментариев записи верен.
+        """
+        from django.db import connection
+        from posts import batching
+
+        batches = []
+        write_comments = batching.write_comments
+
+        def counting_write(comments):
+            batches.append(len(comments))
+            write_comments(comments)
+
+        def comment(number):
+            try:
+                return batching.add_comment(Comment(
+                    post_id=self.post.id, author=self.author, text=f"burst {number}"
+                ))
+            finally:
+                connection.close()
+
+        with mock.patch.object(batching, "write_comments", counting_write):
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                comments = list(executor.map(comment, range(10)))
+
+        self.assertEqual(sum(batches), 10)
+        self.assertLess(len(batches), 10)
+        for saved in comments:
+            self.assertEqual(Comment.objects.get(pk=saved.pk).text, saved.text)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 10)
+
+    def test_counter_follows_single_saves(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, text="one")
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_add_comment_queries(self):
+        """
+        Тест проверяет, что add_comment читает запись без лишних полей
+        и соединений и записывает комментарий одной пачкой.
+        """
+        client = Client()
+        client.force_login(self.author)
+        url = reverse("add_comment", kwargs={
+            "username": self.author.username, "post_id": self.post.id,
+        })
+        # Сессия и пользователь, запись (id и author_id), пачка
+        # комментариев с путями и счетчиком записи, очистка отпечатков
+        with self.assertNumQueries(12):
+            response = client.post(url, data={"text": "counted comment"})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(text="counted comment").exists())
+
+
+class TestDuplicateDetection(TestCase):
+    TEXT = (
+        "Купите лучшие часы со скидкой прямо сейчас, доставка по всей "
+        "стране бесплатно, пишите в личные сообщения"
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="bot")
+        self.client.force_login(self.user)
+
+    def test_near_duplicate_rejected(self):
+        """
+        Тест проверяет, что текст, почти совпадающий с опубликованным,
+        отклоняется формой, а правка своей записи - нет.
+        """
+        post = Post.objects.create(text=self.TEXT, author=self.user)
+        response = self.client.post(
+            reverse("new_post"), {"text": self.TEXT.replace("часы", "часы!!")}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, "form", "text", "Похожий текст уже был опубликован"
+        )
+        self.assertEqual(Post.objects.count(), 1)
+        response = self.client.post(
+            reverse("post_edit", args=[self.user.username, post.id]),
+            {"text": self.TEXT + " сегодня"},
+        )
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(SPAM_DUPLICATE_ACTION="flag")
+    def test_near_duplicate_flagged(self):
+        first = Post.objects.create(text=self.TEXT, author=self.user)
+        self.client.post(reverse("new_post"), {"text": self.TEXT})
+        second = Post.objects.exclude(pk=first.pk).get()
+        fingerprint = Fingerprint.objects.get(kind="post", object_id=second.pk)
+        self.assertEqual(fingerprint.duplicate_of, first.pk)
+
+    def test_build_command_indexes_existing_rows(self):
+        # bulk_create минует сигналы, как строки, созданные до индекса
+        Post.objects.bulk_create([Post(text=self.TEXT, author=self.user)])
+        self.assertFalse(Fingerprint.objects.exists())
+        call_command("build_fingerprints", stdout=StringIO())
+        self.assertEqual(Fingerprint.objects.filter(kind="post").count(), 1)
+        form = PostForm({"text": self.TEXT})
+        self.assertFalse(form.is_valid())
+
+    def test_comment_compared_within_post(self):
+        """
+        Тест проверяет, что одинаковый комментарий можно оставить под
+        разными записями, но не дважды под одной.
+        """
+        text = "Отличная запись, спасибо большое за подробный рассказ"
+        first = Post.objects.create(text="first", author=self.user)
+        second = Post.objects.create(text="second", author=self.user)
+        for post in (first, second):
+            response = self.client.post(
+                reverse("add_comment", args=[self.user.username, post.id]),
+                {"text": text},
+            )
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.filter(text=text).count(), 2)
+        self.client.post(
+            reverse("add_comment", args=[self.user.username, first.id]),
+            {"text": text},
+        )
+        self.assertEqual(Comment.objects.filter(text=text).count(), 2)
+
+
+class TestSoftDelete(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="prolific")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(title="g", slug="soft", description="d")
+        self.posts = [
+            Post.objects.create(text=f"soft {number}", author=self.author, group=self.group)
+            for number in range(5)
+        ]
+        Comment.objects.create(post=self.posts[0], author=self.reader, text="reply")
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_deleted_posts_hidden_then_purged_in_batches(self):
+        """
+        Тест проверяет, что помеченные записи сразу пропадают из ленты
+        и счетчиков, а очистка стирает их пачками вместе с комментариями.
+        """
+        deletion.delete_posts(Post.objects.filter(pk__in=[p.pk for p in self.posts[:3]]))
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Post.all_objects.count(), 5)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        response = self.client.get(reverse("index"))
+        self.assertNotContains(response, "soft 0")
+        self.assertTrue(Job.objects.filter(name="posts.tasks.purge_deleted").exists())
+
+        with self.settings(PURGE_BATCH_SIZE=2):
+            self.assertEqual(deletion.purge_batch(), 1)  # комментарий
+            self.assertEqual(deletion.purge_batch(), 2)
+            self.assertEqual(deletion.purge_batch(), 1)
+            self.assertEqual(deletion.purge_batch(), 0)
+        self.assertEqual(Post.all_objects.count(), 2)
+        self.assertFalse(Comment.all_objects.exists())
+
+    def test_deleted_comment_updates_counter(self):
+        comment = Comment.objects.get()
+        deletion.delete_comments(Comment.objects.filter(pk=comment.pk))
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].comments_count, 0)
+        self.assertFalse(self.posts[0].comments.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_delete_user(self):
+        deletion.delete_user(self.author)
+        self.assertFalse(User.objects.filter(username="prolific").exists())
+        self.assertFalse(Post.all_objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+
+class TestGroupAutocomplete(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="picker")
+        self.client.force_login(self.user)
+        Group.objects.bulk_create([
+            Group(title=f"Клуб {number}", slug=f"club-{number}",
+                  search_title=f"клуб {number}", description="d")
+            for number in range(50)
+        ])
+        self.group = Group.objects.create(title="Python", slug="py", description="d")
+
+    def test_form_does_not_render_all_groups(self):
+        """
+        Тест проверяет, что форма записи не выводит список всех
+        сообществ, а выбранное сообщество показывает по названию.
+        """
+        response = self.client.get(reverse("new_post"))
+        self.assertNotContains(response, "Клуб 1")
+        self.assertNotContains(response, "<option value")
+        post = Post.objects.create(text="text", author=self.user, group=self.group)
+        response = self.client.get(
+            reverse("post_edit", args=[self.user.username, post.id])
+        )
+        self.assertContains(response, 'value="Python"')
+
+    def test_prefix_search(self):
+        response = self.client.get(reverse("group_autocomplete"), {"q": "пит"})
+        self.assertEqual(response.json(), {"results": []})
+        response = self.client.get(reverse("group_autocomplete"), {"q": "pY"})
+        self.assertEqual(response.json()["results"],
+                         [{"id": self.group.id, "title": "Python", "slug": "py"}])
+        results = self.client.get(
+            reverse("group_autocomplete"), {"q": "клуб 1"}
+        ).json()["results"]
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(item["title"].startswith("Клуб 1") for item in results))
+
+    def test_search_cache_invalidated(self):
+        self.assertEqual(len(search_groups("rust")), 0)
+        Group.objects.create(title="Rust", slug="rust", description="d")
+        self.assertEqual(len(search_groups("rust")), 1)
+
+    def test_group_validated_by_pk(self):
+        with self.assertNumQueries(1):
+            form = PostForm({"text": "a", "group": self.group.id})
+            form.fields["group"].clean(self.group.id)
+
+
+class TestRenderedText(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="writer")
+        self.client.force_login(self.user)
+
+    def test_html_stored_on_save(self):
+        """
+        Тест проверяет, что при сохранении записи хранится
+        экранированный HTML со ссылками и упоминаниями.
+        """
+        post = Post.objects.create(
+            author=self.user,
+            text="<b>hi</b> @writer и @nobody\nhttps://example.com/a?b=1&c=2.",
+        )
+        self.assertEqual(
+            post.text_html,
+            '&lt;b&gt;hi&lt;/b&gt; <a class="mention" href="/writer/">@writer</a>'
+            " и @nobody<br>"
+            '<a href="https://example.com/a?b=1&amp;c=2" rel="nofollow noopener" '
+            'target="_blank">https://example.com/a?b=1&amp;c=2</a>.',
+        )
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, '<a class="mention" href="/writer/">')
+        self.assertNotContains(response, "<b>hi</b>")
+        # Почта не считается упоминанием
+        comment = Comment.objects.create(post=post, author=self.user, text="me@writer")
+        self.assertEqual(comment.text_html, "me@writer")
+
+    def test_backfill_command(self):
+        post = Post.objects.create(author=self.user, text="первая\nвторая")
+        Post.objects.filter(pk=post.pk).update(text_html="")
+        # Без сохраненного HTML шаблон отрисовывает текст сам
+        self.assertContains(self.client.get(reverse("index")), "первая<br>вторая")
+        call_command("render_texts", stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, "первая<br>вторая")
+
+
+@override_settings(JOBS_EAGER=True)
+class TestTagsAndMentions(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="writer")
+        self.reader = User.objects.create_user(username="reader")
+
+    def test_tag_feed_keyset_pages(self):
+        """
+        Тест проверяет, что лента хэштега листается курсором без
+        пропусков и повторов, а удаленные записи в нее не попадают.
+        """
+        posts = [
+            Post.objects.create(author=self.author, text=f"запись {number} #Django")
+            for number in range(25)
+        ]
+        Post.objects.create(author=self.author, text="без хэштега")
+        deletion.delete_posts(Post.objects.filter(pk=posts[0].pk))
+        self.assertIn('<a class="hashtag" href="/tag/django/">#Django</a>', posts[1].text_html)
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(
+                reverse("tag", args=["DJANGO"]), {"before": cursor} if cursor else {}
+            )
+            self.assertEqual(response.status_code, 200)
+            seen.extend(post.pk for post in response.context["posts"])
+            cursor = response.context["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [post.pk for post in reversed(posts[1:])])
+        # Неверный курсор - первая страница
+        response = self.client.get(reverse("tag", args=["django"]), {"before": "x"})
+        self.assertEqual(len(response.context["posts"]), 10)
+        self.assertEqual(self.client.get(reverse("tag", args=["nope"])).status_code, 404)
+
+    def test_mentions_notified_once(self):
+        post = Post.objects.create(
+            author=self.author, text="привет @reader и @writer и @ghost"
+        )
+        self.assertEqual(
+            list(post.mentions.values_list("user__username", "notified")),
+            [("reader", True)],
+        )
+        notification = Notification.objects.get(user=self.reader)
+        self.assertEqual(notification.reason, Notification.MENTION)
+        # Правка записи не создает повторных уведомлений
+        Notification.objects.all().delete()
+        post.text = "снова @reader #новое"
+        post.save()
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(
+            list(post.post_tags.values_list("tag__name", flat=True)), ["новое"]
+        )
+        post.text = "без упоминаний"
+        post.save()
+        self.assertFalse(post.mentions.exists())
+        self.assertFalse(post.post_tags.exists())
+
+
+    def test_backfill_command(self):
+        author, reader = self.author, self.reader
+        posts = [
+            Post.objects.create(author=author, text=f"#тег{number % 3} @reader")
+            for number in range(7)
+        ]
+        PostTag.objects.all().delete()
+        Mention.objects.all().delete()
+        Notification.objects.all().delete()
+        call_command("build_tags", "--chunk-size", "2", stdout=StringIO())
+        self.assertEqual(
+            [post.post_tags.get().tag.name for post in posts],
+            [f"тег{number % 3}" for number in range(7)],
+        )
+        self.assertEqual(Mention.objects.filter(user=reader, notified=True).count(), 7)
+        # Старые упоминания не рассылаются
+        self.assertFalse(Notification.objects.exists())
+
+
+class TestRelatedPosts(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.user = User.objects.create_user(username="writer")
+        self.texts = [
+            "рецепт борща со свеклой и капустой",
+            "борщ со свеклой: мой рецепт",
+            "как настроить nginx и gunicorn",
+            "gunicorn за nginx: настройка воркеров",
+            "погода сегодня",
+        ]
+
+    def create_posts(self, texts):
+        return [Post.objects.create(author=self.user, text=text) for text in texts]
+
+    def test_rebuild_and_refresh(self):
+        """
+        Тест проверяет, что пересборка находит похожие записи,
+        а дополнение вставляет новую запись в списки старых.
+        """
+        with override_settings(RELATED_INDEX_PATH=f"{self.tmp}/index.npz",
+                               JOBS_EAGER=True):
+            posts = self.create_posts(self.texts)
+            # Без построенного индекса дополнение ничего не делает
+            self.assertFalse(RelatedPost.objects.exists())
+            call_command("build_related", stdout=StringIO())
+            self.assertEqual(
+                [item.related_id for item in posts[0].related_posts.all()], [posts[1].pk]
+            )
+            self.assertFalse(posts[4].related_posts.exists())
+            response = self.client.get(reverse("post", args=["writer", posts[2].pk]))
+            self.assertEqual(
+                [item.related for item in response.context["related"]], [posts[3]]
+            )
+            self.assertContains(response, "Похожие записи")
+
+            new = self.create_posts(["еще один рецепт борща со свеклой"])[0]
+            self.assertEqual(
+                set(new.related_posts.values_list("related_id", flat=True)),
+                {posts[0].pk, posts[1].pk},
+            )
+            self.assertIn(
+                new.pk, posts[0].related_posts.values_list("related_id", flat=True)
+            )
+
+    def test_deleted_related_hidden(self):
+        with override_settings(RELATED_INDEX_PATH=f"{self.tmp}/index.npz"):
+            posts = self.create_posts(self.texts)
+            call_command("build_related", stdout=StringIO())
+        deletion.delete_posts(Post.objects.filter(pk=posts[1].pk))
+        response = self.client.get(reverse("post", args=["writer", posts[0].pk]))
+        self.assertEqual(list(response.context["related"]), [])
+        deletion.purge_batch()
+        self.assertFalse(RelatedPost.objects.filter(related_id=posts[1].pk).exists())
+
+
+class TestSitemaps(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.user = User.objects.create_user(username="writer")
+        self.group = Group.objects.create(title="Группа", slug="grp", description="d")
+
+    def read_chunk(self, name):
+        with gzip.open(f"{self.tmp}/{name}", "rt") as file:
+            return file.read()
+
+    def test_incremental_build(self):
+        """
+        Тест проверяет, что карта делится на файлы по диапазонам pk,
+        а повторный запуск переписывает только последний диапазон.
+        """
+        with override_settings(SITEMAP_ROOT=self.tmp, SITEMAP_CHUNK_SIZE=2,
+                               SITEMAP_PROTOCOL="http"):
+            posts = [
+                Post.objects.create(author=self.user, text=f"запись {number}")
+                for number in range(3)
+            ]
+            call_command("build_sitemaps", stdout=StringIO())
+            first = posts[0].pk // 2
+            names = {f"posts-{number:05d}.xml.gz" for number in range(first, posts[2].pk // 2 + 1)}
+            self.assertTrue(names <= set(os.listdir(self.tmp)))
+            self.assertIn(
+                f"<loc>http://example.com/writer/{posts[0].pk}/</loc>",
+                self.read_chunk(f"posts-{first:05d}.xml.gz"),
+            )
+            self.assertIn(
+                "<loc>http://example.com/group/grp/</loc>",
+                self.read_chunk(f"groups-{self.group.pk // 2:05d}.xml.gz"),
+            )
+
+            new = Post.objects.create(author=self.user, text="новая")
+            with mock.patch("posts.sitemaps.write_chunk", wraps=sitemaps.write_chunk) as write:
+                call_command("build_sitemaps", stdout=StringIO())
+            self.assertEqual(
+                [call[0][1] for call in write.call_args_list],
+                list(range(posts[2].pk // 2, new.pk // 2 + 1)),
+            )
+            response = self.client.get("/sitemap.xml")
+            self.assertContains(response, f"/sitemaps/posts-{new.pk // 2:05d}.xml.gz</loc>")
+            response = self.client.get(f"/sitemaps/posts-{new.pk // 2:05d}.xml.gz")
+            self.assertEqual(response["Content-Type"], "application/gzip")
+            self.assertIn(f"/writer/{new.pk}/", gzip.decompress(b"".join(response)).decode())
+            self.assertEqual(self.client.get("/sitemaps/state.json").status_code, 404)
+
+
+class TestContentAddressedMedia(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(MEDIA_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username="painter")
+        self.client.force_login(self.user)
+
+    def image(self, color="white", name="picture.PNG"):
+        buffer = BytesIO()
+        Image.new("RGB", (20, 20), color).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+    def new_post(self, image):
+        post = Post.objects.create(author=self.user, text="картинка")
+        self.client.post(
+            reverse("post_edit", args=["painter", post.pk]),
+            {"text": "картинка", "image": image},
+        )
+        post.refresh_from_db()
+        return post
+
+    def test_identical_uploads_share_file(self):
+        """
+        Тест проверяет, что одинаковые картинки хранятся одним файлом
+        в каталогах по хэшу, а ссылки на него считаются.
+        """
+        first = self.new_post(self.image())
+        second = self.new_post(self.image(name="other.png"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        self.assertTrue(os.path.isfile(os.path.join(self.root, first.image.name)))
+        self.assertEqual(MediaFile.objects.get(name=first.image.name).refcount, 2)
+
+        self.client.post(
+            reverse("post_edit", args=["painter", second.pk]),
+            {"text": "другая", "image": self.image("black")},
+        )
+        second.refresh_from_db()
+        self.assertNotEqual(second.image.name, first.image.name)
+        self.assertEqual(MediaFile.objects.get(name=first.image.name).refcount, 1)
+        deletion.delete_posts(Post.objects.filter(pk=second.pk))
+        deletion.purge_batch()
+        self.assertEqual(MediaFile.objects.get(name=second.image.name).refcount, 0)
+
+    def test_migrate_flat_files(self):
+        os.mkdir(os.path.join(self.root, "posts"))
+        with open(os.path.join(self.root, "posts", "1595869014.jpg"), "wb") as file:
+            file.write(b"jpeg data")
+        posts = [
+            Post.objects.create(author=self.user, text=f"старая {number}",
+                                image="posts/1595869014.jpg")
+            for number in range(2)
+        ]
+        Post.objects.create(author=self.user, text="пропавшая", image="posts/lost.jpg")
+        out = StringIO()
+        call_command("migrate_media", "--batch-size", "1", stdout=out)
+        self.assertIn("Перенесено файлов: 1, не найдено: 1", out.getvalue())
+        new_name = Post.objects.get(pk=posts[0].pk).image.name
+        self.assertTrue(new_name.endswith(".jpg"))
+        self.assertEqual(Post.objects.get(pk=posts[1].pk).image.name, new_name)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "posts", "1595869014.jpg")))
+        self.assertEqual(MediaFile.objects.get(name=new_name).refcount, 2)
+        response = serve_media(RequestFactory().get("/"), "posts/1595869014.jpg")
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], f"/media/{new_name}")
+
+    def test_collect_garbage(self):
+        """
+        Тест проверяет, что сборщик мусора удаляет только старые файлы
+        без ссылок, а пробный запуск ничего не удаляет.
+        """
+        kept = self.new_post(self.image())
+        orphan = self.new_post(self.image("black"))
+        recent = self.new_post(self.image("red"))
+        deletion.delete_posts(Post.objects.filter(pk=orphan.pk))
+        deletion.purge_batch()
+        Post.objects.filter(pk=recent.pk).update(image="")
+        MediaFile.objects.update(updated=timezone.now() - timedelta(days=2))
+        old = time.time() - 2 * 24 * 60 * 60
+        for post in (kept, orphan):
+            os.utime(os.path.join(self.root, post.image.name), (old, old))
+
+        out = StringIO()
+        call_command("collect_media_garbage", "--dry-run", stdout=out)
+        self.assertIn(orphan.image.name, out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.root, orphan.image.name)))
+
+        call_command("collect_media_garbage", "--batch-size", "1", stdout=StringIO())
+        self.assertFalse(os.path.exists(os.path.join(self.root, orphan.image.name)))
+        self.assertFalse(MediaFile.objects.filter(name=orphan.image.name).exists())
+        self.assertTrue(os.path.exists(os.path.join(self.root, kept.image.name)))
+        self.assertTrue(os.path.exists(os.path.join(self.root, recent.image.name)))
+
+    def test_collect_garbage_trusts_refcount(self):
+        """
+        Тест проверяет, что для файлов хранилища по содержимому сборщик
+        решает по MediaFile.refcount, не проверяя записи.
+        """
+        name = self.new_post(self.image()).image.name
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                collect_media_garbage.referenced([name], timezone.now()), {name}
+            )
+
+
+class TestCommentThreads(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="talker")
+        self.client.force_login(self.user)
+        self.post = Post.objects.create(text="обсуждение", author=self.user)
+
+    def reply(self, parent, text):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text=text,
+            parent=parent and threads.reply_parent(parent),
+        )
+
+    def test_reply_through_view(self):
+        """
+        Тест проверяет, что ответ сохраняется в дереве под своим
+        комментарием, а на странице записи идет сразу после него.
+        """
+        first = self.reply(None, "первый")
+        self.reply(None, "второй")
+        response = self.client.post(
+            reverse("add_comment", args=["talker", self.post.pk]),
+            {"text": "ответ на первый", "parent": first.pk},
+        )
+        self.assertRedirects(response, first.get_thread_url())
+        answer = Comment.objects.get(text="ответ на первый")
+        self.assertEqual(answer.parent, first)
+        self.assertEqual(answer.depth, 1)
+        self.assertTrue(answer.path.startswith(first.path))
+        first.refresh_from_db()
+        self.assertEqual(first.replies_count, 1)
+
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(
+            [item.text for item in response.context["items"]],
+            ["второй", "первый", "ответ на первый"],
+        )
+        response = self.client.get(first.get_thread_url())
+        self.assertEqual([item.text for item in response.context["items"]], ["ответ на первый"])
+
+    @override_settings(COMMENTS_PAGE_SIZE=2, COMMENT_THREAD_DEPTH=2)
+    def test_pages_and_depth(self):
+        """
+        Тест проверяет, что страница обсуждения - один запрос, глубина
+        страницы ограничена, а продолжение идет с пути последнего.
+        """
+        parent = None
+        chain = []
+        for number in range(threads.MAX_DEPTH + 2):
+            parent = self.reply(parent, f"уровень {number}")
+            chain.append(parent)
+        self.assertEqual(max(comment.depth for comment in chain), threads.MAX_DEPTH - 1)
+        self.reply(None, "новый")
+        with self.assertNumQueries(1):
+            items, after = threads.page(self.post)
+        self.assertEqual([item.text for item in items], ["новый", "уровень 0"])
+        items, after = threads.page(self.post, after=after)
+        self.assertEqual([item.text for item in items], ["уровень 1"])
+        self.assertIsNone(after)
+        self.assertTrue(items[0].last_level)
+
+        items, after = threads.page(self.post, root=chain[1])
+        self.assertEqual([item.level for item in items], [0, 1])
+        self.assertEqual(items[0].text, "уровень 2")
+
+    def test_delete_hides_replies(self):
+        root = self.reply(None, "корень")
+        branch = self.reply(root, "ветка")
+        self.reply(branch, "лист")
+        self.reply(root, "соседняя ветка")
+        deletion.delete_comments(Comment.objects.filter(pk=branch.pk))
+        self.assertEqual(
+            list(Comment.objects.values_list("text", flat=True).order_by("path")),
+            ["корень", "соседняя ветка"],
+        )
+        root.refresh_from_db()
+        self.assertEqual(root.replies_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+
+
+class TestLikes(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="star")
+        self.fans = [
+            User.objects.create_user(username=f"fan{number}") for number in range(3)
+        ]
+        self.posts = [
+            Post.objects.create(author=self.author, text=f"запись {number}")
+            for number in range(3)
+        ]
+
+    def test_counts_are_flushed(self):
+        """
+        Тест проверяет, что отметка ставится один раз, а число
+        отметок попадает в запись после переноса счетчиков.
+        """
+        client = Client()
+        client.force_login(self.fans[0])
+        url = reverse("post_like", args=["star", self.posts[0].pk])
+        client.post(url)
+        client.post(url)
+        for fan in self.fans[1:]:
+            likes.like(fan, self.posts[0])
+        likes.unlike(self.fans[2], self.posts[0])
+        self.assertEqual(Like.objects.filter(post=self.posts[0]).count(), 2)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).likes_count, 0)
+        self.assertTrue(Job.objects.filter(key__startswith="flush-likes-").exists())
+
+        self.assertEqual(likes.flush(batch_size=1), 1)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).likes_count, 2)
+        self.assertFalse(LikeCounter.objects.exclude(delta=0).exists())
+        self.assertEqual(likes.flush(), 0)
+
+        client.post(reverse("post_unlike", args=["star", self.posts[0].pk]))
+        likes.flush()
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).likes_count, 1)
+
+    def test_liked_posts_in_one_query(self):
+        likes.like(self.fans[0], self.posts[0])
+        likes.like(self.fans[0], self.posts[2])
+        likes.like(self.fans[1], self.posts[1])
+        with self.assertNumQueries(1):
+            liked = likes.liked_ids(self.fans[0], self.posts)
+        self.assertEqual(liked, {self.posts[0].pk, self.posts[2].pk})
+
+        client = Client()
+        client.force_login(self.fans[0])
+        response = client.get(reverse("index"))
+        self.assertEqual(response.context["liked"], liked)
+        self.assertContains(response, self.posts[0].get_unlike_url())
+        self.assertContains(response, self.posts[1].get_like_url())
@@ -0,0 +1,118 @@
+"""
+Ответы на комментарии.
+
+Место комментария в дереве хранится в Comment.path: номера всех его
+предков и его собственный, по SEGMENT_LENGTH цифр с ведущими нулями.
+Номер корневого комментария записан как ROOT_BASE - pk, поэтому при
+сортировке по path новые обсуждения идут первыми, а ответы внутри
+обсуждения - по порядку, сразу под своим комментарием:
+
+    8999999990                      комментарий 1000000009
+    89999999900000001012            ответ на него
+    899999999000000010120000001020  ответ на ответ
+    9999999994                      комментарий 5
+
+Страница обсуждения - один запрос по индексу (post, path): диапазон
+путей, ограничение глубины и LIMIT. Следующая страница начинается
+после пути последнего показанного комментария. Глубина дерева не
+больше MAX_DEPTH: ответ на самый глубокий комментарий становится
+ответом на его родителя. Число ответов хранится в replies_count.
+"""
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Comment
+
+
+SEGMENT_LENGTH = 10
+ROOT_BASE = 10 ** SEGMENT_LENGTH - 1
+MAX_DEPTH = 8
+
+
+def page_size():
+    return getattr(settings, "COMMENTS_PAGE_SIZE", 50)
+
+
+def visible_depth():
+    return getattr(settings, "COMMENT_THREAD_DEPTH", 3)
+
+
+def segment(pk, root=False):
+    return f"{ROOT_BASE - pk if root else pk:0{SEGMENT_LENGTH}d}"
+
+
+def subtree(path):
+    """
+    Условия фильтра для всех потомков комментария с путем path.
+    """
+    return {"path__gt": path, "path__lt": path + "~"}
+
+
+def reply_parent(parent):
+    """
+    Комментарий, к которому прикрепляется ответ на parent.
+    """
+    while parent.depth >= MAX_DEPTH - 1:
+        parent = parent.parent
+    return parent
+
+
+def attach(comments):
+    """
+    Заполняет path и depth сохраненных комментариев и увеличивает
+    replies_count их родителей.
+    """
+    parent_ids = {comment.parent_id for comment in comments} - {None}
+    paths = dict(Comment.all_objects.filter(pk__in=parent_ids).values_list(
+        "pk", "path"
+    ))
+    added = {}
+    for comment in comments:
+        if comment.parent_id is None:
+            comment.path, comment.depth = segment(comment.pk, root=True), 0
+        else:
+            parent_path = paths[comment.parent_id]
+            comment.path = parent_path + segment(comment.pk)
+            comment.depth = len(parent_path) // SEGMENT_LENGTH
+            added[comment.parent_id] = added.get(comment.parent_id, 0) + 1
+    Comment.all_objects.bulk_update(comments, ["path", "depth"])
+    for parent_id, count in added.items():
+        Comment.all_objects.filter(pk=parent_id).update(
+            replies_count=F("replies_count") + count
+        )
+
+
+def refresh_replies_count(parent_ids):
+    for parent_id in parent_ids:
+        Comment.all_objects.filter(pk=parent_id).update(
+            replies_count=Comment.objects.filter(parent_id=parent_id).count()
+        )
+
+
+def page(post, root=None, after=""):
+    """
+    Страница обсуждения записи (или ветки под комментарием root)
+    в порядке дерева, не глубже COMMENT_THREAD_DEPTH уровней.
+    Возвращает комментарии и путь, с которого продолжить, или None.
+    У каждого комментария level - глубина относительно страницы.
+    """
+    size = page_size()
+    comments = Comment.objects.filter(post=post).select_related("author")
+    if root is None:
+        base = 0
+    else:
+        base = root.depth + 1
+        comments = comments.filter(**subtree(root.path))
+    if after:
+        comments = comments.filter(path__gt=after)
+    items = list(comments.filter(
+        depth__lt=base + visible_depth()
+    ).order_by("path")[:size + 1])
+    for item in items:
+        item.post = post
+        item.level = item.depth - base
+        item.last_level = item.level == visible_depth() - 1
+    if len(items) > size:
+        return items[:size], items[size - 1].path
+    return items, None
@@ -3,15 +3,30 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("group/",
+         views.group_index,
+         name="group_index"),
+    path("group/autocomplete/",
+         views.group_autocomplete,
+         name="group_autocomplete"),
     path("group/<slug:slug>/",
          views.group_posts,
          name="group"),
+    path("tag/<str:name>/",
+         views.tag_posts,
+         name="tag"),
     path("new/",
          views.new_post,
          name="new_post"),
     path("follow/",
          views.follow_index,
          name="follow_index"),
+    path("follow/digest/off/",
+         views.digest_off,
+         name="digest_off"),
+    path("follow/digest/on/",
+         views.digest_on,
+         name="digest_on"),
     path("<str:username>/",
          views.profile,
          name="profile"),
@@ -24,6 +39,15 @@ urlpatterns = [
     path("<str:username>/<int:post_id>/comment",
          views.add_comment,
          name="add_comment"),
+    path("<str:username>/<int:post_id>/comment/<int:comment_id>/",
+         views.comment_thread,
+         name="comment_thread"),
+    path("<str:username>/<int:post_id>/like/",
+         views.post_like,
+         name="post_like"),
+    path("<str:username>/<int:post_id>/unlike/",
+         views.post_unlike,
+         name="post_unlike"),
     path("<str:username>/follow/",
          views.profile_follow,
          name="profile_follow"),
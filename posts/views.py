@@ -1,8 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
-from .models import Post, Group, User, Comment, Follow
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+
+from yatube.ratelimit import ratelimit
+
+from .models import (
+    Post, Group, User, Comment, DigestOptOut, Follow, RelatedPost, Tag,
+)
+from .autocomplete import search_groups
+from .batching import add_comment as save_comment
 from .forms import PostForm, CommentForm
+from .notifications import mark_all_read
+from .tags import tag_feed
+from . import likes, threads
 
 
 def index(request):
@@ -10,7 +22,11 @@ def index(request):
     paginator = Paginator(post_list, 10)
     page_number = request.GET.get("page")
     page = paginator.get_page(page_number)
-    return render(request, "index.html", {"page": page, "paginator": paginator})
+    return render(request, "index.html", {
+        "page": page,
+        "paginator": paginator,
+        "liked": likes.liked_ids(request.user, page),
+    })
 
 
 def group_posts(request, slug):
@@ -19,12 +35,39 @@ def group_posts(request, slug):
     page_number = request.GET.get("page")
     paginator = Paginator(posts, 10)
     page = paginator.get_page(page_number)
+    return render(request, "group.html", {
+        "group": groups,
+        "page": page,
+        "paginator": paginator,
+        "liked": likes.liked_ids(request.user, page),
+    })
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    posts, next_cursor = tag_feed(tag, request.GET.get("before"))
     return render(
-        request, "group.html", {"group": groups, "page": page, "paginator": paginator}
+        request, "tag.html",
+        {"tag": tag, "posts": posts, "next_cursor": next_cursor,
+         "liked": likes.liked_ids(request.user, posts)},
+    )
+
+
+def group_index(request):
+    groups = Group.objects.only(
+        "title", "slug", "description", "posts_count", "last_post_date"
     )
+    return render(request, "group_index.html", {"groups": groups})
+
+
+@cache_control(max_age=60)
+def group_autocomplete(request):
+    results = search_groups(request.GET.get("q", ""))
+    return JsonResponse({"results": results})
 
 
 @login_required
+@ratelimit("post", user="10/m", ip="30/m")
 def new_post(request):
     form = PostForm(request.POST or None)
     if request.method == "POST":
@@ -48,6 +91,7 @@ def profile(request, username):
     params = {
         "page": page,
         "paginator": paginator,
+        "liked": likes.liked_ids(request.user, page),
         "author": author,
         "followers_sum": followers_sum,
         "following_sum": following_sum,
@@ -64,15 +108,22 @@ def profile(request, username):
 def post_view(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
     author = post.author
-    comments = post.comments.all()
+    comments, next_after = threads.page(post, after=request.GET.get("after", ""))
     form = CommentForm(request.POST or None, instance=None)
     post_sum = Post.objects.filter(author=author).count()
     followers_sum = Follow.objects.filter(author=post.author).count()
     following_sum = Follow.objects.filter(user=post.author).count()
+    related = RelatedPost.objects.filter(
+        post=post, related__is_deleted=False
+    ).select_related("related__author")
     params = {
         "post": post,
+        "related": related,
+        "posts": [post],
+        "liked": likes.liked_ids(request.user, [post]),
         "author": author,
         "items": comments,
+        "next_after": next_after,
         "form": form,
         "followers_sum": followers_sum,
         "following_sum": following_sum,
@@ -105,19 +156,57 @@ def server_error(request):
 
 
 @login_required
+@ratelimit("comment", user="20/m", ip="60/m")
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    if request.user != post.author:
+    # Только первичный ключ, без соединения с таблицей пользователей
+    post = get_object_or_404(Post.objects.only("author_id"), id=post_id)
+    if request.user.pk != post.author_id:
         return redirect("post", username=username, post_id=post_id)
-    form = CommentForm(request.POST or None, instance=None)
+    # Запись нужна форме: похожие комментарии ищутся только под ней
+    form = CommentForm(request.POST or None, instance=Comment(post=post))
     if form.is_valid():
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        comment.save()
-        return redirect("post", username=username, post_id=post_id)
-    if request.method == "GET":
+        # Форма комментария - одно поле; на что отвечают, передает
+        # скрытое поле формы на странице ветки
+        parent_id = request.POST.get("parent")
+        if parent_id:
+            parent = get_object_or_404(
+                Comment, id=int(parent_id) if parent_id.isdigit() else 0,
+                post_id=post_id,
+            )
+            comment.parent = threads.reply_parent(parent)
+        save_comment(comment)
+        if comment.parent_id is not None:
+            return redirect(comment.parent.get_thread_url())
         return redirect("post", username=username, post_id=post_id)
+    # Отклоненный комментарий (например, повтор под этой же записью)
+    # не сохраняется
+    return redirect("post", username=username, post_id=post_id)
+
+
+def comment_thread(request, username, post_id, comment_id):
+    """
+    Ветка обсуждения под комментарием: сам комментарий, ответы
+    на него страницами и форма ответа.
+    """
+    comment = get_object_or_404(
+        Comment.objects.select_related("author", "post__author"),
+        id=comment_id, post_id=post_id, post__author__username=username,
+    )
+    replies, next_after = threads.page(
+        comment.post, root=comment, after=request.GET.get("after", "")
+    )
+    form = CommentForm()
+    return render(request, "comment_thread.html", {
+        "post": comment.post,
+        "comment": comment,
+        "comment_list": [comment],
+        "items": replies,
+        "next_after": next_after,
+        "form": form,
+    })
 
 
 @login_required()
@@ -128,10 +217,17 @@ def follow_index(request):
     paginator = Paginator(post_list, 10)
     page_number = request.GET.get("page")
     page = paginator.get_page(page_number)
-    return render(request, "follow.html", {"page": page, "paginator": paginator,})
+    mark_all_read(request.user)
+    return render(request, "follow.html", {
+        "page": page,
+        "paginator": paginator,
+        "digest": not DigestOptOut.objects.filter(user=request.user).exists(),
+        "liked": likes.liked_ids(request.user, page),
+    })
 
 
 @login_required()
+@ratelimit("follow", user="30/m", ip="100/m", methods=None)
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
@@ -146,3 +242,37 @@ def profile_unfollow(request, username):
     if obj:
         obj.delete()
     return redirect("profile", username=username)
+
+
+@login_required()
+def digest_off(request):
+    DigestOptOut.objects.get_or_create(user=request.user)
+    return redirect("follow_index")
+
+
+@login_required()
+def digest_on(request):
+    DigestOptOut.objects.filter(user=request.user).delete()
+    return redirect("follow_index")
+
+
+@login_required()
+@ratelimit("like", user="60/m", ip="200/m")
+def post_like(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.only("pk"), id=post_id, author__username=username
+    )
+    if request.method == "POST":
+        likes.like(request.user, post)
+    return redirect("post", username=username, post_id=post_id)
+
+
+@login_required()
+@ratelimit("like", user="60/m", ip="200/m")
+def post_unlike(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.only("pk"), id=post_id, author__username=username
+    )
+    if request.method == "POST":
+        likes.unlike(request.user, post)
+    return redirect("post", username=username, post_id=post_id)
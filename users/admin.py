@@ -1,3 +1,27 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
 
-# Register your models here.
+from posts.deletion import delete_user
+
+
+User = get_user_model()
+
+
+class SoftDeleteUserAdmin(UserAdmin):
+    """
+    Удаление пользователя из админки блокирует его и скрывает его
+    записи и комментарии, а сама учетная запись со всеми связями
+    удаляется фоновой задачей (posts.deletion.delete_user).
+    """
+    def delete_model(self, request, obj):
+        delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            delete_user(user)
+
+
+# Импорт django.contrib.auth.admin уже зарегистрировал стандартный UserAdmin
+admin.site.unregister(User)
+admin.site.register(User, SoftDeleteUserAdmin)
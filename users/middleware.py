@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+USER_CACHE_KEY = "auth:user:%s"
+
+
+def user_cache_key(user_id):
+    return USER_CACHE_KEY % user_id
+
+
+def get_cached_user(request):
+    """
+    То же, что django.contrib.auth.get_user, но объект пользователя
+    берется из кэша. Хэш пароля в сессии по-прежнему сверяется, поэтому
+    смена пароля завершает остальные сессии, как и без кэша.
+    """
+    try:
+        user_id = request.session[auth.SESSION_KEY]
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(
+                key, user, getattr(settings, "AUTH_USER_CACHE_TIMEOUT", 300)
+            )
+        return user
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not (session_hash and constant_time_compare(
+            session_hash, user.get_session_auth_hash())):
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Убирает запрос к auth_user на каждой странице вошедшего пользователя.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .middleware import user_cache_key
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Любое изменение пользователя, в том числе смена пароля,
+    сбрасывает его закэшированный объект.
+    """
+    cache.delete(user_cache_key(instance.pk))
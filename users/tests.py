@@ -1,3 +1,73 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from jobs.models import Job
+from posts.models import Post
+
+
+User = get_user_model()
+
+CACHED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'users.middleware.CachedAuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+
+@override_settings(
+    MIDDLEWARE=CACHED_MIDDLEWARE,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class TestCachedAuthentication(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cached", password="old-pass-123")
+        self.client.login(username="cached", password="old-pass-123")
+
+    def test_user_and_session_from_cache(self):
+        """
+        Тест проверяет, что после первого запроса сессия и пользователь
+        не читаются из базы.
+        """
+        self.client.get(reverse("index"))
+        with self.assertNumQueries(2):
+            # Остаются только запросы самой ленты: count и выборка
+            response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse("index"))
+        self.user.set_password("new-pass-456")
+        self.user.save()
+        response = self.client.get(reverse("index"))
+        self.assertFalse(response.context["user"].is_authenticated)
+
+
+class TestUserAdmin(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="boss", email="boss@example.com", password="boss-pass-123"
+        )
+        self.client.force_login(self.admin)
+        self.user = User.objects.create_user(username="leaving")
+        Post.objects.create(text="last words", author=self.user)
+
+    def test_delete_from_admin_is_deferred(self):
+        """
+        Тест проверяет, что удаление пользователя в админке только
+        блокирует его и скрывает записи, а удаление ставит в очередь.
+        """
+        response = self.client.post(
+            reverse("admin:auth_user_delete", args=[self.user.pk]),
+            {"post": "yes"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(Post.all_objects.exists())
+        self.assertTrue(Job.objects.filter(key=f"purge-user-{self.user.pk}").exists())
@@ -1,8 +1,13 @@
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+
+from yatube.ratelimit import ratelimit
+
 from .forms import CreationForm
 
 
+@method_decorator(ratelimit("signup", ip="5/h"), name="post")
 class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy("login")
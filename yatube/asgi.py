@@ -0,0 +1,56 @@
+"""
+ASGI config for yatube project.
+
+Лента и страница записи обслуживаются асинхронно (posts.consumers),
+live/ - потоки новых записей и комментариев (server-sent events),
+остальные адреса - обычными представлениями Django через AsgiHandler
+в пуле потоков. Какую страницу открыли, решает resolver из
+yatube.urls, как и под WSGI: /group/2020/ - это сообщество, а не
+запись 2020 пользователя group. Запуск:
+
+    daphne yatube.asgi:application
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup()
+
+from channels.http import AsgiHandler  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from django.urls import Resolver404, path, re_path, resolve  # noqa: E402
+
+from posts import consumers  # noqa: E402
+
+# Имена маршрутов yatube.urls, у которых есть асинхронная версия
+ASYNC_PAGES = {
+    'index': consumers.IndexConsumer,
+    'post': consumers.PostConsumer,
+}
+
+
+def pages(scope):
+    try:
+        match = resolve(scope['path'])
+    except Resolver404:
+        return AsgiHandler(scope)
+    consumer = ASYNC_PAGES.get(match.url_name)
+    if consumer is None:
+        return AsgiHandler(scope)
+    return consumer(dict(
+        scope, url_route={'args': match.args, 'kwargs': match.kwargs},
+    ))
+
+
+application = ProtocolTypeRouter({
+    'http': URLRouter([
+        path('live/feed/', consumers.FeedStreamConsumer),
+        path(
+            'live/<str:username>/<int:post_id>/',
+            consumers.CommentStreamConsumer,
+        ),
+        re_path(r'', pages),
+    ]),
+})
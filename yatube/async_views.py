@@ -0,0 +1,246 @@
+"""
+Основа для асинхронных страниц, обслуживаемых через yatube.asgi.
+
+Django 2.2 не умеет асинхронные представления, поэтому страница
+реализуется как AsyncHttpConsumer из channels. Блокирующие вызовы ORM
+и отрисовка шаблонов выполняются в ограниченном пуле потоков
+(ASYNC_DB_THREADS), а независимые запросы запускаются одновременно
+через asyncio.gather. Middleware из settings.MIDDLEWARE применяются
+так же, как в обычном обработчике: сессия, пользователь, CSRF-cookie
+и заголовки безопасности работают без изменений.
+
+EventStreamConsumer - поток server-sent events: клиент подписывается
+на каналы yatube.broadcast и получает только новые элементы страницы.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from channels.generic.http import AsyncHttpConsumer
+from channels.http import AsgiHandler, AsgiRequest
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.db import close_old_connections
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+from .broadcast import OVERFLOW, get_broadcaster
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "ASYNC_DB_THREADS", 8),
+            thread_name_prefix="async-db",
+        )
+    return _executor
+
+
+def _call_closing_connections(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Выполняет блокирующую функцию в пуле потоков, не останавливая
+    цикл событий.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(_call_closing_connections, func, args, kwargs),
+    )
+
+
+def _load_middleware():
+    middleware = []
+    for path in settings.MIDDLEWARE:
+        middleware_class = import_string(path)
+        if issubclass(middleware_class, MiddlewareMixin):
+            middleware.append(middleware_class())
+    return middleware
+
+
+def process_request(request, middleware):
+    for instance in middleware:
+        if hasattr(instance, "process_request"):
+            response = instance.process_request(request)
+            if response is not None:
+                return response
+    if hasattr(request, "user"):
+        # Ленивый пользователь вычисляется здесь, в потоке пула
+        request.user.pk
+    return None
+
+
+def process_response(request, response, middleware):
+    for instance in reversed(middleware):
+        if hasattr(instance, "process_response"):
+            response = instance.process_response(request, response)
+    return response
+
+
+class AsyncPageConsumer(AsyncHttpConsumer):
+    """
+    Подклассы реализуют get_response(request, **kwargs) и возвращают
+    HttpResponse; для 404 достаточно выбросить Http404.
+    """
+
+    async def handle(self, body):
+        request = AsgiRequest(self.scope, BytesIO(body))
+        middleware = _load_middleware()
+        try:
+            response = await run_sync(process_request, request, middleware)
+            if response is None:
+                kwargs = self.scope["url_route"]["kwargs"]
+                response = await self.get_response(request, **kwargs)
+        except Exception as exception:
+            # Http404, PermissionDenied и прочие ошибки превращаются
+            # в ответ так же, как в синхронном обработчике Django
+            response = await run_sync(response_for_exception, request, exception)
+        response = await run_sync(process_response, request, response, middleware)
+        for message in AsgiHandler.encode_response(response):
+            await self.send(message)
+
+    async def get_response(self, request, **kwargs):
+        raise NotImplementedError
+
+
+def format_event(event, event_id, data):
+    lines = [f"id: {event_id}", f"event: {event}"]
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class EventStreamConsumer:
+    """
+    Подклассы задают event, get_channels(request, **kwargs),
+    get_items(request, ids=None, after=None, **kwargs) и
+    render_item(request, item). Сообщение канала содержит только id
+    элемента, сам элемент читается из базы и отрисовывается один раз
+    на пачку сообщений. По заголовку Last-Event-ID клиент после
+    переподключения получает элементы, пропущенные за время разрыва.
+    """
+
+    event = "message"
+
+    def __init__(self, scope):
+        self.scope = scope
+
+    async def __call__(self, receive, send):
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        request = AsgiRequest(self.scope, BytesIO(b"".join(body)))
+        middleware = _load_middleware()
+        kwargs = self.scope["url_route"]["kwargs"]
+        try:
+            response = await run_sync(process_request, request, middleware)
+            if response is None:
+                channels = await run_sync(self.get_channels, request, **kwargs)
+        except Exception as exception:
+            response = await run_sync(response_for_exception, request, exception)
+        if response is not None:
+            response = await run_sync(process_response, request, response, middleware)
+            for message in AsgiHandler.encode_response(response):
+                await send(message)
+            return
+
+        # Подписка оформляется до чтения пропущенного, чтобы ничего
+        # не потерять между запросом к базе и первым событием
+        subscription = get_broadcaster().subscribe(channels)
+        disconnect = asyncio.ensure_future(receive())
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream; charset=utf-8"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            })
+            await self._stream(request, kwargs, subscription, disconnect, send)
+        finally:
+            subscription.close()
+            disconnect.cancel()
+
+    async def _stream(self, request, kwargs, subscription, disconnect, send):
+        last_id = request.META.get("HTTP_LAST_EVENT_ID", "")
+        last_id = int(last_id) if last_id.isdigit() else None
+        if last_id is not None:
+            items = await run_sync(self.get_items, request, after=last_id, **kwargs)
+            await self._send_items(request, items, last_id, send)
+            last_id = max([last_id] + [item.pk for item in items])
+        heartbeat = getattr(settings, "LIVE_HEARTBEAT", 15)
+        while True:
+            getter = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnect}, timeout=heartbeat,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                getter.cancel()
+                return
+            if getter not in done:
+                getter.cancel()
+                await send({
+                    "type": "http.response.body",
+                    "body": b": ping\n\n",
+                    "more_body": True,
+                })
+                continue
+            messages = [getter.result()]
+            while not subscription.queue.empty():
+                messages.append(subscription.queue.get_nowait())
+            if OVERFLOW in messages:
+                # Клиент не успевает читать: поток закрывается, браузер
+                # переподключится с Last-Event-ID и получит пропущенное
+                await send({"type": "http.response.body", "body": b""})
+                return
+            ids = [message["id"] for message in messages]
+            items = await run_sync(self.get_items, request, ids=ids, **kwargs)
+            await self._send_items(request, items, last_id, send)
+
+    async def _send_items(self, request, items, after, send):
+        # Элементы, уже отправленные из базы после переподключения,
+        # могут прийти и через канал - повторно они не отправляются
+        items = [item for item in items if after is None or item.pk > after]
+        if not items:
+            return
+        chunks = await run_sync(self._render_items, request, items)
+        await send({
+            "type": "http.response.body",
+            "body": b"".join(chunks),
+            "more_body": True,
+        })
+
+    def _render_items(self, request, items):
+        return [
+            format_event(self.event, item.pk, self.render_item(request, item))
+            for item in items
+        ]
+
+    def get_channels(self, request, **kwargs):
+        raise NotImplementedError
+
+    def get_items(self, request, ids=None, after=None, **kwargs):
+        raise NotImplementedError
+
+    def render_item(self, request, item):
+        raise NotImplementedError
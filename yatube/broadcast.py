@@ -0,0 +1,164 @@
+"""
+Публикация событий для живых обновлений страниц (server-sent events).
+
+Подписчик - асинхронный поток событий в цикле событий ASGI-сервера,
+публикация происходит из синхронного кода (сигналы моделей), поэтому
+доставка идет через call_soon_threadsafe. У каждого подписчика своя
+ограниченная очередь: если клиент не успевает читать, очередь
+переполняется, поток закрывается, и браузер переподключается
+с Last-Event-ID, получая пропущенное из базы.
+
+InProcessBroadcaster работает в пределах одного процесса.
+SocketBroadcaster рассылает события всем процессам на машине через
+UNIX-сокеты в каталоге LIVE_SOCKET_DIR, без внешнего брокера.
+Реализация выбирается настройкой LIVE_BROADCASTER.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+OVERFLOW = object()
+
+
+class Subscription:
+    def __init__(self, broadcaster, channels, maxsize):
+        self.broadcaster = broadcaster
+        self.channels = channels
+        self.loop = asyncio.get_event_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        """
+        Выполняется в цикле событий подписчика.
+        """
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class InProcessBroadcaster:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, maxsize=None):
+        if maxsize is None:
+            maxsize = getattr(settings, "LIVE_QUEUE_SIZE", 100)
+        subscription = Subscription(self, tuple(channels), maxsize)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].discard(subscription)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        message = dict(message, channel=channel)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.deliver, message
+                )
+            except RuntimeError:
+                # Цикл событий уже закрыт
+                self.unsubscribe(subscription)
+
+
+class SocketBroadcaster(InProcessBroadcaster):
+    def __init__(self, directory=None):
+        super().__init__()
+        self.directory = directory or getattr(
+            settings, "LIVE_SOCKET_DIR", "/tmp/yatube-live"
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._receiver = None
+
+    def subscribe(self, channels, maxsize=None):
+        # Сокет для приема открывается только в процессах, где есть
+        # подписчики; WSGI-воркеры события лишь публикуют
+        with self._lock:
+            if self._receiver is None:
+                path = os.path.join(self.directory, "%d.sock" % os.getpid())
+                if os.path.exists(path):
+                    os.unlink(path)
+                self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._receiver.bind(path)
+                threading.Thread(target=self._listen, daemon=True).start()
+        return super().subscribe(channels, maxsize)
+
+    def _listen(self):
+        while True:
+            data = self._receiver.recv(65536)
+            payload = json.loads(data.decode())
+            self.dispatch(payload["channel"], payload["message"])
+
+    def publish(self, channel, message):
+        data = json.dumps({"channel": channel, "message": message}).encode()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".sock"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Процесс завершился, не удалив сокет
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                # Получатель не успевает: событие для него теряется,
+                # клиенты догонят пропущенное при переподключении
+                pass
+
+
+_broadcaster = {"pid": None, "instance": None}
+
+
+def get_broadcaster():
+    """
+    Один экземпляр на процесс; после fork создается заново.
+    """
+    if _broadcaster["pid"] != os.getpid():
+        path = getattr(
+            settings, "LIVE_BROADCASTER", "yatube.broadcast.InProcessBroadcaster"
+        )
+        _broadcaster.update(pid=os.getpid(), instance=import_string(path)())
+    return _broadcaster["instance"]
+
+
+def publish(channel, message):
+    get_broadcaster().publish(channel, message)
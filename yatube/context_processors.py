@@ -1,11 +1,55 @@
 import datetime as dt
+import time
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+
+_year_cache = {'year': None, 'expires': 0}
+
+
+def _current_year():
+    """
+    Возвращает текущий год, пересчитывая его только после наступления
+    следующего года, а не при каждой отрисовке шаблона.
+    """
+    now = time.time()
+    if now >= _year_cache['expires']:
+        today = dt.datetime.now()
+        next_year = dt.datetime(today.year + 1, 1, 1)
+        _year_cache['year'] = today.year
+        _year_cache['expires'] = next_year.timestamp()
+    return _year_cache['year']
 
 
 def year(request):
     """
     Добавляет переменную с текущим годом.
     """
-    year = dt.datetime.now().year
     return {
-        'year': year
-    }
\ No newline at end of file
+        'year': _current_year()
+    }
+
+
+def notifications(request):
+    """
+    Добавляет количество непрочитанных уведомлений. Запрос к базе
+    выполняется, только если шаблон обращается к переменной.
+    """
+    from posts.notifications import unread_count
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'unread_notifications': 0}
+    return {
+        'unread_notifications': SimpleLazyObject(lambda: unread_count(user))
+    }
+
+
+def live_updates(request):
+    """
+    Включает подключение страниц к потоку новых записей и комментариев.
+    """
+    return {
+        'live_updates': settings.LIVE_UPDATES
+    }
@@ -0,0 +1,108 @@
+"""
+Раздача flatpages из памяти процесса.
+
+Все страницы текущего сайта загружаются одним запросом и хранятся
+по ключу (SITE_ID, url). Для анонимных посетителей HTML отрисовывается
+один раз и отдается с ETag; для вошедших пользователей шаблон
+отрисовывается заново (в нем есть имя пользователя), но без запросов
+к базе. Сохранение FlatPage увеличивает номер версии в общем кэше,
+и каждый процесс перезагружает страницы при следующем обращении.
+Страницы правят в пуле воркеров админки, поэтому кэш должен быть
+общим для всех процессов (memcached, см. yatube.settings_production).
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.flatpages.models import FlatPage
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse, HttpResponsePermanentRedirect
+from django.template import loader
+from django.utils.cache import get_conditional_response
+from django.utils.safestring import mark_safe
+from django.views.decorators.csrf import csrf_protect
+
+
+DEFAULT_TEMPLATE = "flatpages/default.html"
+VERSION_KEY = "flatpages:version"
+
+_state = {"version": None, "pages": {}, "html": {}}
+
+
+def _current_version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def warm_up():
+    """
+    Загружает все страницы текущего сайта одним запросом.
+    """
+    version = _current_version()
+    pages = {}
+    for page in FlatPage.objects.filter(sites=settings.SITE_ID):
+        page.title = mark_safe(page.title)
+        page.content = mark_safe(page.content)
+        pages[(settings.SITE_ID, page.url)] = page
+    _state.update(version=version, pages=pages, html={})
+
+
+def get_flatpage(url):
+    if _state["version"] != _current_version():
+        warm_up()
+    return _state["pages"].get((settings.SITE_ID, url))
+
+
+def _render(request, page):
+    if page.template_name:
+        template = loader.select_template((page.template_name, DEFAULT_TEMPLATE))
+    else:
+        template = loader.get_template(DEFAULT_TEMPLATE)
+    return template.render({"flatpage": page}, request)
+
+
+@csrf_protect
+def flatpage(request, url):
+    """
+    Замена django.contrib.flatpages.views.flatpage с тем же поведением.
+    """
+    if not url.startswith("/"):
+        url = "/" + url
+    page = get_flatpage(url)
+    if page is None:
+        if not url.endswith("/") and settings.APPEND_SLASH:
+            if get_flatpage(url + "/") is not None:
+                return HttpResponsePermanentRedirect(request.path + "/")
+        raise Http404("No FlatPage matches the given query.")
+    if page.registration_required and not request.user.is_authenticated:
+        return redirect_to_login(request.path)
+    if request.user.is_authenticated:
+        return HttpResponse(_render(request, page))
+
+    key = (settings.SITE_ID, url)
+    if key not in _state["html"]:
+        content = _render(request, page).encode()
+        etag = '"%s"' % hashlib.md5(content).hexdigest()
+        _state["html"][key] = (content, etag)
+    content, etag = _state["html"][key]
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content)
+    response["ETag"] = etag
+    return response
+
+
+@receiver(post_save, sender=FlatPage)
+@receiver(post_delete, sender=FlatPage)
+@receiver(m2m_changed, sender=FlatPage.sites.through)
+def invalidate_on_change(sender, **kwargs):
+    invalidate()
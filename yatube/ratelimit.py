@@ -0,0 +1,137 @@
+"""
+Ограничение частоты запросов к изменяющим данные представлениям.
+
+Для каждого действия (scope) заводятся два ведра токенов: для
+пользователя и для IP-адреса. Ведро "N/период" вмещает N токенов
+и полностью пополняется за период. В кэше оно хранится как счетчики
+расходов за текущий и предыдущий период, а уровень токенов
+вычисляется скользящим окном: расход предыдущего периода учитывается
+с весом оставшейся его доли. Так достаточно атомарного cache.incr,
+без блокировок и чтения-изменения-записи, и ведро работает
+одинаково в locmem, memcached и redis. На проверку одного ведра
+обычно уходит одно обращение к кэшу за счетчиком и одно за
+предыдущим периодом (get_many для обоих ведер сразу).
+
+    @ratelimit("comment", user="10/m", ip="30/m")
+    def add_comment(request, ...): ...
+
+Частоты переопределяются настройкой RATELIMIT_RATES
+({"comment": {"user": "5/m"}}), RATELIMIT_ENABLE = False отключает
+проверки. Превышение лимита дает ответ 429 с заголовком Retry-After.
+"""
+
+import functools
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template import loader
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    "10/m" -> (10, 60), "100/5m" -> (100, 300).
+    """
+    count, period = rate.split("/")
+    multiplier = int(period[:-1] or 1)
+    return int(count), multiplier * PERIODS[period[-1]]
+
+
+def get_client_ip(request):
+    header = getattr(settings, "RATELIMIT_IP_HEADER", None)
+    if header and header in request.META:
+        # Ближайший к приложению прокси добавляет адрес последним
+        return request.META[header].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _get_rates(scope, user, ip):
+    rates = {"user": user, "ip": ip}
+    rates.update(getattr(settings, "RATELIMIT_RATES", {}).get(scope, {}))
+    return rates
+
+
+def _incr(cache, key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def check(request, scope, user=None, ip=None, now=None):
+    """
+    Расходует по токену из ведер запроса. Возвращает None, если
+    запрос разрешен, иначе число секунд до появления токена.
+    """
+    now = time.time() if now is None else now
+    cache = caches[getattr(settings, "RATELIMIT_CACHE", "default")]
+    buckets = []
+    for kind, rate in _get_rates(scope, user, ip).items():
+        if rate is None:
+            continue
+        if kind == "user":
+            if not request.user.is_authenticated:
+                continue
+            ident = request.user.pk
+        else:
+            ident = get_client_ip(request)
+        limit, period = parse_rate(rate)
+        window = int(now // period)
+        prefix = f"rl:{scope}:{kind[0]}:{ident}:"
+        buckets.append((prefix, window, limit, period))
+    if not buckets:
+        return None
+
+    previous = cache.get_many(
+        [f"{prefix}{window - 1}" for prefix, window, _, _ in buckets]
+    )
+    retry_after = None
+    for prefix, window, limit, period in buckets:
+        used = _incr(cache, f"{prefix}{window}", period * 2)
+        elapsed = now - window * period
+        carried = previous.get(f"{prefix}{window - 1}", 0)
+        weight = 1 - elapsed / period
+        if used + carried * weight > limit:
+            # Ждать, пока вес прошлого периода не снизится достаточно;
+            # если лимит исчерпан уже в текущем - до конца периода
+            if used <= limit and carried:
+                wait = (used + carried * weight - limit) / carried * period
+            else:
+                wait = period - elapsed
+            wait = max(1, math.ceil(wait))
+            retry_after = max(retry_after or 0, wait)
+    return retry_after
+
+
+def too_many_requests(request, retry_after):
+    content = loader.render_to_string("misc/429.html", request=request)
+    response = HttpResponse(content, status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def ratelimit(scope, user=None, ip=None, methods=("POST",)):
+    """
+    Декоратор представления. methods=None ограничивает запросы
+    любым методом.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if getattr(settings, "RATELIMIT_ENABLE", True) and (
+                methods is None or request.method in methods
+            ):
+                retry_after = check(request, scope, user=user, ip=ip)
+                if retry_after is not None:
+                    return too_many_requests(request, retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import importlib.util
 import os
 
+from yatube.urlbuilder import profile_url
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -37,18 +40,23 @@ ALLOWED_HOSTS = [
 INSTALLED_APPS = [
     'posts',
     'users',
+    'jobs',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'django_extensions',
     'django.contrib.sites',
     'django.contrib.flatpages',
     'sorl.thumbnail',
 ]
 
+# Инструменты разработчика из requirements-dev.txt подключаются,
+# только если установлены
+if importlib.util.find_spec('django_extensions') is not None:
+    INSTALLED_APPS.append('django_extensions')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -72,13 +80,29 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'yatube.context_processors.year'
+                'yatube.context_processors.year',
+                'yatube.context_processors.notifications',
+                'yatube.context_processors.live_updates',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+ASGI_APPLICATION = 'yatube.asgi.application'
+
+# Размер пула потоков для запросов к БД из асинхронных страниц
+ASYNC_DB_THREADS = 8
+
+# Живые обновления страниц (server-sent events, только через yatube.asgi).
+# Для нескольких процессов ASGI-сервера на одной машине:
+# LIVE_BROADCASTER = 'yatube.broadcast.SocketBroadcaster'
+LIVE_UPDATES = False
+LIVE_BROADCASTER = 'yatube.broadcast.InProcessBroadcaster'
+LIVE_SOCKET_DIR = '/tmp/yatube-live'
+# Размер очереди событий одного клиента и интервал пустых сообщений (с)
+LIVE_QUEUE_SIZE = 100
+LIVE_HEARTBEAT = 15
 
 
 # Database
@@ -139,6 +163,77 @@ LOGIN_REDIRECT_URL = "index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Фоновые задачи: в режиме JOBS_EAGER задачи выполняются сразу,
+# без записи в очередь (удобно в тестах)
+JOBS_EAGER = False
+JOBS_BACKOFF_BASE = 2
+JOBS_BACKOFF_MAX = 3600
+# Задача в RUNNING дольше стольких секунд считается брошенной
+# умершим воркером и возвращается в очередь
+JOBS_RUNNING_TIMEOUT = 3600
+# Сколько секунд хранить выполненные задачи и задачи с ошибкой;
+# run_jobs удаляет более старые раз в JOBS_PRUNE_INTERVAL секунд
+JOBS_KEEP_DONE = 24 * 60 * 60
+JOBS_KEEP_FAILED = 7 * 24 * 60 * 60
+JOBS_PRUNE_INTERVAL = 60 * 60
+
+# Размер пачки при рассылке уведомлений подписчикам
+NOTIFICATIONS_BATCH_SIZE = 500
+
+# Ограничение частоты изменяющих запросов (yatube.ratelimit).
+# RATELIMIT_RATES переопределяет частоты из декораторов:
+# {'comment': {'user': '5/m', 'ip': '20/m'}}
+RATELIMIT_ENABLE = True
+RATELIMIT_RATES = {}
+# Заголовок с адресом клиента за обратным прокси, например
+# 'HTTP_X_FORWARDED_FOR'; без него используется REMOTE_ADDR
+RATELIMIT_IP_HEADER = None
+
+# Почти-дубликаты записей и комментариев (posts.fingerprints):
+# "reject" - отклонять форму, "flag" - сохранять с пометкой в
+# Fingerprint.duplicate_of, None - не проверять
+SPAM_DUPLICATE_ACTION = 'reject'
+SPAM_DUPLICATE_THRESHOLD = 0.8
+SPAM_MIN_WORDS = 5
+
+# Фоновое удаление помеченных записей и комментариев (posts.deletion):
+# строк за один DELETE и пачек за одну задачу
+PURGE_BATCH_SIZE = 500
+PURGE_MAX_BATCHES = 100
+
+# Групповая запись комментариев: наибольшая пачка и сколько секунд
+# ведущий запрос ждет соседей перед записью (0 - не ждать)
+COMMENT_BATCH_SIZE = 100
+COMMENT_BATCH_WINDOW = 0
+
+# Обсуждения (posts.threads): комментариев на странице и сколько
+# уровней ответов показывать, прежде чем вести на страницу ветки
+COMMENTS_PAGE_SIZE = 50
+COMMENT_THREAD_DEPTH = 3
+
+# Отметки «нравится» (posts.likes): на сколько строк LikeCounter
+# делится счетчик записи; в Post.likes_count их раз в минуту
+# переносит задача flush_like_counts
+LIKE_COUNTER_SHARDS = 8
+
+# Адрес профиля пользователя (User.get_absolute_url) строится
+# по заранее разобранному шаблону маршрута
+ABSOLUTE_URL_OVERRIDES = {
+    'auth.user': profile_url,
+}
+
+# Похожие записи (posts.related): сколько хранить на запись, наименьшее
+# сходство и файл с TF-IDF матрицей для дополнения без полной пересборки
+RELATED_POSTS_COUNT = 5
+RELATED_MIN_SCORE = 0.1
+RELATED_INDEX_PATH = os.path.join(BASE_DIR, 'related_index.npz')
+
+# Карта сайта (posts.sitemaps): каталог с файлами, наибольший диапазон
+# pk в одном файле и протокол адресов
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+SITEMAP_CHUNK_SIZE = 50000
+SITEMAP_PROTOCOL = 'https'
+
 # Идентификатор текущего сайта
 SITE_ID = 1
 
@@ -0,0 +1,20 @@
+"""
+Production-настройки для воркеров, обслуживающих только префикс
+/admin/admin/. Балансировщик направляет туда запросы админки,
+остальные воркеры запускаются с yatube.settings_production.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings_production import *  # noqa: F401,F403
+from .settings_production import INSTALLED_APPS, LOCAL_CACHE
+
+if LOCAL_CACHE:
+    # Правки админки (flatpages, пароли) должны быть видны остальным
+    # воркерам, а это возможно только через общий кэш
+    raise ImproperlyConfigured(
+        'The admin worker pool needs the shared cache: set '
+        'DJANGO_MEMCACHED_LOCATION.'
+    )
+
+INSTALLED_APPS = INSTALLED_APPS + ['django.contrib.admin']
@@ -0,0 +1,110 @@
+"""
+Настройки для production-окружения.
+
+Запуск: DJANGO_SETTINGS_MODULE=yatube.settings_production
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+DEBUG = False
+
+# Инструменты разработчика не нужны, а админка обслуживается
+# отдельными воркерами с настройками yatube.settings_admin
+PRODUCTION_EXCLUDED_APPS = (
+    'django_extensions',
+    'django.contrib.admin',
+)
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in PRODUCTION_EXCLUDED_APPS
+]
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)  # noqa: F405
+
+ALLOWED_HOSTS = os.environ.get(
+    'DJANGO_ALLOWED_HOSTS', ','.join(ALLOWED_HOSTS)  # noqa: F405
+).split(',')
+
+# Шаблоны разбираются один раз на процесс и хранятся в памяти.
+# Контекстный процессор debug без DEBUG ничего не добавляет.
+TEMPLATES = [dict(TEMPLATES[0], APP_DIRS=False)]
+TEMPLATES[0]['OPTIONS'] = {
+    'context_processors': [
+        processor
+        for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+        if processor != 'django.template.context_processors.debug'
+    ],
+    'loaders': [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+}
+
+# Статика: имена с хэшем содержимого и сжатые копии, созданные
+# при collectstatic
+STATICFILES_STORAGE = 'yatube.staticfiles.CompressedManifestStaticFilesStorage'
+
+# Раздача статики и медиа самим приложением, если перед ним нет
+# nginx: DJANGO_SERVE_STATIC_FILES=1
+SERVE_STATIC_FILES = os.environ.get('DJANGO_SERVE_STATIC_FILES') == '1'
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+
+# Если перед приложением стоит прокси, медиа отдает он: приложение
+# только проверяет путь и возвращает заголовок X-Accel-Redirect (nginx,
+# internal location MEDIA_ACCEL_PREFIX) или X-Sendfile (Apache, lighttpd)
+MEDIA_SENDFILE_HEADER = os.environ.get('DJANGO_MEDIA_SENDFILE_HEADER') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MIDDLEWARE = (
+    MIDDLEWARE[:1]
+    + ['yatube.staticfiles.StaticFilesMiddleware']
+    + MIDDLEWARE[1:]
+)
+
+# Кэш должен быть общим для всех процессов: в нем версии flatpages
+# и списка сообществ, поколение подсказок сообществ, ведра
+# ограничения частоты запросов, сессии и пользователи. С LocMemCache
+# у каждого воркера gunicorn (и у пула админки) был бы свой кэш:
+# правка в одном процессе не видна в остальных, выход из учетной
+# записи не действует в других воркерах, а лимиты умножаются на число
+# воркеров. Адреса memcached: DJANGO_MEMCACHED_LOCATION=host:port[,...].
+# Явный отказ от общего кэша - DJANGO_LOCAL_CACHE=1: тогда gunicorn
+# запускает один воркер, а сессии и пользователи не кэшируются.
+MEMCACHED_LOCATION = os.environ.get('DJANGO_MEMCACHED_LOCATION')
+LOCAL_CACHE = os.environ.get('DJANGO_LOCAL_CACHE') == '1'
+if MEMCACHED_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+            'KEY_PREFIX': 'yatube',
+        }
+    }
+elif not LOCAL_CACHE:
+    raise ImproperlyConfigured(
+        'Production needs a cache shared by all workers: set '
+        'DJANGO_MEMCACHED_LOCATION, or DJANGO_LOCAL_CACHE=1 to run '
+        'a single process with a local cache.'
+    )
+
+if not LOCAL_CACHE:
+    # Сессия читается из кэша, а не из таблицы django_session, объект
+    # пользователя тоже кэшируется
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTH_USER_CACHE_TIMEOUT = 300
+    MIDDLEWARE = [
+        'users.middleware.CachedAuthenticationMiddleware'
+        if middleware == 'django.contrib.auth.middleware.AuthenticationMiddleware'
+        else middleware
+        for middleware in MIDDLEWARE
+    ]
+
+# За обратным прокси адрес клиента берется из его заголовка:
+# DJANGO_RATELIMIT_IP_HEADER=HTTP_X_FORWARDED_FOR. Без прокси заголовок
+# задает сам клиент, поэтому по умолчанию используется REMOTE_ADDR
+RATELIMIT_IP_HEADER = os.environ.get('DJANGO_RATELIMIT_IP_HEADER') or None
@@ -0,0 +1,288 @@
+import gzip
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage
+)
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponsePermanentRedirect,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него создаются только .gz
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".js", ".svg", ".txt", ".html", ".json", ".xml", ".map",
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _compress(path):
+    """
+    Создает рядом с файлом сжатые копии .gz и .br, если они меньше
+    оригинала. Возвращает имена созданных файлов.
+    """
+    with open(path, "rb") as source:
+        data = source.read()
+    compressors = [(".gz", lambda raw: gzip.compress(raw, 9, mtime=0))]
+    if brotli is not None:
+        compressors.append((".br", brotli.compress))
+    created = []
+    for suffix, compress in compressors:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as target:
+                target.write(compressed)
+            created.append(path + suffix)
+    return created
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Хранилище статики с хэшем содержимого в именах файлов. При
+    collectstatic дополнительно создает сжатые .gz и .br копии, чтобы
+    не сжимать файлы на каждом запросе.
+
+    Файлы, которых нет в манифесте и в STATIC_ROOT, отдаются по
+    исходному имени, а не роняют страницу с ошибкой.
+    """
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            for compressed in _compress(self.path(name)):
+                yield name, os.path.relpath(compressed, self.location), True
+
+
+def _select_encoding(request, path):
+    accepted = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return encoding, path + suffix
+    return None, path
+
+
+def _parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном байт. Возвращает
+    (start, end) включительно, None, если заголовок нужно
+    проигнорировать, и False, если диапазон невыполним.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if not start:
+            suffix = int(end)
+            if suffix <= 0:
+                return False
+            return max(size - suffix, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start > end:
+        return False
+    return start, end
+
+
+class FileRange:
+    """
+    Часть открытого файла. fileno() отдает дескриптор исходного файла,
+    уже спозиционированный на начало диапазона, поэтому file_wrapper
+    сервера отправляет ровно Content-Length байт через sendfile.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _sendfile_response(name, path, content_type):
+    """
+    Передает отправку файла обратному прокси. Прокси сам обработает
+    Range и условные запросы.
+    """
+    header = getattr(settings, "MEDIA_SENDFILE_HEADER", None)
+    if not header:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if header == "X-Accel-Redirect":
+        prefix = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+        response[header] = prefix + quote(name)
+    else:
+        response[header] = path
+    return response
+
+
+def serve_file(request, name, document_root, cache_control, sendfile=False):
+    """
+    Отдает файл из document_root с поддержкой ETag, If-Modified-Since
+    и Range. FileResponse передает открытый файл серверу через
+    wsgi.file_wrapper, поэтому gunicorn и uWSGI отправляют его через
+    sendfile без копирования в Python. С sendfile=True ответ
+    делегируется прокси заголовком MEDIA_SENDFILE_HEADER, если он задан.
+    Возвращает None, если файла нет.
+    """
+    try:
+        path = safe_join(document_root, name)
+    except SuspiciousFileOperation:
+        return None
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or "application/octet-stream"
+    response = sendfile and _sendfile_response(name, path, content_type)
+    if response:
+        return response
+
+    # Части файла отдаются только из несжатого варианта. У сжатых
+    # вариантов свой ETag: кэш не отдаст их клиенту, который не
+    # просил это сжатие, и не применит к ним Range
+    range_header = request.META.get("HTTP_RANGE")
+    if range_header:
+        encoding, served_path = None, path
+    else:
+        encoding, served_path = _select_encoding(request, path)
+    etag = '"%x-%x%s"' % (
+        stat.st_mtime_ns, stat.st_size, "-" + encoding if encoding else ""
+    )
+    last_modified = http_date(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        byte_range = None
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if range_header and (not if_range or if_range in (etag, last_modified)):
+            byte_range = _parse_range(range_header, stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = "bytes */%d" % stat.st_size
+        elif byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = FileResponse(
+                FileRange(open(path, "rb"), start, length), status=206
+            )
+            response["Content-Length"] = length
+            response["Content-Range"] = "bytes %d-%d/%d" % (
+                start, end, stat.st_size
+            )
+        else:
+            response = FileResponse(open(served_path, "rb"))
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["Content-Type"] = content_type
+        response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = last_modified
+    response["Cache-Control"] = cache_control
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+def serve_media(request, path):
+    """
+    Представление для MEDIA_URL: файлы загрузок не меняются после
+    сохранения, поэтому кэшируются на MEDIA_CACHE_MAX_AGE секунд.
+    Адреса файлов, перенесенных в хранилище по содержимому,
+    перенаправляются на новые.
+    """
+    cache_control = "public, max-age=%d" % getattr(
+        settings, "MEDIA_CACHE_MAX_AGE", 86400
+    )
+    response = serve_file(
+        request, path, settings.MEDIA_ROOT, cache_control, sendfile=True
+    )
+    if response is None:
+        from posts.models import MediaAlias
+
+        new_name = MediaAlias.objects.filter(
+            old_name=path
+        ).values_list("new_name", flat=True).first()
+        if new_name is None:
+            raise Http404(path)
+        return HttpResponsePermanentRedirect(settings.MEDIA_URL + quote(new_name))
+    return response
+
+
+class StaticFilesMiddleware:
+    """
+    Раздает STATIC_URL и MEDIA_URL без обратного прокси. Стоит сразу
+    после SecurityMiddleware, чтобы запросы за файлами не проходили
+    сессии, аутентификацию и URLconf. Включается SERVE_STATIC_FILES.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVE_STATIC_FILES", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.hashed_files = set(
+            getattr(staticfiles_storage, "hashed_files", {}).values()
+        )
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD"):
+            response = self.serve(request, request.path_info)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, path):
+        if settings.STATIC_URL and path.startswith(settings.STATIC_URL):
+            name = path[len(settings.STATIC_URL):]
+            if name in self.hashed_files:
+                cache_control = IMMUTABLE_CACHE_CONTROL
+            else:
+                cache_control = "public, max-age=60"
+            return serve_file(
+                request, name, settings.STATIC_ROOT, cache_control
+            )
+        if settings.MEDIA_URL and path.startswith(settings.MEDIA_URL):
+            try:
+                return serve_media(request, path[len(settings.MEDIA_URL):])
+            except Http404:
+                return None
+        return None
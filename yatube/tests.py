@@ -0,0 +1,294 @@
+import os
+import runpy
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase, override_settings
+
+from django.urls import NoReverseMatch, reverse, set_script_prefix
+
+from yatube import flatpages, ratelimit, urlbuilder
+from yatube.staticfiles import serve_media
+
+
+class TestStaticPipeline(TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.source, "site.css"), "w") as css:
+            css.write("body { color: black; }\n" * 50)
+
+    def test_collectstatic_and_serve(self):
+        """
+        Тест проверяет, что collectstatic создает файлы с хэшем в имени
+        и сжатые копии, а middleware отдает их с долгим кэшированием.
+        """
+        with override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE=(
+                "yatube.staticfiles.CompressedManifestStaticFilesStorage"
+            ),
+            SERVE_STATIC_FILES=True,
+            MIDDLEWARE=(
+                ["yatube.staticfiles.StaticFilesMiddleware"]
+                + settings.MIDDLEWARE
+            ),
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            hashed = staticfiles_storage.stored_name("site.css")
+            self.assertNotEqual(hashed, "site.css")
+            self.assertTrue(os.path.exists(os.path.join(self.root, hashed + ".gz")))
+
+            client = Client()
+            response = client.get(
+                settings.STATIC_URL + hashed, HTTP_ACCEPT_ENCODING="gzip, br"
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(response["Content-Type"], "text/css")
+            self.assertIn("immutable", response["Cache-Control"])
+
+            gzip_etag = response["ETag"]
+            self.assertTrue(gzip_etag.endswith('-gzip"'))
+
+            response = client.get(settings.STATIC_URL + hashed)
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertNotEqual(response["ETag"], gzip_etag)
+            self.assertTrue(
+                b"".join(response.streaming_content).startswith(b"body")
+            )
+
+            # Сжатый вариант не подходит клиенту без gzip
+            response = client.get(
+                settings.STATIC_URL + hashed, HTTP_IF_NONE_MATCH=gzip_etag
+            )
+            self.assertEqual(response.status_code, 200)
+            response = client.get(
+                settings.STATIC_URL + hashed, HTTP_ACCEPT_ENCODING="gzip",
+                HTTP_RANGE="bytes=0-3",
+            )
+            self.assertEqual(response.status_code, 206)
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(b"".join(response.streaming_content), b"body")
+
+
+class TestMediaServing(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.mkdir(os.path.join(self.root, "posts"))
+        with open(os.path.join(self.root, "posts", "image.png"), "wb") as image:
+            image.write(bytes(range(256)) * 4)
+        self.factory = RequestFactory()
+
+    def get(self, **headers):
+        with override_settings(MEDIA_ROOT=self.root):
+            request = self.factory.get("/media/posts/image.png", **headers)
+            response = serve_media(request, "posts/image.png")
+        self.addCleanup(response.close)
+        return response
+
+    def test_full_and_conditional(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], "1024")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        response = self.get(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranges(self):
+        """
+        Тест проверяет ответы на запросы части файла.
+        """
+        response = self.get(HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.get(HTTP_RANGE="bytes=-6")
+        self.assertEqual(response["Content-Range"], "bytes 1018-1023/1024")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(250, 256)))
+
+        response = self.get(HTTP_RANGE="bytes=5000-")
+        self.assertEqual(response.status_code, 416)
+
+        response = self.get(HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_SENDFILE_HEADER="X-Accel-Redirect")
+    def test_accel_redirect(self):
+        response = self.get()
+        self.assertEqual(
+            response["X-Accel-Redirect"], "/protected-media/posts/image.png"
+        )
+        self.assertEqual(response.content, b"")
+
+
+class TestFlatpageCache(TestCase):
+    def setUp(self):
+        flatpages.invalidate()
+        self.page = FlatPage.objects.create(
+            url="/team/", title="Команда", content="Первая версия"
+        )
+        self.page.sites.add(Site.objects.get(pk=settings.SITE_ID))
+
+    def test_cached_render_and_invalidation(self):
+        """
+        Тест проверяет, что страница отдается из памяти без запросов
+        к базе, поддерживает ETag и обновляется после сохранения.
+        """
+        response = self.client.get("/about/team/")
+        self.assertContains(response, "Первая версия")
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/about/team/")
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get("/about/team/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.page.content = "Вторая версия"
+        self.page.save()
+        response = self.client.get("/about/team/")
+        self.assertContains(response, "Вторая версия")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_authenticated_user_gets_personal_page(self):
+        user = get_user_model().objects.create_user(username="reader")
+        self.client.force_login(user)
+        response = self.client.get("/about/team/")
+        self.assertContains(response, "Пользователь: reader")
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_missing_page_and_slash_redirect(self):
+        self.assertEqual(self.client.get("/about/nothing/").status_code, 404)
+        response = self.client.get("/about/team")
+        self.assertEqual(response.status_code, 301)
+
+
+class TestRateLimit(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def make_request(self, ip="10.0.0.1"):
+        request = self.factory.post("/new/", REMOTE_ADDR=ip)
+        request.user = AnonymousUser()
+        return request
+
+    def test_bucket_refills_over_period(self):
+        """
+        Тест проверяет, что ведро пропускает N запросов за период,
+        отказывает с Retry-After и снова пропускает после пополнения.
+        """
+        now = 600.0
+        for _ in range(3):
+            self.assertIsNone(ratelimit.check(self.make_request(), "t", ip="3/m", now=now))
+        retry_after = ratelimit.check(self.make_request(), "t", ip="3/m", now=now)
+        self.assertEqual(retry_after, 60)
+        # Другой адрес расходует свое ведро
+        self.assertIsNone(ratelimit.check(self.make_request("10.0.0.2"), "t", ip="3/m", now=now))
+        # В следующем периоде расход прошлого (4 с отказом) учитывается
+        # с весом: в середине периода из трех токенов остается один
+        self.assertIsNone(ratelimit.check(self.make_request(), "t", ip="3/m", now=690.0))
+        self.assertIsNotNone(ratelimit.check(self.make_request(), "t", ip="3/m", now=690.0))
+        self.assertIsNone(ratelimit.check(self.make_request(), "t", ip="3/m", now=750.0))
+
+    @override_settings(RATELIMIT_RATES={"post": {"user": "2/m"}})
+    def test_view_returns_429(self):
+        user = get_user_model().objects.create_user(username="spammer")
+        client = Client()
+        client.force_login(user)
+        for number in range(2):
+            response = client.post("/new/", {"text": f"spam {number}"})
+            self.assertEqual(response.status_code, 302)
+        response = client.post("/new/", {"text": "spam 3"})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response["Retry-After"]) >= 1)
+        # Просмотр формы не ограничивается
+        self.assertEqual(client.get("/new/").status_code, 200)
+
+
+class TestUrlBuilder(TestCase):
+    def test_matches_reverse(self):
+        """
+        Тест проверяет, что адреса совпадают с reverse(), в том числе
+        для имен с не-ASCII и особыми символами.
+        """
+        for username in ("leo", "лев", "a.b-c_d+e@f"):
+            self.assertEqual(
+                urlbuilder.url_for("post", username=username, post_id=7),
+                reverse("post", kwargs={"username": username, "post_id": 7}),
+            )
+            self.assertEqual(
+                urlbuilder.url_for("profile", username=username),
+                reverse("profile", kwargs={"username": username}),
+            )
+        self.assertEqual(urlbuilder.url_for("index"), reverse("index"))
+
+    def test_script_prefix_and_fallback(self):
+        """
+        Тест проверяет, что учитывается префикс приложения, а вызов
+        с другим набором аргументов уходит в reverse().
+        """
+        set_script_prefix("/app/")
+        try:
+            self.assertEqual(urlbuilder.url_for("group", slug="cats"), "/app/group/cats/")
+        finally:
+            set_script_prefix("/")
+        with self.assertRaises(NoReverseMatch):
+            urlbuilder.url_for("profile", username="leo", post_id=7)
+
+    def test_model_urls(self):
+        user = get_user_model().objects.create_user(username="leo")
+        self.assertEqual(user.get_absolute_url(), "/leo/")
+
+
+class TestProductionSettings(TestCase):
+    def load(self, **environ):
+        environ = {
+            key: value for key, value in os.environ.items()
+            if key not in ("DJANGO_MEMCACHED_LOCATION", "DJANGO_LOCAL_CACHE")
+        } | environ
+        with mock.patch.dict(os.environ, environ, clear=True):
+            return runpy.run_module("yatube.settings_production")
+
+    def test_shared_cache_required(self):
+        """
+        Тест проверяет, что production не запускается с кэшем в памяти
+        процесса, а с memcached кэширует сессии и пользователей.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            self.load()
+        loaded = self.load(DJANGO_MEMCACHED_LOCATION="10.0.0.1:11211,10.0.0.2:11211")
+        self.assertEqual(
+            loaded["CACHES"]["default"]["LOCATION"], ["10.0.0.1:11211", "10.0.0.2:11211"]
+        )
+        self.assertEqual(loaded["SESSION_ENGINE"], "django.contrib.sessions.backends.cached_db")
+        self.assertIn("users.middleware.CachedAuthenticationMiddleware", loaded["MIDDLEWARE"])
+
+    def test_local_cache_disables_cached_sessions(self):
+        loaded = self.load(DJANGO_LOCAL_CACHE="1")
+        self.assertEqual(
+            loaded["CACHES"]["default"]["BACKEND"],
+            "django.core.cache.backends.locmem.LocMemCache",
+        )
+        self.assertNotIn("SESSION_ENGINE", loaded)
+        self.assertNotIn("users.middleware.CachedAuthenticationMiddleware", loaded["MIDDLEWARE"])
+
+    def test_admin_pool_needs_shared_cache(self):
+        with mock.patch.dict(os.environ, {"DJANGO_LOCAL_CACHE": "1"}):
+            with self.assertRaises(ImproperlyConfigured):
+                runpy.run_module("yatube.settings_admin")
@@ -1,6 +1,8 @@
-from django.contrib import admin
+from django.apps import apps
 from django.urls import include, path
-from django.contrib.flatpages import views
+from yatube import flatpages
+from yatube.staticfiles import serve_media
+from posts import sitemaps
 from django.conf import settings
 from django.conf.urls.static import static
 from django.conf.urls import handler404, handler500 # noqa
@@ -9,20 +11,33 @@ handler404 = "posts.views.page_not_found" # noqa
 handler500 = "posts.views.server_error" # noqa
 
 urlpatterns = [
+    path('sitemap.xml', sitemaps.serve, name='sitemap'),
+    path('sitemaps/<str:name>', sitemaps.serve, name='sitemap_chunk'),
     path('', include('posts.urls')),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
-    path('admin/admin/', admin.site.urls),
-    path('about/', include('django.contrib.flatpages.urls')),
+    path('about/<path:url>', flatpages.flatpage,
+         name='django.contrib.flatpages.views.flatpage'),
 ]
 
 urlpatterns += [
-        path('about-us/', views.flatpage, {'url': '/about-us/'}, name='about'),
-        path('terms/', views.flatpage, {'url': '/terms/'}, name='terms'),
-        path('about-author/', views.flatpage, {'url': '/about-author/'}, name='about-author'),
-        path('about-spec/', views.flatpage, {'url': '/about-spec/'}, name='about-spec')
+        path('about-us/', flatpages.flatpage, {'url': '/about-us/'}, name='about'),
+        path('terms/', flatpages.flatpage, {'url': '/terms/'}, name='terms'),
+        path('about-author/', flatpages.flatpage, {'url': '/about-author/'}, name='about-author'),
+        path('about-spec/', flatpages.flatpage, {'url': '/about-spec/'}, name='about-spec')
 ]
 
+# Без django.contrib.admin в INSTALLED_APPS (production) модули
+# админки не импортируются вовсе
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns += [path('admin/admin/', admin.site.urls)]
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # serve_media, а не static(): старые адреса перенесенных файлов
+    # перенаправляются на новые
+    urlpatterns += [
+        path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media),
+    ]
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -0,0 +1,45 @@
+import gc
+
+from django.db import connections
+from django.template import TemplateDoesNotExist, engines
+from django.urls import get_resolver
+
+from yatube import flatpages, urlbuilder
+
+
+# Шаблоны, которые нужны почти на каждом запросе
+WARM_TEMPLATES = (
+    "base.html",
+    "index.html",
+    "group.html",
+    "follow.html",
+    "post.html",
+    "profile.html",
+    "paginator.html",
+    "includes/post_list.html",
+    "misc/404.html",
+)
+
+
+def warm_up():
+    """
+    Выполняет в мастер-процессе работу, которую иначе повторил бы каждый
+    воркер: импортирует все представления через URLconf, готовит
+    строки формата частых адресов, загружает flatpages, разбирает
+    шаблоны (с cached loader они остаются в памяти) и замораживает
+    сборщик мусора, чтобы его проходы в воркерах не копировали
+    общие страницы памяти.
+    """
+    get_resolver().reverse_dict
+    urlbuilder.warm_up()
+    for name in WARM_TEMPLATES:
+        try:
+            engines["django"].get_template(name)
+        except TemplateDoesNotExist:
+            pass
+    flatpages.warm_up()
+    # Соединения с БД нельзя разделять между процессами
+    connections.close_all()
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()